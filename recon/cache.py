@@ -0,0 +1,204 @@
+"""Persistent cache of operation results. Operations applied with `cache=True` record
+the keys of the examples they return for each input example, keyed by the operation
+name, a fingerprint of its code and preprocessors and a hash of its validated kwargs.
+When the same operation is applied again with `cache=True`, or replayed by
+`Dataset.from_disk` after the data of a Dataset was edited, examples with a cached
+result are taken from the ExampleStore instead of running the operation and its
+preprocessors, so only examples whose input changed are processed.
+
+Results depend on state the key can't cover, e.g. the weights of a spaCy model or
+functions an operation calls, so caching is opt-in. Bump the version in the name of
+an operation when its results change for the same input.
+"""
+
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import srsly
+import xxhash
+from pydantic.json import pydantic_encoder
+
+from recon.hashing import dump_key, get_hash_version
+from recon.utils import ensure_path
+
+OPERATION_CACHE_FILE = "operation_cache.jsonl"
+"""Name of the file a Dataset saves its OperationCache to in its state directory"""
+
+
+class CachedResult(NamedTuple):
+    """Result of an operation for one example"""
+
+    # Keys of the examples the operation returned. Empty if the example was removed
+    outputs: List[int]
+    # Whether the operation returned a list of examples
+    is_list: bool = False
+
+
+_Bucket = Tuple[str, str, int]
+
+
+DEFAULT_MAX_SIZE = 1_000_000
+"""Default max number of results in an OperationCache"""
+
+
+def operation_params_hash(kwargs: Dict[str, Any], fingerprint: str = "") -> Optional[str]:
+    """Hash of the validated kwargs of an operation
+
+    Args:
+        kwargs (Dict[str, Any]): Validated kwargs of the operation
+        fingerprint (str, optional): Fingerprint of the code and preprocessors of the
+            operation. See `Operation.fingerprint`
+
+    Returns:
+        Optional[str]: Hash of kwargs or None if they aren't JSON serializable
+            so results of the operation can't be cached
+    """
+    try:
+        params = json.dumps(kwargs, sort_keys=True, default=pydantic_encoder)
+    except (TypeError, ValueError):
+        return None
+    return xxhash.xxh64_hexdigest(fingerprint + params)
+
+
+class OperationCache:
+    """Maps (operation name, params hash, input example key) to the keys of the
+    examples the operation returned. Results are kept per hash version and the least
+    recently used results are evicted once the cache holds max_size results.
+    `OperationCache.to_disk` appends the results added since the last save to the file
+    it was last saved to or loaded from, or rewrites it if results were evicted.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """Initialize an OperationCache
+
+        Args:
+            max_size (int, optional): Max number of cached results
+        """
+        self.max_size = max_size
+        # Result of each (bucket, input key), None if the example was returned unchanged
+        self._results: "OrderedDict[Tuple[_Bucket, int], Optional[CachedResult]]" = OrderedDict()
+        self._pending: List[Tuple[_Bucket, int, Optional[CachedResult]]] = []
+        self._evicted = False
+        self._saved_path: Optional[Path] = None
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, op_name: str, params: str, example_hash: int) -> Optional[CachedResult]:
+        """Get the cached result of an operation for an input example
+
+        Args:
+            op_name (str): Operation name
+            params (str): Hash of the operation kwargs from `operation_params_hash`
+            example_hash (int): Key of the input example
+
+        Returns:
+            Optional[CachedResult]: Cached result or None if there is none
+        """
+        key = ((op_name, params, get_hash_version()), example_hash)
+        if key not in self._results:
+            return None
+        self._results.move_to_end(key)
+        result = self._results[key]
+        return CachedResult([example_hash]) if result is None else result
+
+    def put(self, op_name: str, params: str, example_hash: int, result: CachedResult) -> None:
+        """Cache the result of an operation for an input example
+
+        Args:
+            op_name (str): Operation name
+            params (str): Hash of the operation kwargs from `operation_params_hash`
+            example_hash (int): Key of the input example
+            result (CachedResult): Result of the operation
+        """
+        bucket = (op_name, params, get_hash_version())
+        value = None if self._is_unchanged(example_hash, result) else result
+        self._add(bucket, example_hash, value)
+        self._pending.append((bucket, example_hash, value))
+
+    def clear(self) -> None:
+        """Remove all cached results"""
+        self._results = OrderedDict()
+        self._pending = []
+        self._evicted = True
+
+    @staticmethod
+    def _is_unchanged(example_hash: int, result: CachedResult) -> bool:
+        return not result.is_list and result.outputs == [example_hash]
+
+    def _add(self, bucket: _Bucket, example_hash: int, result: Optional[CachedResult]) -> None:
+        key = (bucket, example_hash)
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+            self._evicted = True
+
+    def from_disk(self, path: Union[str, Path]) -> "OperationCache":
+        """Load cached results saved by `OperationCache.to_disk`
+
+        Args:
+            path (Union[str, Path]): Path of the cache file
+
+        Returns:
+            OperationCache: The cache, for chaining
+        """
+        path = ensure_path(path)
+        for record in srsly.read_jsonl(path):
+            bucket = (record["op"], record["params"], record["hash_version"])
+            for key in record["unchanged"]:
+                self._add(bucket, int(key), None)
+            for key, outputs, is_list in record["changed"]:
+                self._add(bucket, int(key), CachedResult([int(k) for k in outputs], is_list))
+        self._pending = []
+        self._saved_path = path.resolve()
+        return self
+
+    def to_disk(self, path: Union[str, Path]) -> None:
+        """Save the cached results. If the cache was last saved to or loaded from
+        path and no results were evicted since, only results added since then
+        are appended to it.
+
+        Args:
+            path (Union[str, Path]): Path of the cache file
+        """
+        path = ensure_path(path)
+        if self._saved_path == path.resolve() and path.exists() and not self._evicted:
+            if self._pending:
+                with path.open("a", encoding="utf8") as f:
+                    for record in self._records(self._pending):
+                        f.write(srsly.json_dumps(record) + "\n")
+        else:
+            srsly.write_jsonl(path, self._records((b, k, r) for (b, k), r in self._results.items()))
+        self._pending = []
+        self._evicted = False
+        self._saved_path = path.resolve()
+
+    @staticmethod
+    def _records(
+        results: Iterable[Tuple[_Bucket, int, Optional[CachedResult]]]
+    ) -> List[Dict[str, Any]]:
+        """Group results by bucket into the records of a cache file. Results of a
+        bucket keep their order so the least recently used are loaded first"""
+        records: Dict[_Bucket, Dict[str, Any]] = {}
+        for bucket, example_hash, result in results:
+            record = records.get(bucket)
+            if record is None:
+                op_name, params, hash_version = bucket
+                record = {
+                    "op": op_name,
+                    "params": params,
+                    "hash_version": hash_version,
+                    "unchanged": [],
+                    "changed": [],
+                }
+                records[bucket] = record
+            if result is None:
+                record["unchanged"].append(dump_key(example_hash))
+            else:
+                record["changed"].append(
+                    [dump_key(example_hash), [dump_key(o) for o in result.outputs], result.is_list]
+                )
+        return list(records.values())
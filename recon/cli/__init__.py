@@ -2,12 +2,13 @@
 
 import typer
 
+from recon.cli.audit import audit
 from recon.cli.stats import stats
 
 app = typer.Typer(no_args_is_help=True)
 
 
-commands = [stats]
+commands = [audit, stats]
 for command in commands:
     app.command(no_args_is_help=True)(command)
 
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from wasabi import Printer
+
+from recon.store import STORE_FORMATS, audit_stores
+
+
+def audit(data_dir: Path) -> None:
+    """Audit the example stores saved with a Corpus or Dataset for hash collisions
+
+    Args:
+        data_dir (Path): Path to data folder
+    """
+
+    msg: Printer = Printer()
+
+    store_paths = sorted(
+        p
+        for p in (data_dir / ".recon").glob("**/example_store.*")
+        if p.name.endswith(STORE_FORMATS)
+    )
+    if not store_paths:
+        msg.fail(f"No example stores found in: {data_dir}", exits=1)
+
+    with msg.loading(f"Auditing {len(store_paths)} example stores"):
+        collisions = audit_stores(store_paths)
+
+    if not collisions:
+        msg.good("No hash collisions found")
+        return
+
+    msg.fail(f"Found {len(collisions)} hash collisions")
+    for example_hash, examples in collisions.items():
+        msg.divider(str(example_hash))
+        msg.table({i: e.text for i, e in enumerate(examples)})
+    msg.info(
+        "Rollback is not reliable for these examples. "
+        "Use hash version 3 for 128 bit example keys with recon.migrate.migrate_hashes"
+    )
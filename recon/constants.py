@@ -1 +1,5 @@
 NOT_LABELED = "NOT_LABELED"
+
+RECON_DATA_FORMAT = "recon.v1"
+"""Format marker recorded in the state saved by Dataset.to_disk and Corpus.to_disk.
+Data with this marker was written by recon and can be loaded with `trusted=True`."""
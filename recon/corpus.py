@@ -1,10 +1,13 @@
+from itertools import chain
 from pathlib import Path
 from typing import Any, Callable, List, Optional, Tuple, Union
 
 import srsly
 
+from recon.constants import RECON_DATA_FORMAT
 from recon.dataset import Dataset
-from recon.store import ExampleStore
+from recon.formats import find_record_file, remove_record_files
+from recon.store import STORE_FORMATS, DiskExampleStore, ExampleStore
 from recon.types import (
     CorpusApplyResult,
     CorpusMeta,
@@ -39,10 +42,8 @@ class Corpus:
         """
         self._name = name
         if example_store is None:
-            examples = train.data + dev.data
-            if test:
-                examples += test.data
-            example_store = ExampleStore(examples)
+            datasets = (train, dev) if test is None else (train, dev, test)
+            example_store = ExampleStore(list(chain.from_iterable(ds.data for ds in datasets)))
         self._example_store = example_store
 
         if test is None:
@@ -120,12 +121,13 @@ class Corpus:
 
     @property
     def all(self) -> List[Example]:
-        """Return concatenation of train/dev/test datasets
+        """Return concatenation of train/dev/test datasets. The data of streaming
+        datasets is read into the list.
 
         Returns:
             List[Example]: All Examples in Corpus
         """
-        return self.train + self.dev + self.test
+        return list(chain(self.train, self.dev, self.test))
 
     @property
     def example_store(self) -> ExampleStore:
@@ -195,65 +197,114 @@ class Corpus:
         train_name: str = "train",
         dev_name: str = "dev",
         test_name: str = "test",
+        trusted: bool = False,
+        example_store: Optional[ExampleStore] = None,
+        streaming: bool = False,
     ) -> "Corpus":
         """Load Corpus from disk given a directory with files
-        named explicitly train.jsonl, dev.jsonl, and test.jsonl
+        named explicitly train.jsonl, dev.jsonl, and test.jsonl.
+        Compressed and msgpack files like train.jsonl.gz are detected by their extension.
 
         Args:
             data_dir (Path): directory to load from.
             train_name (str, optional): Name of train data under data_dir. Defaults to train.
             dev_name (str, optional): Name of dev data under data_dir. Defaults to dev.
             test_name (str, optional): Name of test data under data_dir. Defaults to test.
+            trusted (bool, optional): Skip validation when loading data saved by recon.
+                See `Dataset.from_disk`
+            example_store (Optional[ExampleStore], optional): Empty ExampleStore to load the
+                saved store into, e.g. a DiskExampleStore. Defaults to an in memory ExampleStore,
+                or a DiskExampleStore if streaming
+            streaming (bool, optional): Keep the data of each Dataset on disk.
+                See `Dataset.from_disk`
         """
         data_dir = ensure_path(data_dir)
 
         corpus_meta_path = data_dir / ".recon" / "meta.json"
+        store_trusted = False
         if corpus_meta_path.exists():
             corpus_meta = CorpusMeta.parse_file(corpus_meta_path)
             name = corpus_meta.name
+            store_trusted = trusted and corpus_meta.format == RECON_DATA_FORMAT
 
-        example_store_path = data_dir / ".recon" / "example_store.jsonl"
-        example_store = ExampleStore()
-        if example_store_path.exists():
-            example_store.from_disk(example_store_path)
+        example_store_path = find_record_file(data_dir / ".recon", "example_store", STORE_FORMATS)
+        if example_store is None:
+            example_store = DiskExampleStore() if streaming else ExampleStore()
+        if example_store_path:
+            example_store.from_disk(example_store_path, trusted=store_trusted)
 
-        train = Dataset(train_name, example_store=example_store).from_disk(data_dir)
-        dev = Dataset(dev_name, example_store=example_store).from_disk(data_dir)
+        train = Dataset(train_name, example_store=example_store).from_disk(
+            data_dir, trusted, streaming=streaming
+        )
+        dev = Dataset(dev_name, example_store=example_store).from_disk(
+            data_dir, trusted, streaming=streaming
+        )
 
-        try:
-            test = Dataset(test_name, example_store=example_store).from_disk(data_dir)
-            corpus = cls(name, train, dev, test=test)
-        except ValueError:
-            corpus = cls(name, train, dev)
-        return corpus
+        test = None
+        if find_record_file(data_dir, test_name):
+            test = Dataset(test_name, example_store=example_store).from_disk(
+                data_dir, trusted, streaming=streaming
+            )
+        return cls(name, train, dev, test=test, example_store=example_store)
 
-    def to_disk(self, output_dir: Union[str, Path], overwrite: bool = False) -> None:
+    def to_disk(
+        self,
+        output_dir: Union[str, Path],
+        overwrite: bool = False,
+        journal: bool = False,
+        file_format: str = ".jsonl",
+        store_format: Optional[str] = None,
+    ) -> None:
         """Save Corpus to Disk
 
         Args:
             output_dir (Path): Directory to save data to
             overwrite (bool): Force save to directory. Create parent directories
                 and/or overwrite existing data.
+            journal (bool): If the Corpus was last saved to or loaded from output_dir,
+                only append the changes since then to journals instead of rewriting
+                the saved data. See `Dataset.to_disk`
+            file_format (str): Format of the data and example store files.
+                See `Dataset.to_disk`
+            store_format (Optional[str]): Format of the example store file.
+                See `Dataset.to_disk`
         """
         data_dir = ensure_path(output_dir)
         state_dir = data_dir / ".recon"
         corpus_meta_path = state_dir / "meta.json"
-
-        if not overwrite and data_dir.exists():
+        example_store_path = state_dir / f"example_store{store_format or file_format}"
+
+        saved_store_path = find_record_file(state_dir, "example_store", STORE_FORMATS)
+        if journal and saved_store_path and self.example_store.can_journal(saved_store_path):
+            example_store_path = saved_store_path
+        else:
+            journal = False
+        if not overwrite and not journal and data_dir.exists():
             raise ValueError(
                 "Output directory is not empty. Set overwrite=True in Corpus.to_disk to clear the directory before saving."
             )
+        overwrite = overwrite or journal
 
         data_dir.mkdir(parents=True, exist_ok=True)
         if not state_dir.exists():
             state_dir.mkdir(parents=True, exist_ok=True)
 
-        srsly.write_json(corpus_meta_path, CorpusMeta(name=self.name).dict())
-        self._train.to_disk(data_dir, overwrite=overwrite, save_examples=False)
-        self._dev.to_disk(data_dir, overwrite=overwrite, save_examples=False)
-        if self._test:
-            self._test.to_disk(data_dir, overwrite=overwrite, save_examples=False)
-        self.example_store.to_disk(state_dir / "example_store.jsonl")
+        srsly.write_json(
+            corpus_meta_path, CorpusMeta(name=self.name, format=RECON_DATA_FORMAT).dict()
+        )
+        # Datasets add examples missing from the store before it's saved
+        datasets = [self._train, self._dev] + ([self._test] if self._test else [])
+        for dataset in datasets:
+            dataset.to_disk(
+                data_dir,
+                overwrite=overwrite,
+                save_examples=False,
+                journal=journal,
+                file_format=file_format,
+                store_format=store_format,
+            )
+        self.example_store.to_disk(example_store_path, journal=journal)
+        remove_record_files(state_dir, "example_store", example_store_path, STORE_FORMATS)
 
     @classmethod
     def from_prodigy(
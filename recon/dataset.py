@@ -1,19 +1,68 @@
 from datetime import datetime
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import spacy
 import srsly
 from spacy.tokens import Doc
 from wasabi import Printer
 
-from recon.hashing import dataset_hash
+from recon.cache import OPERATION_CACHE_FILE, OperationCache
+from recon.constants import RECON_DATA_FORMAT
+from recon.formats import (
+    RECORD_FORMATS,
+    find_record_file,
+    remove_record_files,
+    write_records,
+)
+from recon.hashing import (
+    CommitTree,
+    dataset_hash,
+    get_hash_version,
+    hash_key,
+    hash_many,
+)
+from recon.journal import (
+    SavedState,
+    append_journal,
+    apply_diff,
+    can_journal,
+    clear_journal,
+    diff_keys,
+    read_journal,
+)
 from recon.loaders import from_spacy, read_jsonl, to_spacy
 from recon.operations import registry
-from recon.stats import get_ner_stats
-from recon.store import ExampleStore
+from recon.operations.core import Operation, PipelineStep, run_fused
+from recon.search import SearchIndex
+from recon.stats import get_ner_stats, update_ner_stats
+from recon.store import STORE_FORMATS, DiskExampleStore, ExampleStore
+from recon.stream import (
+    DEFAULT_CHUNK_SIZE,
+    ExampleSegment,
+    copy_data,
+    finish_data,
+    iter_chunks,
+    new_data_like,
+    read_segment,
+)
 from recon.types import (
     ApplyType,
+    DataHunk,
     DatasetOperationsState,
     Example,
     OperationResult,
@@ -21,7 +70,7 @@ from recon.types import (
     OperationStatus,
     Span,
     Stats,
-    Token,
+    Tokens,
     TransformationType,
 )
 from recon.utils import ensure_path
@@ -78,18 +127,40 @@ class Dataset:
         operations: List[OperationState] = [],
         example_store: Optional[ExampleStore] = None,
         verbose: bool = True,
+        operation_cache: Optional[OperationCache] = None,
     ):
         self._name = name
         self._data = data
+        self._commit_tree: Optional[CommitTree] = None
+        self._commit_tree_key: Optional[Tuple[int, int]] = None
+        self._v1_commit: Optional[Tuple[List[int], str]] = None
+        self._hash_index: Optional[Dict[int, int]] = None
+        self._hash_index_leaves: Optional[List[int]] = None
+        self._hash_index_dups: Set[int] = set()
+        self._search_index: Optional[SearchIndex] = None
+        self._search_index_leaves: Optional[List[int]] = None
         if not operations:
             operations = []
         self._operations = operations
+        self._undone: List[OperationState] = []
+        self._history_refs: Optional[Dict[int, int]] = None
 
         if example_store is None:
             example_store = ExampleStore(data)
+        else:
+            # Rollback looks up the original revision of changed examples in the store
+            for example in data:
+                if example.key not in example_store:
+                    example_store.add(example)
         self._example_store = example_store
+        example_store.register(self)
         self._verbose = verbose
         self._stats: Optional[Stats] = None
+        self._stats_leaves: Optional[List[int]] = None
+        if operation_cache is None:
+            operation_cache = OperationCache()
+        self._operation_cache = operation_cache
+        self._saved: Optional[SavedState] = None
 
     @property
     def name(self) -> str:
@@ -99,12 +170,19 @@ class Dataset:
     def commit_hash(self) -> str:
         """String representation of internal hash
         that can be used to mark a checkpoint in a dataset."""
-        return cast(str, dataset_hash(self, as_int=False))
+        if get_hash_version() == 1:
+            return self._get_v1_commit()
+        return self._get_commit_tree().hexdigest()
 
     @property
     def data(self) -> List[Example]:
         return self._data
 
+    @property
+    def streaming(self) -> bool:
+        """Whether the data is an ExampleSegment on disk. See `Dataset.from_disk`"""
+        return isinstance(self._data, ExampleSegment)
+
     @property
     def operations(self) -> List[OperationState]:
         return self._operations
@@ -113,9 +191,26 @@ class Dataset:
     def example_store(self) -> ExampleStore:
         return self._example_store
 
+    @property
+    def operation_cache(self) -> OperationCache:
+        """Cache of operation results used to skip examples an operation was
+        already applied to. Saved and loaded with the Dataset. See `recon.cache`"""
+        return self._operation_cache
+
     @property
     def stats(self) -> Stats:
-        return get_ner_stats(self.data)
+        """NER stats of the data. Computed on first access for the current commit
+        and updated by Dataset.apply_, Dataset.rollback and Dataset.checkout from
+        the examples in the transformations of each operation.
+
+        Returns:
+            Stats: Stats of the current data
+        """
+        leaves = self._get_commit_tree().leaves
+        if self._stats is None or self._stats_leaves is not leaves:
+            self._stats = get_ner_stats(self.data)
+            self._stats_leaves = leaves
+        return self._stats.copy(deep=True)
 
     def summary(self) -> str:
         return f"Dataset\nName: {self.name}\nStats: {self.stats}"
@@ -127,16 +222,41 @@ class Dataset:
         return self.summary()
 
     def __hash__(self) -> int:
-        return cast(int, dataset_hash(self))
+        if get_hash_version() == 1:
+            return int(self._get_v1_commit(), 16)
+        return self._get_commit_tree().intdigest()
 
     def __len__(self) -> int:
         return len(self.data)
 
     def __getitem__(self, example_hash: int) -> Example:
-        for e in self.data:
-            if hash(e) == example_hash:
-                return e
-        raise KeyError(f"Example with hash {example_hash} does not exist")
+        i = self._get_hash_index().get(example_hash)
+        if i is None:
+            raise KeyError(f"Example with hash {example_hash} does not exist")
+        return self.data[i]
+
+    def get_many(self, example_hashes: Iterable[int]) -> List[Example]:
+        """Get the examples for many example hashes at once, e.g. the hashes
+        in the Transformation records of an operation.
+
+        Args:
+            example_hashes (Iterable[int]): Example hashes (example.key) to look up
+
+        Raises:
+            KeyError: If an example hash is not in the Dataset
+
+        Returns:
+            List[Example]: Example for each hash
+        """
+        index = self._get_hash_index()
+        data = self.data
+        examples = []
+        for example_hash in example_hashes:
+            i = index.get(example_hash)
+            if i is None:
+                raise KeyError(f"Example with hash {example_hash} does not exist")
+            examples.append(data[i])
+        return examples
 
     def apply(self, func: ApplyType, *args: Any, **kwargs: Any) -> Any:
         """Apply a function to the dataset
@@ -155,6 +275,9 @@ class Dataset:
         operation: Union[str, Callable[[Any], OperationResult]],
         *args: Any,
         initial_state: Optional[OperationState] = None,
+        n_workers: int = 1,
+        chunk_size: int = 1000,
+        cache: bool = False,
         **kwargs: Any,
     ) -> None:
         """Apply an operation to all data inplace.
@@ -162,6 +285,14 @@ class Dataset:
         Args:
             operation (Callable[[Any], OperationResult]): Any operation that
                 changes data in place. See recon.operations.registry.operations
+            n_workers (int, optional): Number of worker processes to run the operation
+                with. Shards of chunk_size examples are processed in parallel and merged
+                back in order. The operation and its preprocessors have to be picklable
+            chunk_size (int, optional): Number of examples in a shard if n_workers > 1
+            cache (bool, optional): Reuse and record results in the operation cache so
+                examples the operation was already applied to aren't processed again.
+                Only use it if the results of the operation only depend on its input
+                example and kwargs. See `recon.cache`
         """
         if isinstance(operation, str):
             operation = registry.operations.get(operation)
@@ -174,10 +305,22 @@ class Dataset:
 
         msg = Printer(no_print=not self._verbose)
         msg.text(f"=> Applying operation '{name}' to dataset '{self.name}'")
-        result: OperationResult = operation(self, *args, initial_state=initial_state, verbose=self._verbose, **kwargs)  # type: ignore
+        result: OperationResult = operation(  # type: ignore
+            self,
+            *args,
+            initial_state=initial_state,
+            verbose=self._verbose,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+            cache=cache,
+            **kwargs,
+        )
         msg.good(f"Completed operation '{name}'")
 
+        old_leaves = self._commit_tree.leaves if self._commit_tree is not None else None
         self._operations.append(result.state)
+        self._count_history_refs(added=[result.state], removed=self._undone)
+        self._undone = []
         dataset_changed = any(
             (
                 result.state.examples_added,
@@ -186,15 +329,31 @@ class Dataset:
             )
         )
         if dataset_changed:
-            self._data = result.data
+            self._set_data(result.data, result.example_hashes)
+            self._update_stats([result.state], old_leaves)
 
-    def pipe_(self, operations: List[Union[str, OperationState]]) -> None:
+    def pipe_(
+        self,
+        operations: List[Union[str, OperationState]],
+        fuse: bool = True,
+        chunk_size: int = 1000,
+        cache: bool = False,
+    ) -> None:
         """Run a sequence of operations on dataset data.
-        Internally calls Dataset.apply_ and will resolve named
-        operations in registry.operations
+        Resolves named operations in registry.operations. Consecutive operations
+        are fused into a single pass over the data (see
+        `recon.operations.core.run_fused`), other callables are applied with
+        Dataset.apply_. Each operation is recorded in the history on its own
+        either way.
 
         Args:
             operations (List[Union[str, OperationState]]): List of operations
+            fuse (bool, optional): Fuse consecutive operations. If False, each
+                operation is applied with Dataset.apply_ in turn
+            chunk_size (int, optional): Number of examples fused operations
+                process at a time
+            cache (bool, optional): Use the operation cache for every operation.
+                See Dataset.apply_
         """
 
         msg = Printer(no_print=not self._verbose)
@@ -204,6 +363,7 @@ class Dataset:
             op_name = op.name if isinstance(op, OperationState) else op
             msg.text(f"|_ {op_name}")
 
+        steps: List[PipelineStep] = []
         for op in operations:
             if isinstance(op, str):
                 op_name = op
@@ -221,7 +381,54 @@ class Dataset:
                 )
 
             operation = registry.operations.get(op_name)
-            self.apply_(operation, *args, initial_state=initial_state, **kwargs)
+            if fuse and isinstance(operation, Operation):
+                steps.append(PipelineStep(operation, tuple(args), kwargs, initial_state))
+                continue
+            self._pipe_fused(steps, chunk_size, cache)
+            steps = []
+            self.apply_(operation, *args, initial_state=initial_state, cache=cache, **kwargs)
+        self._pipe_fused(steps, chunk_size, cache)
+
+    def _pipe_fused(self, steps: List[PipelineStep], chunk_size: int, cache: bool) -> None:
+        """Apply the operations of steps in a single pass and record each of them
+
+        Args:
+            steps (List[PipelineStep]): Operations to fuse
+            chunk_size (int): Number of examples processed at a time
+            cache (bool): Use the operation cache
+        """
+        if not steps:
+            return
+        if len(steps) == 1:
+            step = steps[0]
+            self.apply_(
+                step.operation,
+                *step.args,
+                initial_state=step.initial_state,
+                cache=cache,
+                **step.kwargs,
+            )
+            return
+
+        msg = Printer(no_print=not self._verbose)
+        names = ", ".join(f"'{step.operation.name}'" for step in steps)
+        msg.text(f"=> Applying fused operations {names} to dataset '{self.name}'")
+        data, example_hashes, states = run_fused(
+            self, steps, verbose=self._verbose, chunk_size=chunk_size, cache=cache
+        )
+        msg.good(f"Completed operations {names}")
+
+        old_leaves = self._commit_tree.leaves if self._commit_tree is not None else None
+        self._operations.extend(states)
+        self._count_history_refs(added=states, removed=self._undone)
+        self._undone = []
+        dataset_changed = any(
+            (state.examples_added, state.examples_removed, state.examples_changed)
+            for state in states
+        )
+        if dataset_changed:
+            self._set_data(data, example_hashes)
+            self._update_stats(states, old_leaves)
 
     def rollback(self, n: int = 1) -> None:
         """Rollback the last n operations on a dataset.
@@ -238,6 +445,8 @@ class Dataset:
             hash(ds) == initial_ds_hash
             >>> True # This should be True
 
+        Operations undone by `Dataset.checkout` are discarded as well.
+
         Args:
             n (int): Number of operations to rollback
         """
@@ -249,47 +458,568 @@ class Dataset:
                 f"Cannot rollback dataset: provided n ({n}) is larger than the total number of dataset operations."
             )
 
+        operations = self.operations[-n:]
+        examples_to_remove = set()
+        for op in operations + self._undone:
+            for t in op.transformations:
+                if t.type in (TransformationType.EXAMPLE_ADDED, TransformationType.EXAMPLE_CHANGED):
+                    examples_to_remove.add(t.example)
+
+        old_leaves = self._get_commit_tree().leaves
+        if all(self._has_hunks(op) for op in operations):
+            for op in reversed(operations):
+                self._apply_hunks(op.hunks, undo=True)
+        else:
+            self._rollback_transformations(operations)
+        self._update_stats(operations, old_leaves, undo=True)
+        self._count_history_refs(removed=operations + self._undone)
+        self._operations = self.operations[:-n]
+        self._undone = []
+        self._example_store.release(examples_to_remove)  # type: ignore
+
+    def _rollback_transformations(self, operations: List[OperationState]) -> None:
+        """Rollback operations saved without DataHunks from their Transformation records.
+        Examples removed by the operations are restored at the end of the data.
+
+        Changes of examples produced by an earlier operation of the rollback are
+        resolved back to the revision before the first operation.
+
+        Args:
+            operations (List[OperationState]): Operations to rollback in the order
+                they were applied
+        """
         store = self.example_store
         examples_to_remove = set()
-        examples_to_add = []
+        hashes_to_add = []
 
-        for op in self.operations[-n:]:
+        for op in operations:
             for t in op.transformations:
                 if t.type == TransformationType.EXAMPLE_ADDED:
                     examples_to_remove.add(t.example)
                 elif t.type == TransformationType.EXAMPLE_CHANGED:
+                    if t.prev_example not in examples_to_remove:
+                        hashes_to_add.append(t.prev_example)
                     examples_to_remove.add(t.example)
-                    examples_to_add.append(store[t.prev_example])  # type: ignore
                 elif t.type == TransformationType.EXAMPLE_REMOVED:
-                    examples_to_add.append(store[t.prev_example])  # type: ignore
+                    if t.prev_example not in examples_to_remove:
+                        hashes_to_add.append(t.prev_example)
+
+        old_data = new_data_like(self.data)
+        old_hashes = []
+        for example, example_hash in zip(self.data, self._get_commit_tree().leaves):
+            if example_hash not in examples_to_remove:
+                old_data.append(example)
+                old_hashes.append(example_hash)
+        old_data.extend(store[h] for h in hashes_to_add)  # type: ignore
+        old_hashes += hashes_to_add  # type: ignore
+
+        self._set_data(finish_data(old_data), old_hashes)
+
+    @property
+    def history(self) -> List[OperationState]:
+        """All operations of the Dataset, including operations undone by `Dataset.checkout`
+        that can be redone by checking out a later point in the history.
+
+        Returns:
+            List[OperationState]: Applied operations followed by undone operations
+        """
+        return self._operations + self._undone
+
+    def checkout(self, commit_or_index: Union[int, str]) -> None:
+        """Move the Dataset to any point in its operation history.
+        Operations are undone and redone from the DataHunks recorded when they were
+        applied and the examples in the ExampleStore, so moving costs time in the
+        number of changed examples instead of running operations again.
+        Undone operations are kept until a new operation is applied or the Dataset
+        is rolled back.
+
+        e.g.
+            ```
+            ds.pipe_(["recon.upcase_labels.v1", "recon.strip_annotations.v1"])
+            ds.checkout(1)  # Data after the first operation
+            ds.checkout(2)  # Data after both operations
+            ```
+
+        Args:
+            commit_or_index (Union[int, str]): Number of operations of `Dataset.history`
+                to apply, or a commit hash the Dataset had at a point in its history
+
+        Raises:
+            ValueError: If the index or commit is not in the history of the Dataset
+                or an operation in between was saved without DataHunks
+        """
+        start, end = self._checkout_range()
+        if isinstance(commit_or_index, str):
+            self._checkout_commit(commit_or_index, start, end)
+            return
+
+        index = commit_or_index
+        if not 0 <= index <= len(self.history):
+            raise ValueError(
+                f"Cannot checkout index {index}, the Dataset has {len(self.history)} operations."
+            )
+        if not start <= index <= end:
+            raise ValueError(
+                f"Cannot checkout index {index}. Operations between it and the current "
+                "data were saved without DataHunks and can only be rolled back."
+            )
+        self._move_to(index)
+
+    def _checkout_commit(self, commit: str, start: int, end: int) -> None:
+        current = len(self._operations)
+        if self.commit_hash == commit:
+            return
+        for index in list(range(current - 1, start - 1, -1)) + list(range(current + 1, end + 1)):
+            self._move_to(index)
+            if self.commit_hash == commit:
+                return
+        self._move_to(current)
+        raise ValueError(f"Commit {commit} is not in the history of Dataset '{self.name}'.")
+
+    def _checkout_range(self) -> Tuple[int, int]:
+        """Range of indices `Dataset.checkout` can move to from the current data"""
+        start = len(self._operations)
+        while start > 0 and self._has_hunks(self._operations[start - 1]):
+            start -= 1
+        end = len(self._operations)
+        history = self.history
+        while end < len(history) and self._has_hunks(history[end]):
+            end += 1
+        return start, end
+
+    def _move_to(self, index: int) -> None:
+        while len(self._operations) > index:
+            op = self._operations[-1]
+            old_leaves = self._get_commit_tree().leaves
+            self._apply_hunks(op.hunks, undo=True)
+            self._update_stats([op], old_leaves, undo=True)
+            self._operations = self._operations[:-1]
+            self._undone = [op] + self._undone
+        while len(self._operations) < index:
+            op = self._undone[0]
+            old_leaves = self._get_commit_tree().leaves
+            self._apply_hunks(op.hunks)
+            self._update_stats([op], old_leaves)
+            self._operations = self._operations + [op]
+            self._undone = self._undone[1:]
+
+    @staticmethod
+    def _has_hunks(op: OperationState) -> bool:
+        changed = op.examples_added or op.examples_removed or op.examples_changed
+        return bool(op.hunks) or not changed
+
+    def _apply_hunks(self, hunks: List[DataHunk], undo: bool = False) -> None:
+        """Apply the DataHunks of an operation to the data or undo them.
+        Unchanged runs of examples are copied as slices, only changed examples
+        are looked up in the ExampleStore.
+
+        Args:
+            hunks (List[DataHunk]): DataHunks of an operation in order of `at`
+            undo (bool, optional): Undo the hunks instead of applying them
+
+        Raises:
+            ValueError: If the data doesn't match the hunks or an example
+                is no longer in the ExampleStore
+        """
+        data = self.data
+        keys = self._get_commit_tree().leaves
+        new_data = new_data_like(data)
+        new_keys: List[int] = []
+        prev = 0
+        shift = 0
+        for hunk in hunks:
+            at, delete, insert = hunk.at, hunk.delete, hunk.insert
+            if undo:
+                # Positions of the hunk in the data after the operation
+                at, delete, insert = at + shift, insert, delete
+                shift += len(hunk.insert) - len(hunk.delete)
+            end = at + len(delete)
+            if keys[at:end] != delete:
+                raise ValueError(
+                    f"Data of Dataset '{self.name}' doesn't match its operation history."
+                )
+            copy_data(new_data, data, prev, at)
+            new_keys.extend(keys[prev:at])
+            deleted = dict(zip(delete, data[at:end]))
+            for example_hash in insert:
+                if example_hash in deleted:
+                    new_data.append(deleted[example_hash])
+                elif example_hash in self.example_store:
+                    new_data.append(self.example_store[example_hash])
+                else:
+                    raise ValueError(
+                        f"Example {example_hash} is not in the ExampleStore. "
+                        "It may have been removed by ExampleStore.compact."
+                    )
+            new_keys.extend(insert)
+            prev = end
+        copy_data(new_data, data, prev, len(data))
+        new_keys.extend(keys[prev:])
+        self._set_data(finish_data(new_data), new_keys)
+
+    def _update_stats(
+        self,
+        operations: List[OperationState],
+        old_leaves: Optional[List[int]],
+        undo: bool = False,
+    ) -> None:
+        """Update the cached stats after operations changed the data. The changed
+        examples are looked up in the ExampleStore from the transformations of the
+        operations. The cache is dropped if it wasn't for the data before the operations
+        or an example is no longer in the ExampleStore.
+
+        Args:
+            operations (List[OperationState]): Operations that changed the data
+            old_leaves (Optional[List[int]]): CommitTree leaves before the operations
+            undo (bool, optional): The operations were undone instead of applied
+        """
+        if self._stats is None or self._stats_leaves is not old_leaves:
+            self._stats = None
+            return
+        store = self.example_store
+        added: List[Example] = []
+        removed: List[Example] = []
+        try:
+            for op in operations:
+                for t in op.transformations:
+                    if t.type != TransformationType.EXAMPLE_REMOVED:
+                        added.append(store[cast(int, t.example)])
+                    if t.type != TransformationType.EXAMPLE_ADDED:
+                        removed.append(store[cast(int, t.prev_example)])
+        except KeyError:
+            self._stats = None
+            return
+        if undo:
+            added, removed = removed, added
+        self._stats = update_ner_stats(self._stats, added, removed)
+        self._stats_leaves = self._get_commit_tree().leaves
+
+    def example_keys(self, history: Optional[int] = None) -> Set[int]:
+        """Keys of the examples this Dataset references in its ExampleStore.
+        These are the keys of the current data and of every example in the
+        transformations of the last `history` operations.
+
+        Args:
+            history (Optional[int], optional): Number of most recent operations
+                to include. Defaults to all operations
+
+        Returns:
+            Set[int]: Referenced example keys
+        """
+        keys = set(self._get_commit_tree().leaves)
+        operations = self.operations
+        if history is not None:
+            operations = operations[max(len(operations) - history, 0) :]
+        # Undone operations can still be redone by Dataset.checkout
+        for op in operations + self._undone:
+            for t in op.transformations:
+                if t.example is not None:
+                    keys.add(t.example)
+                if t.prev_example is not None:
+                    keys.add(t.prev_example)
+        return keys
+
+    def _references(self, example_hash: int) -> bool:
+        """Whether the data or the history of the Dataset references an example.
+        Looks the key up in the reference counts of the history and the hash index of
+        the data, so nothing is hashed again. Used by `ExampleStore.release`.
 
-        old_data = [e for e in self.data if hash(e) not in examples_to_remove]
-        old_data += examples_to_add
+        Args:
+            example_hash (int): Example key
 
-        self._data = old_data
-        self._operations = self.operations[:-1]
-        for e in examples_to_remove:
-            del self._example_store._map[e]  # type: ignore
+        Returns:
+            bool: Whether the example is referenced
+        """
+        if example_hash in self._get_history_refs():
+            return True
+        tree = self._commit_tree if self._commit_tree is not None else self._get_commit_tree()
+        return example_hash in self._hash_index_for(tree.leaves)
 
-    def search(self, search_query: str, case_sensitive: bool = True) -> List[Example]:
-        """Naive search method to quickly identify examples matching the provided substring
+    def _get_history_refs(self) -> Dict[int, int]:
+        """Number of references to each example key in the transformations of
+        `Dataset.history`. Counted on first access and updated as operations are
+        applied and rolled back.
+
+        Returns:
+            Dict[int, int]: Mapping of example key to its number of references
+        """
+        if self._history_refs is None:
+            self._history_refs = {}
+            self._count_history_refs(added=self.history)
+        return self._history_refs
+
+    def _count_history_refs(
+        self, added: List[OperationState] = [], removed: List[OperationState] = []
+    ) -> None:
+        """Update the history reference counts for operations added to and removed
+        from `Dataset.history`
+
+        Args:
+            added (List[OperationState], optional): Operations added to the history
+            removed (List[OperationState], optional): Operations removed from the history
+        """
+        refs = self._history_refs
+        if refs is None:
+            return
+        for operations, sign in ((added, 1), (removed, -1)):
+            for op in operations:
+                for t in op.transformations:
+                    for example_hash in (t.example, t.prev_example):
+                        if example_hash is None:
+                            continue
+                        count = refs.get(example_hash, 0) + sign
+                        if count > 0:
+                            refs[example_hash] = count
+                        else:
+                            refs.pop(example_hash, None)
+
+    def _set_data(
+        self, data: Sequence[Example], example_hashes: Optional[List[int]] = None
+    ) -> None:
+        """Replace the data of the Dataset.
+
+        Args:
+            data (Sequence[Example]): New data, a list or an ExampleSegment
+            example_hashes (Optional[List[int]], optional): example.key for each example
+                in data if already known. Used to update the commit and the hash index
+                incrementally.
+        """
+        # ExampleSegments stand in for the list of examples returned by Dataset.data
+        self._data = cast(List[Example], data)
+        if example_hashes is None:
+            self._commit_tree = None
+            self._hash_index = None
+            return
+        if self._commit_tree is not None:
+            old_leaves = self._commit_tree.leaves
+            self._commit_tree.update(example_hashes)
+            self._update_hash_index(old_leaves, example_hashes)
+        else:
+            self._commit_tree = CommitTree(self.name, example_hashes, version=get_hash_version())
+        self._commit_tree_key = (id(data), get_hash_version())
+
+    def _get_commit_tree(self) -> CommitTree:
+        """Get the CommitTree over the hash of each example in the Dataset.
+        The tree is built on first access and updated from the example hashes
+        Dataset.apply_, Dataset.rollback and Dataset.checkout already computed, so
+        reading it doesn't hash any examples. Examples added to or removed from the
+        data list in place are picked up from its length, call `Dataset.refresh`
+        after editing examples in place.
+
+        Returns:
+            CommitTree: CommitTree for the current data
+        """
+        tree = self._commit_tree
+        if (
+            tree is None
+            or self._commit_tree_key != (id(self._data), get_hash_version())
+            or len(tree.leaves) != len(self._data)
+        ):
+            self.refresh()
+            tree = cast(CommitTree, self._commit_tree)
+        return tree
+
+    def refresh(self, positions: Optional[Iterable[int]] = None) -> None:
+        """Update the commit, the hash index and the stats of the Dataset after
+        examples in its data were edited in place. Only chunks of the CommitTree
+        with changed example hashes are digested again.
+
+        e.g.
+            ```
+            ds.data[0].spans[0].label = "SKILL"
+            ds.refresh([0])
+            ```
+
+        Args:
+            positions (Optional[Iterable[int]], optional): Positions in the data of
+                the edited examples. Defaults to hashing every example again
+        """
+        key = (id(self._data), get_hash_version())
+        tree = self._commit_tree
+        if tree is None or self._commit_tree_key is None or self._commit_tree_key[1] != key[1]:
+            leaves = self._hash_data(self._data)
+            self._commit_tree = CommitTree(self.name, leaves, version=get_hash_version())
+        else:
+            old_leaves = tree.leaves
+            if (
+                positions is None
+                or self._commit_tree_key != key
+                or len(old_leaves) != len(self._data)
+            ):
+                leaves = self._hash_data(self._data)
+            else:
+                leaves = list(old_leaves)
+                for i in positions:
+                    leaves[i] = self._data[i].key
+            if leaves != old_leaves:
+                tree.update(leaves)
+                self._update_hash_index(old_leaves, leaves)
+        self._commit_tree_key = key
+
+    def _get_v1_commit(self) -> str:
+        """Get the commit for hash version 1, a hash over the hash of every example
+        in order. It's computed once for the leaves of the current CommitTree.
+
+        Returns:
+            str: Commit hash
+        """
+        leaves = self._get_commit_tree().leaves
+        if self._v1_commit is None or self._v1_commit[0] is not leaves:
+            self._v1_commit = (leaves, cast(str, dataset_hash(self, as_int=False)))
+        return self._v1_commit[1]
+
+    @staticmethod
+    def _hash_data(data: Sequence[Example]) -> List[int]:
+        """Compute example.key for each example in data. The data of a streaming
+        Dataset is hashed a chunk at a time.
+
+        Args:
+            data (Sequence[Example]): Examples to hash
+
+        Returns:
+            List[int]: example.key for each example
+        """
+        return [hash_key(cast(int, h)) for chunk in iter_chunks(data) for h in hash_many(chunk)]
+
+    def _get_hash_index(self) -> Dict[int, int]:
+        """Get the index of the first position of each example hash in the data.
+        The index is built from the CommitTree leaves on first access and updated
+        incrementally when Dataset.apply_ changes examples without changing the
+        number of examples. Other changes rebuild it from the leaves, examples are
+        never hashed again to build it.
+
+        Returns:
+            Dict[int, int]: Mapping of example.key to its position in data
+        """
+        return self._hash_index_for(self._get_commit_tree().leaves)
+
+    def _hash_index_for(self, leaves: List[int]) -> Dict[int, int]:
+        """Get the hash index for leaves of the CommitTree, building it if the
+        current index isn't for them"""
+        if self._hash_index is None or self._hash_index_leaves is not leaves:
+            index: Dict[int, int] = {}
+            dups = set()
+            for i, example_hash in enumerate(leaves):
+                if index.setdefault(example_hash, i) != i:
+                    dups.add(example_hash)
+            self._hash_index = index
+            self._hash_index_leaves = leaves
+            self._hash_index_dups = dups
+        return self._hash_index
+
+    def _update_hash_index(self, old_leaves: List[int], leaves: List[int]) -> None:
+        """Update the hash index for leaves replacing old_leaves in the CommitTree.
+        Only positions in chunks of the CommitTree that changed are compared.
+
+        Args:
+            old_leaves (List[int]): Example hashes the index was built for
+            leaves (List[int]): New example hashes
+        """
+        index = self._hash_index
+        if index is None or self._hash_index_leaves is not old_leaves:
+            return
+        if len(leaves) != len(old_leaves):
+            # Positions shifted, rebuild on next access
+            self._hash_index = None
+            return
+
+        dups = self._hash_index_dups
+        removed = []
+        cs = cast(CommitTree, self._commit_tree).chunk_size
+        for start in range(0, len(leaves), cs):
+            if leaves[start : start + cs] == old_leaves[start : start + cs]:
+                continue
+            for i in range(start, min(start + cs, len(leaves))):
+                old, new = old_leaves[i], leaves[i]
+                if old == new:
+                    continue
+                if index.get(old) == i:
+                    del index[old]
+                    removed.append(old)
+                first = index.setdefault(new, i)
+                if first != i:
+                    dups.add(new)
+                    if first > i:
+                        index[new] = i
+        for example_hash in removed:
+            if example_hash in dups:
+                # Another position may still have the removed hash
+                index.pop(example_hash, None)
+                try:
+                    index[example_hash] = leaves.index(example_hash)
+                except ValueError:
+                    pass
+        self._hash_index_leaves = leaves
+
+    def search(
+        self,
+        search_query: str,
+        case_sensitive: bool = True,
+        mode: str = "substring",
+        label: Optional[str] = None,
+        span_text: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> List[Example]:
+        """Search method to quickly identify examples matching the provided substring
 
         Args:
             search_query (str): Substring to search each example for
             case_sensitive (bool, optional): Consider case of search query and example text
+            mode (str, optional): How search_query is matched. One of "substring",
+                "phrase", "prefix" or "regex". See `recon.search.SearchIndex.search`
+            label (Optional[str], optional): Only match examples with a span with this label
+            span_text (Optional[str], optional): Only match examples with a span with this text
+            meta (Optional[Dict[str, Any]], optional): Only match examples with these meta values
 
         Returns:
             List[Example]: Matched examples
         """
-        search_query = search_query if case_sensitive else search_query.lower()
-        out_examples = []
+        return list(
+            self.iter_search(
+                search_query,
+                case_sensitive=case_sensitive,
+                mode=mode,
+                label=label,
+                span_text=span_text,
+                meta=meta,
+            )
+        )
+
+    def iter_search(
+        self,
+        search_query: str,
+        case_sensitive: bool = True,
+        mode: str = "substring",
+        label: Optional[str] = None,
+        span_text: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Example]:
+        """Lazy version of `Dataset.search`. Queries use an inverted index over
+        the data that is built on the first search for the current commit.
 
-        for example in self.data:
-            example_text = example.text if case_sensitive else example.text.lower()
-            if search_query in example_text:
-                out_examples.append(example)
+        Args:
+            search_query (str): Substring to search each example for
+            case_sensitive (bool, optional): Consider case of search query and example text
+            mode (str, optional): How search_query is matched. See `Dataset.search`
+            label (Optional[str], optional): Only match examples with a span with this label
+            span_text (Optional[str], optional): Only match examples with a span with this text
+            meta (Optional[Dict[str, Any]], optional): Only match examples with these meta values
 
-        return out_examples
+        Returns:
+            Iterator[Example]: Matched examples in data order
+        """
+        leaves = self._get_commit_tree().leaves
+        if self._search_index is None or self._search_index_leaves is not leaves:
+            self._search_index = SearchIndex(self.data)
+            self._search_index_leaves = leaves
+        return self._search_index.search(
+            search_query,
+            case_sensitive=case_sensitive,
+            mode=mode,
+            label=label,
+            span_text=span_text,
+            meta=meta,
+        )
 
     def set_example_store(self, example_store: ExampleStore) -> None:
         """Overwrite the the internal ExampleStore. You probably don't want to call this.
@@ -299,8 +1029,15 @@ class Dataset:
             example_store (ExampleStore): ExampleStore to overwrite with
         """
         self._example_store = example_store
+        example_store.register(self)
 
-    def from_disk(self, path: Union[str, Path]) -> "Dataset":
+    def from_disk(
+        self,
+        path: Union[str, Path],
+        trusted: bool = False,
+        streaming: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> "Dataset":
         """Load Dataset from disk given a path and a loader function that reads the data
         and returns an iterator of Examples
 
@@ -308,26 +1045,85 @@ class Dataset:
             path (Path): path to load from
             loader_func (Callable, optional): Callable that reads a file and returns a List of examples.
                 Defaults to [read_jsonl][recon.loaders.read_jsonl]
+            trusted (bool, optional): Skip validation when loading data saved by recon.
+                Only applies if the saved state has recon's format marker. The dataset
+                commit is still checked so changes to the data are detected.
+            streaming (bool, optional): Keep the data on disk in an ExampleSegment that is
+                read chunk_size examples at a time instead of loading it into a list.
+                Operations write their output to a new segment. If the Dataset still has
+                its own empty in memory ExampleStore, it's replaced by a DiskExampleStore.
+                See `recon.stream`
+            chunk_size (int, optional): Number of examples read at a time if streaming
         """
         path = ensure_path(path)
-        state = None
+        store = self._example_store
+        if streaming and type(store) is ExampleStore and not len(store) and store.owners == [self]:
+            self.set_example_store(DiskExampleStore())
+        state: Optional[DatasetOperationsState] = None
+        journal: List[Dict[str, Any]] = []
+        state_path = path / ".recon" / self.name / "state.json"
         if (path / ".recon" / self.name).exists():
-            state = cast(
-                Dict[str, Any], srsly.read_json(path / ".recon" / self.name / "state.json")
-            )
-            state = DatasetOperationsState(**state)
+            state_data = cast(Dict[str, Any], srsly.read_json(state_path))
+            state = DatasetOperationsState(**state_data)
+            journal = read_journal(state_path)
+            for entry in journal:
+                state.operations = state.operations[: entry["operations"]["keep"]] + [
+                    OperationState(**op) for op in entry["operations"]["append"]
+                ]
+                state.commit = entry["commit"]
+                state.size = entry["size"]
+                state.hash_version = entry["hash_version"]
+            if state.hash_version != get_hash_version():
+                raise ValueError(
+                    f"Dataset '{self.name}' was saved with hash version {state.hash_version} "
+                    f"but the active hash version is {get_hash_version()}. "
+                    "Use recon.migrate.migrate_hashes to rewrite the saved hashes."
+                )
             self._operations = state.operations
+            self._undone = []
+            self._history_refs = None
+            trusted = trusted and state.format == RECON_DATA_FORMAT
 
-            example_store_path = path / ".recon" / self.name / "example_store.jsonl"
-            if example_store_path.exists():
-                self._example_store.from_disk(example_store_path)
-
-        data = read_jsonl(path / f"{self.name}.jsonl")
-        self._data = data
+            example_store_path = find_record_file(
+                path / ".recon" / self.name, "example_store", STORE_FORMATS
+            )
+            if example_store_path:
+                self._example_store.from_disk(example_store_path, trusted=trusted)
+            operation_cache_path = path / ".recon" / self.name / OPERATION_CACHE_FILE
+            if operation_cache_path.exists():
+                self._operation_cache.from_disk(operation_cache_path)
+        else:
+            trusted = False
+
+        data_path = find_record_file(path, self.name) or path / f"{self.name}.jsonl"
+        data: Sequence[Example]
+        if streaming:
+            data = read_segment(data_path, trusted=trusted, chunk_size=chunk_size)
+        else:
+            data = read_jsonl(data_path, trusted=trusted)
+        example_hashes = self._hash_data(data)
+        if journal:
+            positions = dict(zip(example_hashes, range(len(data))))
+            for entry in journal:
+                example_hashes = apply_diff(example_hashes, entry["data"])
+            new_data = new_data_like(data)
+            for h in example_hashes:
+                new_data.append(data[positions[h]] if h in positions else self._example_store[h])
+            data = finish_data(new_data)
+        self._set_data(data, example_hashes)
 
         for example in self._data:
             self._example_store.add(example)
 
+        if state:
+            self._saved = SavedState(
+                state_path.resolve(),
+                state.hash_version,
+                len(journal),
+                example_hashes,
+                list(self._operations),
+            )
+
         if state and self.commit_hash != state.commit:
             # Dataset changed, examples added
             self._operations.append(
@@ -343,7 +1139,7 @@ class Dataset:
             )
 
             for op in self._operations:
-                op._status = OperationStatus.NOT_STARTED
+                op.status = OperationStatus.NOT_STARTED
 
         operations_to_run: Dict[str, OperationState] = {}
         for op in self._operations:
@@ -354,14 +1150,21 @@ class Dataset:
             ):
                 operations_to_run[op.name] = op
 
-        for op_name, state in operations_to_run.items():
+        # Replayed operations only process examples without a cached result
+        for op_name, op_state in operations_to_run.items():
             op = registry.operations.get(op_name)
-            self.apply_(op, *state.args, initial_state=state, **state.kwargs)  # type: ignore
+            self.apply_(op, *op_state.args, initial_state=op_state, cache=True, **op_state.kwargs)  # type: ignore
 
         return self
 
     def to_disk(
-        self, output_dir: Union[str, Path], overwrite: bool = False, save_examples: bool = True
+        self,
+        output_dir: Union[str, Path],
+        overwrite: bool = False,
+        save_examples: bool = True,
+        journal: bool = False,
+        file_format: str = ".jsonl",
+        store_format: Optional[str] = None,
     ) -> None:
         """Save Corpus to Disk
 
@@ -370,9 +1173,35 @@ class Dataset:
             overwrite (bool): Force save to directory. Create parent directories
                 or overwrite existing data.
             save_examples (bool): Save the example store along with the state.
+            journal (bool): If the Dataset was last saved to or loaded from output_dir,
+                only append the new operations and the examples added and removed
+                since then to a journal instead of rewriting the saved data.
+                A full checkpoint is written once the journal has
+                JOURNAL_MAX_ENTRIES entries. See `recon.journal`
+            file_format (str): Format of the data and example store files,
+                one of `recon.formats.RECORD_FORMATS`, e.g. ".jsonl.gz" or ".msgpack".
+                Journaled saves keep the format of the saved checkpoint.
+            store_format (Optional[str]): Format of the example store file, one of
+                `recon.store.STORE_FORMATS`. Defaults to file_format. Use ".bin" to
+                save a binary store that can be loaded by a MmapExampleStore
         """
+        store_format = store_format or file_format
+        if file_format not in RECORD_FORMATS:
+            raise ValueError(
+                f"Unsupported file_format: {file_format}. Use one of: {', '.join(RECORD_FORMATS)}"
+            )
+        if store_format not in STORE_FORMATS:
+            raise ValueError(
+                f"Unsupported store_format: {store_format}. Use one of: {', '.join(STORE_FORMATS)}"
+            )
         output_dir = ensure_path(output_dir)
         state_dir = output_dir / ".recon" / self.name
+        state_path = state_dir / "state.json"
+        if journal and can_journal(self._saved, state_path, get_hash_version()):
+            self._append_journal(state_path, save_examples)
+            self._operation_cache.to_disk(state_dir / OPERATION_CACHE_FILE)
+            return
+
         if not overwrite and output_dir.exists():
             raise ValueError(
                 "Output directory is not empty. Set overwrite=True in Dataset.to_disk to clear the directory before saving."
@@ -383,16 +1212,80 @@ class Dataset:
             state_dir.mkdir(parents=True, exist_ok=True)
 
         state = DatasetOperationsState(
-            name=self.name, commit=self.commit_hash, size=len(self), operations=self.operations
+            name=self.name,
+            commit=self.commit_hash,
+            size=len(self),
+            operations=self.operations,
+            hash_version=get_hash_version(),
+            format=RECON_DATA_FORMAT,
         )
-        srsly.write_json(state_dir / "state.json", state.dict())
 
         if save_examples:
-            self.example_store.to_disk(state_dir / "example_store.jsonl")
+            example_store_path = state_dir / f"example_store{store_format}"
+            self.example_store.to_disk(example_store_path, journal=journal)
+            remove_record_files(state_dir, "example_store", example_store_path, STORE_FORMATS)
+
+        data_path = output_dir / f"{self.name}{file_format}"
+        write_records(data_path, (e.serialize(exclude_unset=True) for e in self.data))
+        remove_record_files(output_dir, self.name, keep=data_path)
+        srsly.write_json(state_path, state.to_json())
+        self._operation_cache.to_disk(state_dir / OPERATION_CACHE_FILE)
+        clear_journal(state_path)
+        self._saved = SavedState(
+            state_path.resolve(),
+            get_hash_version(),
+            0,
+            list(self._get_commit_tree().leaves),
+            list(self.operations),
+        )
+
+    def _append_journal(self, state_path: Path, save_examples: bool) -> None:
+        """Append the changes since the last save to the journal of the saved state.
+        Examples added to the data are added to the ExampleStore so the data can
+        be restored from the store when the journal is replayed.
 
-        srsly.write_jsonl(
-            output_dir / f"{self.name}.jsonl", [e.dict(exclude_unset=True) for e in self.data]
+        Args:
+            state_path (Path): Path of the saved state.json
+            save_examples (bool): Append the changes to the example store to its journal
+        """
+        saved = cast(SavedState, self._saved)
+        example_hashes = list(self._get_commit_tree().leaves)
+        hunks = diff_keys(saved.example_hashes, example_hashes)
+        inserted = {int(h) for hunk in hunks for h in hunk["insert"]}
+        for example, example_hash in zip(self.data, example_hashes):
+            if example_hash in inserted and example_hash not in self.example_store:
+                self.example_store.add(example)
+        if save_examples:
+            example_store_path = (
+                find_record_file(state_path.parent, "example_store", STORE_FORMATS)
+                or state_path.parent / "example_store.jsonl"
+            )
+            self.example_store.to_disk(example_store_path, journal=True)
+
+        keep = 0
+        for saved_op, op in zip(saved.operations, self.operations):
+            if saved_op is not op:
+                break
+            keep += 1
+        if not hunks and keep == len(saved.operations) == len(self.operations):
+            return
+
+        append_journal(
+            state_path,
+            {
+                "commit": self.commit_hash,
+                "size": len(self),
+                "hash_version": get_hash_version(),
+                "operations": {
+                    "keep": keep,
+                    "append": [op.to_json() for op in self.operations[keep:]],
+                },
+                "data": hunks,
+            },
         )
+        saved.n_entries += 1
+        saved.example_hashes = example_hashes
+        saved.operations = list(self.operations)
 
     def from_prodigy(self, prodigy_datasets: List[str]) -> "Dataset":
         """Need to have from_prodigy accept multiple datasets as a list of str so Prodigy
@@ -412,7 +1305,7 @@ class Dataset:
         data = []
         for prodigy_dataset in prodigy_datasets:
             data += from_prodigy(prodigy_dataset)
-        self._data = data
+        self._set_data(data)
         return self
 
     def to_prodigy(self, prodigy_dataset: Optional[str] = None, overwrite: bool = True) -> str:
@@ -444,7 +1337,7 @@ class Dataset:
             Dataset: Initialized dataset with Prodigy data
         """
         data = from_spacy(path)
-        self._data = list(data)
+        self._set_data(list(data))
         return self
 
     def to_spacy(self, output_dir: Path) -> None:
@@ -480,7 +1373,6 @@ class Dataset:
                 Span(text=ent.text, start=ent.start_char, end=ent.end_char, label=ent.label_)
                 for ent in doc.ents
             ]
-            tokens = [Token(text=t.text, start=t.idx, end=t.idx + len(t), id=t.i) for t in doc]
-            examples.append(Example(text=doc.text, spans=spans, tokens=tokens))
-        self._data = examples
+            examples.append(Example(text=doc.text, spans=spans, tokens=Tokens.from_doc(doc)))
+        self._set_data(examples)
         return self
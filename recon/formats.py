@@ -0,0 +1,142 @@
+"""File formats for the records recon saves (Dataset data and ExampleStore records).
+The format of a file is detected from its extension:
+
+- `.jsonl`: Plain JSONL
+- `.jsonl.gz` / `.jsonl.zst`: gzip or zstd compressed JSONL
+- `.msgpack`: Stream of msgpack encoded records
+- `.msgpack.gz` / `.msgpack.zst`: gzip or zstd compressed msgpack stream
+
+Files are read and written as streams so they are never loaded whole.
+zstd compression requires the `zstandard` package (`pip install reconner[zstd]`).
+"""
+
+import gzip
+import io
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple, Union, cast
+
+import srsly
+
+from recon.utils import ensure_path
+
+RECORD_FORMATS = (".jsonl", ".jsonl.gz", ".jsonl.zst", ".msgpack", ".msgpack.gz", ".msgpack.zst")
+"""Supported record file extensions. The first is the default used to save data."""
+
+_CHUNK_SIZE = 1 << 16
+
+
+def record_format(path: Union[str, Path]) -> str:
+    """Get the record format of a file from its extension
+
+    Args:
+        path (Union[str, Path]): File path
+
+    Raises:
+        ValueError: If the extension isn't a supported record format
+
+    Returns:
+        str: Record format, one of RECORD_FORMATS
+    """
+    name = ensure_path(path).name
+    for fmt in sorted(RECORD_FORMATS, key=len, reverse=True):
+        if name.endswith(fmt):
+            return fmt
+    raise ValueError(
+        f"Unsupported record file: {name}. Supported extensions are: {', '.join(RECORD_FORMATS)}"
+    )
+
+
+def find_record_file(
+    directory: Path, stem: str, formats: Tuple[str, ...] = RECORD_FORMATS
+) -> Optional[Path]:
+    """Find a record file saved as {stem}{format} in directory in any record format
+
+    Args:
+        directory (Path): Directory to search
+        stem (str): File name without extension, e.g. "example_store"
+        formats (Tuple[str, ...], optional): Extensions to look for
+
+    Returns:
+        Optional[Path]: Path of the file if it exists
+    """
+    for fmt in formats:
+        path = directory / f"{stem}{fmt}"
+        if path.exists():
+            return path
+    return None
+
+
+def remove_record_files(
+    directory: Path, stem: str, keep: Path, formats: Tuple[str, ...] = RECORD_FORMATS
+) -> None:
+    """Remove files saved as {stem}{format} in directory in formats other than keep
+    so an older file in another format isn't found by `find_record_file` instead.
+
+    Args:
+        directory (Path): Directory the files are in
+        stem (str): File name without extension
+        keep (Path): Path of the file to keep
+        formats (Tuple[str, ...], optional): Extensions of the files to remove
+    """
+    for fmt in formats:
+        path = directory / f"{stem}{fmt}"
+        if path != keep and path.exists():
+            path.unlink()
+
+
+def _open(path: Path, mode: str) -> IO[bytes]:
+    fmt = record_format(path)
+    if fmt.endswith(".gz"):
+        return cast(IO[bytes], gzip.open(path, mode))
+    if fmt.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(
+                f"Reading or writing {path.name} requires the zstandard package. "
+                "Install it with `pip install reconner[zstd]`."
+            )
+        f = zstandard.open(path, mode)
+        # Buffer decompression so the reader supports line iteration
+        return cast(IO[bytes], io.BufferedReader(f) if "r" in mode else f)
+    return path.open(mode)
+
+
+def read_records(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Stream the records of a file in any record format
+
+    Args:
+        path (Union[str, Path]): File path
+
+    Yields:
+        Iterator[Dict[str, Any]]: Records
+    """
+    path = ensure_path(path)
+    with _open(path, "rb") as f:
+        if ".msgpack" in record_format(path):
+            unpacker = srsly.msgpack.Unpacker(raw=False)
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                unpacker.feed(chunk)
+                yield from unpacker
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield srsly.json_loads(line.decode("utf8"))
+
+
+def write_records(path: Union[str, Path], records: Iterable[Dict[str, Any]]) -> None:
+    """Stream records to a file in the record format of its extension
+
+    Args:
+        path (Union[str, Path]): File path
+        records (Iterable[Dict[str, Any]]): Records to write
+    """
+    path = ensure_path(path)
+    msgpack = ".msgpack" in record_format(path)
+    with _open(path, "wb") as f:
+        for record in records:
+            if msgpack:
+                f.write(srsly.msgpack_dumps(record))
+            else:
+                f.write(srsly.json_dumps(record).encode("utf8") + b"\n")
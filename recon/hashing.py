@@ -1,4 +1,20 @@
-from typing import TYPE_CHECKING, Callable, Tuple, Union
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 import xxhash
 
@@ -7,30 +23,102 @@ if TYPE_CHECKING:
     from recon.types import Example, PredictionError, Span, Token
 
 
-def token_hash(token: "Token", as_int: bool = True) -> Union[str, int]:
+HASH_VERSIONS = (1, 2, 3)
+"""Supported hash versions.
+
+1: Legacy encoding. Strings are utf-8 encoded and every other value is
+    converted with `bytes(value)`, which allocates a zero-filled buffer
+    the size of any int it's given.
+2: Compact encoding. Every value is written with a type tag, ints are
+    packed into fixed-width 8 byte words and strings are length prefixed.
+    Dataset commits are the root of a `CommitTree` over the example hashes
+    so they can be updated incrementally.
+3: Same as 2 with 128 bit xxh3_128 hashes instead of 64 bit xxh64 hashes.
+    Example keys in an ExampleStore use the full 128 bit hash so accidental
+    collisions are negligible even for stores with billions of examples.
+"""
+
+_HASH_FUNCTIONS: Dict[int, Callable] = {1: xxhash.xxh64, 2: xxhash.xxh64, 3: xxhash.xxh3_128}
+
+_hash_version: int = 1
+
+_FINGERPRINT_SEED = 0x5EC0
+
+_INT = struct.Struct("<q")
+_LEN = struct.Struct("<I")
+
+
+def get_hash_version() -> int:
+    """Get the hash version currently used for all recon hashes
+
+    Returns:
+        int: Active hash version
+    """
+    return _hash_version
+
+
+def set_hash_version(version: int) -> None:
+    """Set the hash version used for all recon hashes.
+    Hashes stored by a Dataset or Corpus on disk are tied to the version
+    they were created with, use `recon.migrate.migrate_hashes` to rewrite
+    existing data to a new version.
+
+    Args:
+        version (int): Hash version to use. See `HASH_VERSIONS`
+
+    Raises:
+        ValueError: If the version is not supported
+    """
+    global _hash_version
+    _hash_version = _check_hash_version(version)
+
+
+def _check_hash_version(version: Optional[int]) -> int:
+    if version is None:
+        return _hash_version
+    if version not in HASH_VERSIONS:
+        raise ValueError(
+            f"Unsupported hash version: {version}. Available versions are: {HASH_VERSIONS}"
+        )
+    return version
+
+
+def token_hash(
+    token: "Token", as_int: bool = True, version: Optional[int] = None
+) -> Union[str, int]:
     """Hash of Token type
 
     Args:
         token (Token): Token to hash
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: Token hash
     """
-    return _hash((token.text, token.start, token.end, token.id), as_int=as_int)
+    return _hash(_token_hash_data(token), as_int=as_int, version=version)
 
 
-def span_hash(span: "Span", as_int: bool = True) -> Union[str, int]:
+def span_hash(span: "Span", as_int: bool = True, version: Optional[int] = None) -> Union[str, int]:
     """Hash of Span type
 
     Args:
         span (Span): Span to hash
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: Span hash
     """
-    hash_data = (
+    return _hash(_span_hash_data(span), as_int=as_int, version=version)
+
+
+def _token_hash_data(token: "Token") -> Tuple:
+    return (token.text, token.start, token.end, token.id)
+
+
+def _span_hash_data(span: "Span") -> Tuple:
+    return (
         span.start,
         span.end,
         span.label,
@@ -38,76 +126,372 @@ def span_hash(span: "Span", as_int: bool = True) -> Union[str, int]:
         span.token_start if span.token_start else 0,
         span.token_end if span.token_end else 0,
     )
-    return _hash(hash_data, as_int=as_int)
 
 
-def example_hash(example: "Example", as_int: bool = True) -> Union[str, int]:
+def example_hash(
+    example: "Example", as_int: bool = True, version: Optional[int] = None
+) -> Union[str, int]:
     """Hash of Example type
 
     Args:
         example (Example): Example to hash
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: Example hash
     """
-    hash_data = (example.text,) + tuple((span_hash(span, as_int=False) for span in example.spans))
-    return _hash(hash_data, as_int=as_int)
+    hash_data = (example.text,) + tuple(
+        (_memoized_hash(span, span_hash, version) for span in example.spans)
+    )
+    return _hash(hash_data, as_int=as_int, version=version)
 
 
-def tokenized_example_hash(example: "Example", as_int: bool = True) -> Union[str, int]:
+def tokenized_example_hash(
+    example: "Example", as_int: bool = True, version: Optional[int] = None
+) -> Union[str, int]:
     """Hash of Example type including token data
 
     Args:
         example (Example): Example to hash
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: Example hash
     """
-    tokens = example.tokens or []
     hash_data = (
         (example.text,)
-        + tuple((span_hash(span, as_int=False) for span in example.spans))
-        + tuple((token_hash(token, as_int=False) for token in tokens))
+        + tuple((_memoized_hash(span, span_hash, version) for span in example.spans))
+        + (example.tokens.hashes(version) if example.tokens else ())
     )
-    return _hash(hash_data, as_int=as_int)
+    return _hash(hash_data, as_int=as_int, version=version)
+
+
+def _memoized_hash(obj: Any, hash_function: Callable, version: Optional[int]) -> str:
+    """Hex hash of a Span, reusing its memoized hash if it's
+    requested for the active hash version"""
+    if version is None or version == _hash_version:
+        return cast(str, obj.hash)
+    return cast(str, hash_function(obj, as_int=False, version=version))
+
+
+def hash_many(
+    examples: Sequence["Example"],
+    as_int: bool = True,
+    workers: int = 1,
+    chunk_size: int = 10_000,
+    version: Optional[int] = None,
+) -> List[Union[str, int]]:
+    """Compute `tokenized_example_hash` for a batch of examples along with
+    the hash of each of their spans and tokens. If hashing with the active hash
+    version, examples with a memoized hash for it reuse it and only the other
+    examples are hashed. Their hashes are memoized on each Example, Span and the
+    Tokens of each Example so later calls to `hash(example)` are cheap.
+    Examples can be hashed in chunks across a pool of worker processes, the result
+    order matches the input order.
+
+    Args:
+        examples (Sequence[Example]): Examples to hash
+        as_int (bool, optional): Encode hashes as int
+        workers (int, optional): Number of worker processes. Defaults to hashing serially
+        chunk_size (int, optional): Number of examples sent to a worker at a time
+        version (Optional[int], optional): Hash version. Defaults to the active version
+
+    Returns:
+        List[Union[str, int]]: Example hash for each example
+    """
+    version = _check_hash_version(version)
+    memoize = version == _hash_version
+
+    hashes: List[str] = [""] * len(examples)
+    to_hash: List[int] = []
+    for i, e in enumerate(examples):
+        if memoize and _has_memoized_hash(e, version):
+            hashes[i] = e.hash
+        else:
+            to_hash.append(i)
+
+    records = [
+        (
+            e.text,
+            tuple(_span_hash_data(s) for s in e.spans),
+            e.tokens.hash_data() if e.tokens else (),
+        )
+        for e in (examples[i] for i in to_hash)
+    ]
+    if workers > 1 and len(records) > chunk_size:
+        chunks = [records[i : i + chunk_size] for i in range(0, len(records), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [
+                r
+                for chunk_results in executor.map(_hash_records, chunks, repeat(version))
+                for r in chunk_results
+            ]
+    else:
+        results = _hash_records(records, version)
+
+    for i, (hash_data, span_hashes, token_hashes, e_hash) in zip(to_hash, results):
+        hashes[i] = e_hash
+        if memoize:
+            e = examples[i]
+            for s, s_hash in zip(e.spans, span_hashes):
+                object.__setattr__(s, "_hash_cache", (version, s_hash))
+            if e.tokens:
+                e.tokens._hash_cache = (version, token_hashes)
+            object.__setattr__(e, "_hash_cache", (version, (e.text,) + hash_data, e_hash))
+
+    if as_int:
+        return [int(h, 16) for h in hashes]
+    return list(hashes)
 
 
-def dataset_hash(dataset: "Dataset", as_int: bool = True) -> Union[str, int]:
+def _has_memoized_hash(example: "Example", version: int) -> bool:
+    """Whether the hash of example and each of its spans and tokens
+    is memoized for version, so `example.hash` doesn't hash them again"""
+    cache = example._hash_cache
+    if cache is None or cache[0] != version:
+        return False
+    for span in example.spans:
+        span_cache = span._hash_cache
+        if span_cache is None or span_cache[0] != version:
+            return False
+    if example.tokens:
+        tokens_cache = example.tokens._hash_cache
+        if tokens_cache is None or tokens_cache[0] != version:
+            return False
+    return True
+
+
+def _hash_records(
+    records: List[Tuple[str, Tuple[Tuple, ...], Tuple[Tuple, ...]]], version: int
+) -> List[Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...], str]]:
+    """Hash raw example records of (text, span hash data, token hash data).
+    Runs in worker processes for `hash_many` so it only deals in plain tuples.
+
+    Returns:
+        List[Tuple]: Tuples of (span and token hashes, span hashes, token hashes, example hash)
+    """
+    results = []
+    for text, spans, tokens in records:
+        span_hashes = tuple(cast(str, _hash(s, as_int=False, version=version)) for s in spans)
+        token_hashes = tuple(cast(str, _hash(t, as_int=False, version=version)) for t in tokens)
+        hash_data = span_hashes + token_hashes
+        e_hash = cast(str, _hash((text,) + hash_data, as_int=False, version=version))
+        results.append((hash_data, span_hashes, token_hashes, e_hash))
+    return results
+
+
+def dataset_hash(
+    dataset: "Dataset", as_int: bool = True, version: Optional[int] = None
+) -> Union[str, int]:
     """Hash of Dataset
 
     Args:
         dataset (Dataset): Dataset to hash
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: Dataset hash
     """
+    version = _check_hash_version(version)
+    if version > 1:
+        leaves = [hash_key(cast(int, h), version) for h in hash_many(dataset.data, version=version)]
+        tree = CommitTree(dataset.name, leaves, version=version)
+        return tree.intdigest() if as_int else tree.hexdigest()
+
     hash_data = (dataset.name,) + tuple(
-        (example_hash(example, as_int=False) for example in dataset.data)
+        (example_hash(example, as_int=False, version=version) for example in dataset.data)
     )
-    return _hash(hash_data, as_int=as_int)
+    return _hash(hash_data, as_int=as_int, version=version)
+
+
+def hash_key(value: int, version: Optional[int] = None) -> int:
+    """Convert an int example hash to the key used for the example in an
+    ExampleStore and in Transformation records. For 64 bit hash versions this is
+    the value Python's builtin `hash` returns for an object whose `__hash__`
+    returns it. 128 bit hash versions use the full hash as the key.
+
+    Args:
+        value (int): Int hash
+        version (Optional[int], optional): Hash version. Defaults to the active version
+
+    Returns:
+        int: Example key
+    """
+    version = _check_hash_version(version)
+    if version >= 3:
+        return value
+    # Python only reduces a __hash__ result that doesn't fit in a machine word
+    return value if value <= sys.maxsize else hash(value)
+
+
+def dump_key(key: Optional[int]) -> Optional[Union[int, str]]:
+    """JSON serializable version of an example key. srsly can't read or write ints
+    wider than 64 bits so 128 bit keys are saved as decimal strings.
+    pydantic int fields and `int()` parse them back.
+
+    Args:
+        key (Optional[int]): Example key
+
+    Returns:
+        Optional[Union[int, str]]: key as is if it fits in 64 bits, otherwise as str
+    """
+    if key is None or -(2**63) <= key < 2**64:
+        return key
+    return str(key)
+
+
+def example_fingerprint(example: "Example") -> int:
+    """Cheap secondary fingerprint of an Example. It is computed from the example
+    data with a hash function that's independent of the example hash so two
+    different examples with the same hash almost certainly have different
+    fingerprints. Used by the ExampleStore to detect hash collisions.
+
+    Args:
+        example (Example): Example to fingerprint
+
+    Returns:
+        int: 32 bit fingerprint
+    """
+    m = xxhash.xxh32(_encode_v2(example.text), seed=_FINGERPRINT_SEED)
+    for span in example.spans:
+        m.update(b"".join([_encode_v2(e) for e in _span_hash_data(span)]))
+    for token_data in example.tokens.hash_data() if example.tokens else ():
+        m.update(b"".join([_encode_v2(e) for e in token_data]))
+    return cast(int, m.intdigest())
+
+
+class CommitTree:
+    """Order sensitive commit hash over a sequence of example hashes, built as a
+    two level Merkle tree. Leaves are grouped in fixed size chunks, each chunk is
+    digested separately and the root digests the chunk digests. Updating the leaves
+    only re-digests the chunks that changed.
+    """
+
+    def __init__(self, name: str, leaves: List[int], chunk_size: int = 1024, version: int = 2):
+        """Initialize a CommitTree
+
+        Args:
+            name (str): Name of the Dataset, included in the root hash
+            leaves (List[int]): Example hashes in Dataset order
+            chunk_size (int, optional): Number of leaves per chunk
+            version (int, optional): Hash version, determines the hash function
+        """
+        self.name = name
+        self.chunk_size = chunk_size
+        self.hash_function = _HASH_FUNCTIONS[_check_hash_version(version)]
+        self._leaves: List[int] = []
+        self._chunks: List[bytes] = []
+        self._root: Optional[Any] = None
+        self._build(leaves)
+
+    def __len__(self) -> int:
+        return len(self._leaves)
+
+    @property
+    def leaves(self) -> List[int]:
+        return self._leaves
+
+    def update(self, leaves: List[int]) -> None:
+        """Replace the leaves of the tree. If the number of leaves is unchanged
+        only chunks with changed leaves are re-digested.
+
+        Args:
+            leaves (List[int]): New example hashes in Dataset order
+        """
+        cs = self.chunk_size
+        if len(leaves) != len(self._leaves):
+            # Positions shifted so every chunk needs to be digested again
+            self._build(leaves)
+            return
+
+        old_leaves = self._leaves
+        for chunk_i, i in enumerate(range(0, len(leaves), cs)):
+            chunk = leaves[i : i + cs]
+            if chunk != old_leaves[i : i + cs]:
+                self._chunks[chunk_i] = self._digest_chunk(chunk)
+                self._root = None
+        self._leaves = leaves
+
+    def hexdigest(self) -> str:
+        return cast(str, self._digest().hexdigest())
+
+    def intdigest(self) -> int:
+        return cast(int, self._digest().intdigest())
+
+    def _build(self, leaves: List[int]) -> None:
+        cs = self.chunk_size
+        self._leaves = leaves
+        self._chunks = [self._digest_chunk(leaves[i : i + cs]) for i in range(0, len(leaves), cs)]
+        self._root = None
+
+    def _digest(self) -> Any:
+        if self._root is None:
+            self._root = self.hash_function(_encode_v2(self.name) + b"".join(self._chunks))
+        return self._root
+
+    def _digest_chunk(self, leaves: Sequence[int]) -> bytes:
+        try:
+            packed = array("Q", leaves).tobytes()
+        except OverflowError:
+            packed = b"".join([_encode_v2(leaf) for leaf in leaves])
+        return cast(bytes, self.hash_function(packed).digest())
 
 
 def prediction_error_hash(
-    prediction_error: "PredictionError", as_int: bool = True
+    prediction_error: "PredictionError", as_int: bool = True, version: Optional[int] = None
 ) -> Union[str, int]:
     """Hash of PredictionError
 
     Args:
         prediction_error (PredictionError): PredictionError to hash
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: PredictionError hash
     """
     hash_data = (prediction_error.text, prediction_error.true_label, prediction_error.pred_label)
-    return _hash(hash_data, as_int=as_int)
+    return _hash(hash_data, as_int=as_int, version=version)
+
+
+def _encode_v2(e: Any) -> bytes:
+    """Compact, unambiguous byte encoding of a single hash element.
+
+    Args:
+        e (Any): Element to encode. One of None, bool, int, str or bytes
+
+    Raises:
+        TypeError: If the element type can't be encoded
+
+    Returns:
+        bytes: Type tagged encoding of e
+    """
+    if e is None:
+        return b"n"
+    elif isinstance(e, str):
+        e_bytes = e.encode("utf-8")
+        return b"s" + _LEN.pack(len(e_bytes)) + e_bytes
+    elif isinstance(e, bool):
+        return b"t" if e else b"f"
+    elif isinstance(e, int):
+        if -(2**63) <= e < 2**63:
+            return b"i" + _INT.pack(e)
+        n_bytes = (e.bit_length() + 8) // 8
+        return b"I" + _LEN.pack(n_bytes) + e.to_bytes(n_bytes, "little", signed=True)
+    elif isinstance(e, (bytes, bytearray, memoryview)):
+        e_bytes = bytes(e)
+        return b"b" + _LEN.pack(len(e_bytes)) + e_bytes
+    raise TypeError(f"Cannot hash value of type: {type(e)}")
 
 
 def _hash(
-    tpl: Tuple, hash_function: Callable = xxhash.xxh64, as_int: bool = True
+    tpl: Tuple,
+    hash_function: Optional[Callable] = None,
+    as_int: bool = True,
+    version: Optional[int] = None,
 ) -> Union[str, int]:
     """Deterministic hash function. The main use here is
     providing a `commit_hash` for a Dataset to compare across
@@ -116,18 +500,25 @@ def _hash(
 
     Args:
         tpl (Tuple): Tuple of data to hash
-        hash_function (Callable, hashlib.sha1): Hash function from
-            python hashlib. Defaults to sha1 (same as git)
+        hash_function (Optional[Callable], optional): Hash function from
+            xxhash. Defaults to the hash function of the hash version
         as_int (bool, optional): Encode hash as int
+        version (Optional[int], optional): Hash version. Defaults to the active version
 
     Returns:
         Union[str, int]: Deterministic hash using tpl data
     """
-    m = hash_function()
-    for e in tpl:
-        if isinstance(e, str):
-            e_bytes = e.encode("utf-8")
-        else:
-            e_bytes = bytes(e)
-        m.update(e_bytes)
+    version = _check_hash_version(version)
+    if hash_function is None:
+        hash_function = _HASH_FUNCTIONS[version]
+    if version == 1:
+        m = hash_function()
+        for e in tpl:
+            if isinstance(e, str):
+                e_bytes = e.encode("utf-8")
+            else:
+                e_bytes = bytes(e)
+            m.update(e_bytes)
+    else:
+        m = hash_function(b"".join([_encode_v2(e) for e in tpl]))
     return m.intdigest() if as_int else m.hexdigest()
@@ -0,0 +1,174 @@
+"""Append-only journals for data saved by Dataset.to_disk, Corpus.to_disk
+and ExampleStore.to_disk. A journaled save appends a single entry with the changes
+since the previous save to a journal file next to the checkpoint it applies to
+instead of rewriting the checkpoint. Loading replays the journal on top of the
+checkpoint. Saving without journaling (the default) writes a new checkpoint
+and removes the journal."""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+import srsly
+
+from recon.hashing import dump_key
+from recon.utils import ensure_path
+
+if TYPE_CHECKING:
+    from recon.types import OperationState
+
+
+JOURNAL_MAX_ENTRIES = 20
+"""Max number of entries in a journal. The next journaled save writes a new checkpoint."""
+
+
+@dataclass
+class SavedState:
+    """What was last saved to or loaded from a checkpoint and its journal"""
+
+    path: Path
+    hash_version: int
+    n_entries: int
+    example_hashes: List[int]
+    operations: List["OperationState"]
+
+
+@dataclass
+class SavedStoreState:
+    """Keys of an ExampleStore last saved to or loaded from a checkpoint and its journal"""
+
+    path: Path
+    hash_version: int
+    n_entries: int
+    example_hashes: Set[int]
+
+
+def journal_path(path: Path) -> Path:
+    """Path of the journal for a checkpoint file
+
+    Args:
+        path (Path): Checkpoint path, e.g. .recon/train/state.json
+
+    Returns:
+        Path: Journal path, e.g. .recon/train/state.journal.jsonl
+    """
+    stem = path.name.split(".", 1)[0]
+    return path.with_name(f"{stem}.journal.jsonl")
+
+
+def read_journal(path: Path) -> List[Dict[str, Any]]:
+    """Read the journal entries of a checkpoint file
+
+    Args:
+        path (Path): Checkpoint path
+
+    Returns:
+        List[Dict[str, Any]]: Journal entries in the order they were saved
+    """
+    path = journal_path(path)
+    if not path.exists():
+        return []
+    return [entry for entry in srsly.read_jsonl(path)]
+
+
+def append_journal(path: Path, entry: Dict[str, Any]) -> None:
+    """Append an entry to the journal of a checkpoint file
+
+    Args:
+        path (Path): Checkpoint path
+        entry (Dict[str, Any]): Journal entry
+    """
+    with journal_path(path).open("a", encoding="utf8") as f:
+        f.write(srsly.json_dumps(entry) + "\n")
+
+
+def clear_journal(path: Path) -> None:
+    """Remove the journal of a checkpoint file after writing a new checkpoint
+
+    Args:
+        path (Path): Checkpoint path
+    """
+    path = journal_path(path)
+    if path.exists():
+        path.unlink()
+
+
+def can_journal(saved: Optional[Any], path: Path, hash_version: int) -> bool:
+    """Check if a save to path can be appended to the journal of the last saved checkpoint
+
+    Args:
+        saved (Optional[Any]): SavedState or SavedStoreState of the last save or load
+        path (Path): Checkpoint path of this save
+        hash_version (int): Active hash version
+
+    Returns:
+        bool: Whether the save can be journaled
+    """
+    return (
+        saved is not None
+        and saved.path == ensure_path(path).resolve()
+        and saved.hash_version == hash_version
+        and saved.n_entries < JOURNAL_MAX_ENTRIES
+        and saved.path.exists()
+    )
+
+
+def diff_keys(old: List[int], new: List[int]) -> List[Dict[str, Any]]:
+    """Edit script that turns the example keys of a saved Dataset into the current keys.
+    Each hunk deletes `delete` keys at index `at` of old and inserts the keys in `insert`.
+
+    Args:
+        old (List[int]): Saved example keys
+        new (List[int]): Current example keys
+
+    Returns:
+        List[Dict[str, Any]]: Hunks in order of `at`
+    """
+    if old == new:
+        return []
+    old_set = set(old)
+    new_set = set(new)
+    hunks: List[Dict[str, Any]] = []
+    hunk: Optional[Dict[str, Any]] = None
+    i = j = 0
+    while i < len(old) or j < len(new):
+        if i < len(old) and j < len(new) and old[i] == new[j]:
+            hunk = None
+            i += 1
+            j += 1
+            continue
+        if hunk is None:
+            hunk = {"at": i, "delete": 0, "insert": []}
+            hunks.append(hunk)
+        if j >= len(new) or (i < len(old) and old[i] not in new_set):
+            hunk["delete"] += 1
+            i += 1
+        elif i >= len(old) or new[j] not in old_set:
+            hunk["insert"].append(dump_key(new[j]))
+            j += 1
+        else:
+            hunk["delete"] += 1
+            hunk["insert"].append(dump_key(new[j]))
+            i += 1
+            j += 1
+    return hunks
+
+
+def apply_diff(old: List[int], hunks: List[Dict[str, Any]]) -> List[int]:
+    """Apply an edit script created by `diff_keys`
+
+    Args:
+        old (List[int]): Saved example keys
+        hunks (List[Dict[str, Any]]): Edit script
+
+    Returns:
+        List[int]: Example keys after the edit
+    """
+    keys: List[int] = []
+    prev = 0
+    for hunk in hunks:
+        keys.extend(old[prev : hunk["at"]])
+        keys.extend(int(k) for k in hunk["insert"])
+        prev = hunk["at"] + hunk["delete"]
+    keys.extend(old[prev:])
+    return keys
@@ -2,55 +2,73 @@
 the [Prodigy](https://prodi.gy) format.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, cast
 
 import spacy
 import srsly
 from spacy.language import Language
 from spacy.tokens import Doc, DocBin
-from spacy.util import get_words_and_spaces
+from spacy.util import get_words_and_spaces, minibatch
+from spacy.vocab import Vocab
 
-from recon.types import Example, Span, Token
+from recon.formats import RECORD_FORMATS, read_records
+from recon.types import Example, Span, Tokens
+from recon.utils import ensure_path
 
 
-def read_jsonl(path: Path) -> List[Example]:
-    """Read annotations in JSONL file format
+def read_jsonl(path: Path, trusted: bool = False) -> List[Example]:
+    """Read annotations in JSONL file format. Files with a compressed or msgpack
+    extension from `recon.formats.RECORD_FORMATS` are decoded as they are read.
 
     Args:
         path (Path): Path to data
+        trusted (bool, optional): Skip validation for records written by recon.
+            See `json_to_examples`
 
     Returns:
         List[Example]: List of examples
     """
-    data = srsly.read_jsonl(path)
-    examples = json_to_examples(data)
+    path = ensure_path(path)
+    data = read_records(path) if path.name.endswith(RECORD_FORMATS) else srsly.read_jsonl(path)
+    examples = json_to_examples(data, trusted=trusted)
     return examples
 
 
-def read_json(path: Path) -> List[Example]:
+def read_json(path: Path, trusted: bool = False) -> List[Example]:
     """Read annotations in JSON file format
 
     Args:
         path (Path): Path to data
+        trusted (bool, optional): Skip validation for records written by recon.
+            See `json_to_examples`
 
     Returns:
         List[Example]: List of examples
     """
     data = srsly.read_json(path)
-    examples = json_to_examples(data)
+    examples = json_to_examples(data, trusted=trusted)
     return examples
 
 
-def json_to_examples(data: List[Dict[str, Any]]) -> List[Example]:
+def json_to_examples(data: Iterable[Dict[str, Any]], trusted: bool = False) -> List[Example]:
     """Convert List of Dicts to List of typed Examples
 
     Args:
-        data (List[Dict[str, Any]]): Input List of Dicts to convert
+        data (Iterable[Dict[str, Any]]): Input List of Dicts to convert
+        trusted (bool, optional): Skip validation for records that were written by recon,
+            marked by `"formatted": true`. Other records are still validated.
 
     Returns:
         List[Example]: List of typed Examples
     """
+    if trusted:
+        return [
+            Example.construct_trusted(example) if example.get("formatted") else Example(**example)
+            for example in data
+        ]
     return [Example(**example) for example in data]
 
 
@@ -85,7 +103,7 @@ def from_spacy(
                 )
                 for e in doc.ents
             ],
-            tokens=[Token(text=t.text, start=t.idx, end=t.idx + len(t), id=t.i) for t in doc],
+            tokens=Tokens.from_doc(doc),
         )
 
 
@@ -108,12 +126,162 @@ def to_spacy(
         nlp = spacy.blank(lang_code)
 
     doc_bin = DocBin(attrs=["ENT_IOB", "ENT_TYPE"])
-    for example in data:
-        if example.tokens:
-            tokens = [token.text for token in example.tokens]
-            words, spaces = get_words_and_spaces(tokens, example.text)
-            doc = Doc(nlp.vocab, words=words, spaces=spaces)
-            doc.ents = tuple([doc.char_span(s.start, s.end, label=s.label) for s in example.spans])
-            doc_bin.add(doc)
+    for doc in examples_to_docs((e for e in data if e.tokens), vocab=nlp.vocab):
+        doc_bin.add(doc)
     doc_bin.to_disk(path)
     return doc_bin
+
+
+DOC_CACHE_SIZE = 10_000
+"""Default max number of Docs kept by a DocCache"""
+
+
+class DocCache:
+    """Vocab shared by the Docs `examples_to_docs` creates along with the most
+    recently created Docs, keyed by example key. Keep one for data that's converted
+    to Docs repeatedly so converting the same Example again is a lookup. The cached
+    Docs are shared, copy a Doc before modifying it.
+    """
+
+    def __init__(self, vocab: Optional[Vocab] = None, max_size: int = DOC_CACHE_SIZE):
+        """Initialize a DocCache
+
+        Args:
+            vocab (Optional[Vocab], optional): Vocab to create Docs with. Defaults to a new Vocab
+            max_size (int, optional): Max number of cached Docs
+        """
+        self.vocab = vocab if vocab is not None else Vocab()
+        self.max_size = max_size
+        self._docs: "OrderedDict[int, Doc]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def get(self, example_key: int) -> Optional[Doc]:
+        doc = self._docs.get(example_key)
+        if doc is not None:
+            self._docs.move_to_end(example_key)
+        return doc
+
+    def put(self, example_key: int, doc: Doc) -> None:
+        self._docs[example_key] = doc
+        while len(self._docs) > self.max_size:
+            self._docs.popitem(last=False)
+
+    def clear(self) -> None:
+        self._docs.clear()
+
+
+_example_doc_cache: Optional[DocCache] = None
+
+
+def example_doc_cache() -> DocCache:
+    """Get the DocCache `Example.doc` and `Example.show` convert examples with.
+    It's created on first use and shared by all Examples, so viewing examples
+    shares one Vocab and viewing the same Example again is a lookup. Pass a
+    DocCache of your own to `examples_to_docs` for other conversions.
+
+    Returns:
+        DocCache: DocCache of Example.doc
+    """
+    global _example_doc_cache
+    if _example_doc_cache is None:
+        _example_doc_cache = DocCache()
+    return _example_doc_cache
+
+
+def examples_to_docs(
+    examples: Iterable[Example],
+    vocab: Optional[Vocab] = None,
+    batch_size: int = 1000,
+    n_process: int = 1,
+    cache: Optional[DocCache] = None,
+) -> Iterator[Doc]:
+    """Convert Examples to spaCy Docs with ents set from the example spans.
+    All Docs of a call share one Vocab instead of allocating a new one per Doc.
+    Pass a DocCache to share the Vocab across calls and reuse the Docs it has for
+    Examples that were already converted.
+
+    Args:
+        examples (Iterable[Example]): Examples to convert. Each must have tokens
+        vocab (Optional[Vocab], optional): Vocab to create Docs with.
+            Defaults to the Vocab of cache or a new Vocab
+        batch_size (int, optional): Number of examples to convert at a time
+        n_process (int, optional): Number of processes to create Docs with
+        cache (Optional[DocCache], optional): Cache to look up and add Docs to
+
+    Raises:
+        ValueError: If an Example doesn't have tokens or vocab isn't the Vocab of cache
+
+    Yields:
+        Iterator[Doc]: Doc for each Example
+    """
+    if cache is not None:
+        if vocab is not None and vocab is not cache.vocab:
+            raise ValueError("vocab must be the Vocab of the DocCache when both are provided.")
+        vocab = cache.vocab
+    if vocab is None:
+        vocab = Vocab()
+    executor = ProcessPoolExecutor(max_workers=n_process) if n_process > 1 else None
+    try:
+        for batch in minibatch(examples, size=batch_size):
+            docs: List[Optional[Doc]] = []
+            missing: List[Tuple[int, int, Tuple]] = []
+            for i, example in enumerate(batch):
+                if not example.tokens:
+                    raise ValueError(
+                        "Tokens are not set. Try running the recon.add_tokens.v1 operation."
+                    )
+                example_key = example.key
+                doc = cache.get(example_key) if cache is not None else None
+                if doc is None:
+                    spans = tuple((s.start, s.end, s.label) for s in example.spans)
+                    missing.append((i, example_key, (example.text, example.tokens.texts, spans)))
+                docs.append(doc)
+
+            records = [record for _, _, record in missing]
+            if executor and len(records) > 1:
+                chunk_size = -(-len(records) // n_process)
+                chunks = [records[i : i + chunk_size] for i in range(0, len(records), chunk_size)]
+                new_docs = [
+                    doc
+                    for doc_bin_bytes in executor.map(_records_to_doc_bin, chunks)
+                    for doc in DocBin().from_bytes(doc_bin_bytes).get_docs(vocab)
+                ]
+            else:
+                new_docs = [_record_to_doc(vocab, record) for record in records]
+
+            for (i, example_key, _), doc in zip(missing, new_docs):
+                docs[i] = doc
+                if cache is not None:
+                    cache.put(example_key, doc)
+
+            yield from cast(List[Doc], docs)
+    finally:
+        if executor:
+            executor.shutdown()
+
+
+def _record_to_doc(vocab: Vocab, record: Tuple) -> Doc:
+    text, tokens, spans = record
+    words, spaces = get_words_and_spaces(tokens, text)
+    doc = Doc(vocab, words=words, spaces=spaces)
+    ents = []
+    for start, end, label in spans:
+        ent = doc.char_span(start, end, label=label)
+        if ent is None:
+            raise ValueError(
+                f"Span ({start}, {end}, {label}) doesn't align with the tokens of: {text}"
+            )
+        ents.append(ent)
+    doc.ents = ents
+    return doc
+
+
+def _records_to_doc_bin(records: List[Tuple]) -> bytes:
+    """Create Docs from raw example records in a worker process for `examples_to_docs`"""
+    vocab = Vocab()
+    doc_bin = DocBin(attrs=["ENT_IOB", "ENT_TYPE"])
+    for record in records:
+        doc_bin.add(_record_to_doc(vocab, record))
+    return cast(bytes, doc_bin.to_bytes())
@@ -0,0 +1,141 @@
+"""Migrate data saved by a Dataset or Corpus between hash versions."""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union, cast
+
+import srsly
+from wasabi import Printer
+
+from recon.dataset import Dataset
+from recon.formats import find_record_file
+from recon.hashing import (
+    _check_hash_version,
+    dataset_hash,
+    dump_key,
+    example_fingerprint,
+    hash_key,
+    tokenized_example_hash,
+)
+from recon.loaders import read_jsonl
+from recon.store import (
+    STORE_FORMATS,
+    ExampleStore,
+    examples_from_records,
+    read_store_file,
+    write_store_file,
+)
+from recon.types import DatasetOperationsState, Example
+from recon.utils import ensure_path
+
+
+def _example_key(example: Example, version: int) -> int:
+    """Key of an example in an ExampleStore and in Transformation records for a
+    specific hash version. Matches `hash(example)` when the version is active.
+    """
+    return hash_key(cast(int, tokenized_example_hash(example, version=version)), version)
+
+
+def migrate_hashes(
+    data_dir: Union[str, Path],
+    version: int,
+    from_version: Optional[int] = None,
+    verbose: bool = True,
+) -> Dict[int, int]:
+    """Rewrite all hashes saved by Dataset.to_disk or Corpus.to_disk in data_dir
+    to a new hash version. This rewrites the example hashes in every example store file,
+    the Transformation records, DataHunks and commit of every state.json and records the new
+    hash version in each state.json.
+
+    Args:
+        data_dir (Union[str, Path]): Directory a Dataset or Corpus was saved to
+        version (int): Hash version to migrate to
+        from_version (Optional[int], optional): Hash version the data was saved with.
+            Defaults to the hash version recorded in each state.json
+        verbose (bool, optional): Print migration progress
+
+    Raises:
+        ValueError: If data_dir doesn't contain any saved recon state
+            or the saved state has journaled changes
+
+    Returns:
+        Dict[int, int]: Mapping of old example hashes to new example hashes
+    """
+    data_dir = ensure_path(data_dir)
+    version = _check_hash_version(version)
+    state_dir = data_dir / ".recon"
+    if not state_dir.exists():
+        raise ValueError(f"No recon state to migrate in: {data_dir}")
+    if any(state_dir.glob("**/*.journal.jsonl")):
+        raise ValueError(
+            f"Saved state in {data_dir} has journaled changes. Load it with the hash version "
+            "it was saved with and save it with journal=False to write a checkpoint first."
+        )
+
+    msg = Printer(no_print=not verbose)
+
+    states: Dict[Path, DatasetOperationsState] = {}
+    for state_path in sorted(state_dir.glob("*/state.json")):
+        state_data = cast(Dict[str, Any], srsly.read_json(state_path))
+        states[state_path] = DatasetOperationsState(**state_data)
+
+    hash_map: Dict[int, int] = {}
+
+    store_paths = [find_record_file(state_dir, "example_store", STORE_FORMATS)] + [
+        find_record_file(state_path.parent, "example_store", STORE_FORMATS) for state_path in states
+    ]
+    for store_path in store_paths:
+        if store_path is None:
+            continue
+        records = list(read_store_file(store_path))
+        examples = examples_from_records(records, lambda data: Example(**data))
+        for record, example in zip(records, examples):
+            new_hash = _example_key(example, version)
+            hash_map[int(record["example_hash"])] = new_hash
+            record["example_hash"] = dump_key(new_hash)
+            record["fingerprint"] = example_fingerprint(example)
+        for record in records:
+            if "base" in record:
+                record["base"] = dump_key(hash_map[int(record["base"])])
+        write_store_file(store_path, records)
+        msg.good(f"Migrated {len(records)} examples in {store_path}")
+
+    for state_path, state in states.items():
+        state_from_version = from_version or state.hash_version
+        data: List[Example] = []
+        data_path = find_record_file(data_dir, state.name)
+        if data_path:
+            data = read_jsonl(data_path)
+        for example in data:
+            hash_map.setdefault(
+                _example_key(example, state_from_version), _example_key(example, version)
+            )
+
+        n_missing = 0
+        for op in state.operations:
+            for t in op.transformations:
+                for field in ("prev_example", "example"):
+                    old_hash = getattr(t, field)
+                    if old_hash is None:
+                        continue
+                    if old_hash in hash_map:
+                        setattr(t, field, hash_map[old_hash])
+                    else:
+                        n_missing += 1
+            for hunk in op.hunks:
+                n_missing += sum(h not in hash_map for h in hunk.delete + hunk.insert)
+                hunk.delete = [hash_map.get(h, h) for h in hunk.delete]
+                hunk.insert = [hash_map.get(h, h) for h in hunk.insert]
+
+        if n_missing:
+            msg.warn(
+                f"{n_missing} transformation and data hunk hashes in {state_path} don't "
+                "reference a stored example and were left unchanged."
+            )
+
+        ds = Dataset(state.name, data, example_store=ExampleStore(), verbose=False)
+        state.commit = cast(str, dataset_hash(ds, as_int=False, version=version))
+        state.hash_version = version
+        srsly.write_json(state_path, state.to_json())
+        msg.good(f"Migrated state for dataset '{state.name}' to hash version {version}")
+
+    return hash_map
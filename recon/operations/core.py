@@ -1,22 +1,34 @@
 import warnings
-from collections import Counter, defaultdict
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from copy import deepcopy
+from itertools import islice
+from types import CodeType
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
+    Deque,
     Dict,
     Iterable,
     Iterator,
     List,
+    NamedTuple,
     Optional,
+    Sequence,
     Tuple,
     Union,
+    cast,
 )
 
-from pydantic.error_wrappers import ErrorWrapper
+import xxhash
+from pydantic import BaseConfig
+from pydantic.error_wrappers import ErrorWrapper, display_errors, flatten_errors
 from tqdm import tqdm
 from wasabi import Printer
 
+from recon.cache import CachedResult, OperationCache, operation_params_hash
+from recon.hashing import hash_key, hash_many
 from recon.operations import registry as op_registry
 from recon.operations.utils import (
     get_received_operation_data,
@@ -25,46 +37,349 @@ from recon.operations.utils import (
 )
 from recon.preprocess import PreProcessor
 from recon.preprocess import registry as pre_registry
+from recon.stream import finish_data, iter_chunks, new_data_like
 from recon.types import (
+    DataHunk,
     Example,
     OperationResult,
     OperationState,
     OperationStatus,
+    Span,
     Transformation,
     TransformationType,
 )
 
 if TYPE_CHECKING:
     from recon import Dataset
+    from recon.store import ExampleStore
+
+
+# Meta values of these types are shared between an Example and its copies
+_IMMUTABLE_META_TYPES = (str, int, float, bytes, type(None))
+
+
+class _CowSpans(list):
+    """Spans list of an Example copy created by `op_iter`. Holds the Span objects of
+    the original Example until any Span is accessed, at which point all Spans are
+    copied once. Any in place change to the list itself marks it as changed.
+    """
+
+    __slots__ = ("_source", "_copied", "_changed")
+
+    def __init__(self, spans: Iterable[Span] = ()):
+        super().__init__(spans)
+        self._source = spans if isinstance(spans, list) else None
+        self._copied = False
+        self._changed = False
+
+    def _copy_spans(self) -> None:
+        if not self._copied:
+            for i, span in enumerate(list.__iter__(self)):
+                list.__setitem__(self, i, span.copy())
+            self._copied = True
+
+    def _write(self) -> None:
+        self._copy_spans()
+        self._changed = True
+
+    def changed(self, source: List[Span]) -> bool:
+        """Check if the spans are different from the source spans of the copy
+
+        Args:
+            source (List[Span]): Spans of the original Example
+
+        Returns:
+            bool: Whether the list or any Span in it was modified
+        """
+        if self._changed or self._source is not source:
+            return True
+        if not self._copied:
+            return False
+        # Assigning to a Span field always replaces its fields set
+        return any(
+            span._fields_set is not orig._fields_set
+            for span, orig in zip(list.__iter__(self), source)
+        )
+
+    def detach(self) -> List[Span]:
+        """Plain list of the spans, the source list itself if unchanged"""
+        if self._source is not None and not self.changed(self._source):
+            return self._source
+        return list(list.__iter__(self))
+
+    def __getitem__(self, index: Any) -> Any:
+        self._copy_spans()
+        return super().__getitem__(index)
+
+    def __iter__(self) -> Iterator[Span]:
+        self._copy_spans()
+        return super().__iter__()
+
+    def __reversed__(self) -> Iterator[Span]:
+        self._copy_spans()
+        return super().__reversed__()
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        self._write()
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index: Any) -> None:
+        self._write()
+        super().__delitem__(index)
+
+    def __iadd__(self, other: Iterable[Span]) -> "_CowSpans":  # type: ignore
+        self._write()
+        return super().__iadd__(other)
+
+    def __imul__(self, n: int) -> "_CowSpans":  # type: ignore
+        self._write()
+        return super().__imul__(n)
+
+    def append(self, span: Span) -> None:
+        self._write()
+        super().append(span)
+
+    def extend(self, spans: Iterable[Span]) -> None:
+        self._write()
+        super().extend(spans)
+
+    def insert(self, index: int, span: Span) -> None:  # type: ignore
+        self._write()
+        super().insert(index, span)
+
+    def remove(self, span: Span) -> None:
+        self._write()
+        super().remove(span)
+
+    def pop(self, index: int = -1) -> Span:  # type: ignore
+        self._write()
+        return super().pop(index)
+
+    def clear(self) -> None:
+        self._write()
+        super().clear()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        self._write()
+        super().sort(*args, **kwargs)
+
+    def reverse(self) -> None:
+        self._write()
+        super().reverse()
+
+    def copy(self) -> List[Span]:  # type: ignore
+        return list(self)
+
+    def __copy__(self) -> List[Span]:
+        return list(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Span]:
+        return [deepcopy(span, memo) for span in self]
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (list, (list(self),))
+
+
+class _CowMeta(dict):
+    """Meta dict of an Example copy created by `op_iter`. Immutable values are shared
+    with the original Example. Mutable values are deep copied when the copy is
+    created since changes to them can't be detected, so every way of reading the
+    dict, e.g. `dict(meta)` or `{**meta}`, only exposes copies.
+    """
+
+    __slots__ = ("_source", "_changed")
+
+    def __init__(self, meta: Dict[str, Any] = {}):
+        super().__init__(meta)
+        self._source = meta if isinstance(meta, dict) else None
+        self._changed = False
+        for key, value in meta.items():
+            if not isinstance(value, _IMMUTABLE_META_TYPES):
+                dict.__setitem__(self, key, deepcopy(value))
+                self._changed = True
+
+    def _write(self) -> None:
+        self._changed = True
+
+    def changed(self, source: Dict[str, Any]) -> bool:
+        """Check if the meta is different from the source meta of the copy
+
+        Args:
+            source (Dict[str, Any]): Meta of the original Example
+
+        Returns:
+            bool: Whether the meta was modified or has mutable values
+        """
+        return self._changed or self._source is not source
+
+    def detach(self) -> Dict[str, Any]:
+        """Plain dict of the meta, the source dict itself if unchanged"""
+        if self._source is not None and not self.changed(self._source):
+            return self._source
+        return dict(self)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._write()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self._write()
+        super().__delitem__(key)
+
+    def __ior__(self, other: Any) -> "_CowMeta":  # type: ignore
+        self._write()
+        return super().__ior__(other)
+
+    def pop(self, *args: Any) -> Any:
+        self._write()
+        return super().pop(*args)
+
+    def popitem(self) -> Tuple[str, Any]:
+        self._write()
+        return super().popitem()
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        self._write()
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        self._write()
+        super().update(*args, **kwargs)
+
+    def clear(self) -> None:
+        self._write()
+        super().clear()
+
+    def copy(self) -> Dict[str, Any]:  # type: ignore
+        return dict(self)
+
+    def __copy__(self) -> Dict[str, Any]:
+        return self.copy()
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return {key: deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (dict, (self.copy(),))
+
+
+def cow_copy(example: Example) -> Example:
+    """Create a copy-on-write copy of an Example for an operation.
+    The text, tokens and other field values are shared with the original Example.
+    Spans are wrapped so they are only copied when the operation accesses them,
+    meta is wrapped with copies of its mutable values.
+
+    Args:
+        example (Example): Original Example
+
+    Returns:
+        Example: Copy-on-write copy of example
+    """
+    values = dict(example.__dict__)
+    values["spans"] = _CowSpans(values["spans"])
+    values["meta"] = _CowMeta(values["meta"])
+    return example.__class__.construct(_fields_set=set(example.__fields_set__), **values)
+
+
+def cow_changed(orig_example: Example, example: Example) -> bool:
+    """Check if a copy-on-write copy of an Example was modified
+
+    Args:
+        orig_example (Example): Original Example
+        example (Example): Copy of orig_example from `cow_copy`
+
+    Returns:
+        bool: Whether any field of example was changed
+    """
+    values = example.__dict__
+    orig_values = orig_example.__dict__
+    if values.keys() != orig_values.keys():
+        return True
+    for name, value in values.items():
+        orig_value = orig_values[name]
+        if value is orig_value:
+            continue
+        if isinstance(value, (_CowSpans, _CowMeta)) and not value.changed(orig_value):
+            continue
+        return True
+    return False
+
+
+def cow_resolve(orig_example: Example, example: Example, res: Example) -> Example:
+    """Resolve an Example returned by an operation called with a copy-on-write copy.
+    The original Example is returned by identity if the copy was returned unmodified,
+    otherwise the copy-on-write containers are replaced with a plain list and dict,
+    sharing the spans and meta of the original Example if they weren't changed.
+
+    Args:
+        orig_example (Example): Original Example
+        example (Example): Copy of orig_example the operation was called with
+        res (Example): Example returned by the operation
+
+    Returns:
+        Example: Resolved Example
+    """
+    if res is example and not cow_changed(orig_example, example):
+        return orig_example
+    values = res.__dict__
+    if isinstance(values["spans"], _CowSpans):
+        values["spans"] = values["spans"].detach()
+    if isinstance(values["meta"], _CowMeta):
+        values["meta"] = values["meta"].detach()
+    return res
 
 
 def op_iter(
-    data: List[Example], pre: List[PreProcessor], verbose: bool = True
-) -> Iterator[Tuple[int, Example, Dict[str, Any]]]:
+    data: List[Example],
+    pre: List[PreProcessor],
+    verbose: bool = True,
+    skip: Optional[Callable[[int], bool]] = None,
+) -> Iterator[Tuple[int, Optional[Example], Dict[str, Any]]]:
     """Iterate over list of examples for an operation
     yielding tuples of (example hash, example)
 
+    Each example is a copy-on-write copy of the example in data (see `cow_copy`).
+    Pass the original example, the copy and the operation result to `cow_resolve`
+    to get back the original example if the operation didn't change it.
+
     Args:
         data (List[Example]): List of examples to iterate
         pre (List[PreProcessor]): List of preprocessors to run
         verbose (bool, optional): Show verbose output.
+        skip (Optional[Callable[[int], bool]], optional): Called with each example hash
+            in data order. Examples it returns True for aren't preprocessed or copied
+            and are yielded as None, e.g. examples with a cached result
 
     Yields:
         Iterator[Tuple[int, Example]]: Tuples of (example hash, example)
     """
     msg = Printer(no_print=not verbose, hide_animation=not verbose)
-    preprocessed_outputs: Dict[Example, Dict[str, Any]] = defaultdict(dict)
-    for processor in pre:
-        msg.info(f"\t=> Running preprocessor {processor.name}")
-        processor_outputs = processor(data)
-        for example, output in tqdm(
-            zip(data, processor_outputs), total=len(data), disable=(not verbose), leave=False
-        ):
-            preprocessed_outputs[example][processor.name] = output
-            example.__setattr__(processor.field, output)
-
-    for example in data:
-        yield hash(example), example.copy(deep=True), preprocessed_outputs[example]
+    # Data of a streaming Dataset is hashed and preprocessed a chunk at a time
+    for chunk in iter_chunks(data):
+        example_hashes = [hash_key(cast(int, h)) for h in hash_many(chunk)]
+        skipped = [skip(h) for h in example_hashes] if skip else [False] * len(chunk)
+        to_process = [e for e, s in zip(chunk, skipped) if not s]
+        hashes_to_process = [h for h, s in zip(example_hashes, skipped) if not s]
+        preprocessed_outputs: Dict[int, Dict[str, Any]] = defaultdict(dict)
+        for processor in pre:
+            if not to_process:
+                break
+            msg.info(f"\t=> Running preprocessor {processor.name}")
+            processor_outputs = processor(to_process)
+            for example, example_hash, output in tqdm(
+                zip(to_process, hashes_to_process, processor_outputs),
+                total=len(to_process),
+                disable=(not verbose),
+                leave=False,
+            ):
+                preprocessed_outputs[example_hash][processor.name] = output
+                example.__setattr__(processor.field, output)
+
+        for example, example_hash, s in zip(chunk, example_hashes, skipped):
+            if s:
+                yield example_hash, None, {}
+            else:
+                yield example_hash, cow_copy(example), preprocessed_outputs[example_hash]
 
 
 class operation:
@@ -120,6 +435,310 @@ class operation:
         return op
 
 
+_CACHED = object()
+"""Marks results of an operation that are rebuilt from the operation cache"""
+
+_UNCHANGED = "__recon_unchanged__"
+"""Stands in for the input example in results sent back by a worker process"""
+
+_worker_operation: Optional["Operation"] = None
+
+
+def _init_worker(operation: "Operation") -> None:
+    global _worker_operation
+    _worker_operation = operation
+
+
+def _encode_result(orig_example: Example, example: Example, res: Any) -> Any:
+    """Resolve the result of an op in a worker process. The input example is
+    replaced by _UNCHANGED so it isn't copied back to the main process."""
+    if res is None:
+        return None
+    if isinstance(res, list):
+        return [_encode_result(orig_example, example, r) for r in res]
+    res = cow_resolve(orig_example, example, res)
+    return _UNCHANGED if res is orig_example else res
+
+
+def _decode_result(orig_example: Example, res: Any) -> Any:
+    if isinstance(res, list):
+        return [_decode_result(orig_example, r) for r in res]
+    return orig_example if isinstance(res, str) else res
+
+
+def _run_shard(examples: List[Example], values: Dict[str, Any]) -> List[Any]:
+    """Run the operation of a worker process on a shard of examples"""
+    operation = cast(Operation, _worker_operation)
+    it = op_iter(examples, operation.pre, verbose=False)
+    results = []
+    for orig_example, (_, example, outputs) in zip(examples, it):
+        # op_iter only yields None for skipped examples and the shard skips none
+        assert example is not None
+        results.append(
+            _encode_result(orig_example, example, operation._call_op(example, outputs, values))
+        )
+    return results
+
+
+def _merge_shard(
+    shard: List[Example], example_hashes: List[int], skipped: List[bool], future: Future
+) -> Iterator[Tuple[Example, int, Optional[Example], Any]]:
+    """Merge the results of a shard processed by a worker with the examples
+    of the shard that were skipped, in the order of the shard"""
+    shard_results = iter(future.result())
+    for orig_example, example_hash, s in zip(shard, example_hashes, skipped):
+        if s:
+            yield orig_example, example_hash, None, _CACHED
+        else:
+            res = _decode_result(orig_example, next(shard_results))
+            yield orig_example, example_hash, None, res
+
+
+def has_tokens(data: Iterable[Example]) -> bool:
+    """Check if any example in data has preset tokens
+
+    Args:
+        data (Iterable[Example]): Examples to check
+
+    Returns:
+        bool: Whether an example has tokens or spans with token boundaries
+    """
+    for e in data:
+        if e.tokens or any([(s.token_start or s.token_end) for s in e.spans]):
+            return True
+    return False
+
+
+def _code_fingerprint(code: CodeType) -> str:
+    """Fingerprint of the bytecode, constants and names of a code object,
+    including the code objects of nested functions"""
+    consts = []
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            consts.append(_code_fingerprint(const))
+        elif isinstance(const, frozenset):
+            # The order of set members depends on the hash seed of the process
+            consts.append(repr(sorted(repr(c) for c in const)))
+        else:
+            consts.append(repr(const))
+    return xxhash.xxh64_hexdigest(
+        code.co_code + "\n".join(consts + list(code.co_names)).encode("utf8")
+    )
+
+
+class _OperationRun:
+    """Records the results of one run of an Operation over the data of a Dataset.
+    Each result is added to the Transformations and DataHunks of the OperationState,
+    new examples are added to the ExampleStore and results are cached in the
+    operation cache of the Dataset.
+    """
+
+    def __init__(
+        self,
+        operation: "Operation",
+        dataset: "Dataset",
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        initial_state: Optional[OperationState] = None,
+        cache: bool = False,
+    ):
+        """Validate the args and kwargs of the operation and start its OperationState
+
+        Args:
+            cache (bool, optional): Reuse and record results in the operation cache
+                of the Dataset
+
+        Raises:
+            ValueError: If args and kwargs don't match the parameters of the op
+        """
+        self.operation = operation
+        self.store = dataset.example_store
+        name = operation.name
+        if not initial_state:
+            initial_state = OperationState(name=name)
+        state = initial_state.copy(deep=True)
+        # Records of a previous run of a replayed operation don't apply to this run
+        state.transformations = []
+        state.hunks = []
+
+        if state.status == OperationStatus.NOT_STARTED:
+            state.status = OperationStatus.IN_PROGRESS
+
+        state.args = args
+        state.kwargs = kwargs
+
+        required_params = get_required_operation_params(operation.op)
+        received_data = get_received_operation_data(required_params, state)
+
+        values: Dict[str, Any] = {}
+        errors: List[ErrorWrapper] = []
+
+        if received_data:
+            values, errors = request_body_to_args(list(required_params.values()), received_data)
+
+        if errors:
+            error_msg = (
+                f"Validation error while trying to call operation: {name} "
+                + "with provided args and kwargs values. "
+            )
+            error_msg += display_errors(list(flatten_errors(errors, BaseConfig)))
+            raise ValueError(error_msg)
+
+        state.args = ()
+        state.kwargs = values
+        self.state = state
+        self.values = values
+
+        # Results of augmentations are random so they're never cached
+        self.cache = dataset.operation_cache if cache and not operation.augmentation else None
+        self.params = (
+            operation_params_hash(values, operation.fingerprint) if self.cache is not None else None
+        )
+        self.skip = self._get_cached if self.params else None
+        self._hits: Deque[CachedResult] = deque()
+        self._position = 0
+
+    def check_tokens(self, has_tokens: bool) -> None:
+        """Warn if the data the operation runs on has tokens it can't handle
+
+        Args:
+            has_tokens (bool): Whether the data has preset tokens
+        """
+        name = self.operation.name
+        if has_tokens and not self.operation.handles_tokens:
+            warnings.warn(
+                # fmt: off
+                "This dataset seems to have preset tokens. "
+                f"Operation: {name} is not currently capable of handling tokens and you will "
+                "need to reset tokenization after this operation. "
+                "Applying the `recon.add_tokens.v1` operation after this "
+                "operation is complete will get you back to a clean state."
+                # fmt: on
+            )
+            self.state.status = OperationStatus.NEEDS_TOKENIZATION
+
+    def _get_cached(self, example_hash: int) -> bool:
+        """Skip callback for `op_iter`. Queues the cached result of the example if
+        every example of the result is still in the ExampleStore"""
+        result = cast(OperationCache, self.cache).get(
+            self.operation.name, cast(str, self.params), example_hash
+        )
+        store = self.store
+        if result is None or any(h != example_hash and h not in store for h in result.outputs):
+            return False
+        self._hits.append(result)
+        return True
+
+    def record(
+        self,
+        orig_example: Example,
+        orig_example_hash: int,
+        example: Optional[Example],
+        res: Any,
+    ) -> List[Tuple[Example, int]]:
+        """Record the result of the op for the next example of the data
+
+        Args:
+            orig_example (Example): Example of the data
+            orig_example_hash (int): Key of orig_example
+            example (Optional[Example]): Copy-on-write copy the op was called with,
+                None if the op ran in a worker process or the example was skipped
+            res (Any): Result of the op or _CACHED if the example was skipped
+
+        Returns:
+            List[Tuple[Example, int]]: Resolved examples of the result and their keys
+        """
+        state = self.state
+        i = self._position
+        self._position += 1
+        hit = res is _CACHED
+        if hit:
+            res = self.operation._cached_result(
+                self._hits.popleft(), orig_example, orig_example_hash, self.store
+            )
+
+        # Results with changes that aren't hashed can't be rebuilt from the store
+        cacheable = self.params is not None and not hit
+        outputs: List[Tuple[Example, int]] = []
+        if res is None:
+            self._track_remove_example(orig_example_hash)
+            state.hunks.append(DataHunk(at=i, delete=[orig_example_hash]))
+        elif isinstance(res, list):
+            old_example_present = False
+            for new_example in res:
+                if example is not None:
+                    new_example = cow_resolve(orig_example, example, new_example)
+                new_example_hash = new_example.key
+                outputs.append((new_example, new_example_hash))
+                if new_example_hash == orig_example_hash:
+                    old_example_present = True
+                    cacheable = cacheable and new_example == orig_example
+                else:
+                    self._track_add_example(new_example)
+            if not old_example_present:
+                self._track_remove_example(orig_example_hash)
+            insert = [h for _, h in outputs]
+            if insert != [orig_example_hash]:
+                state.hunks.append(DataHunk(at=i, delete=[orig_example_hash], insert=insert))
+        else:
+            assert isinstance(res, Example)
+            if example is not None:
+                res = cow_resolve(orig_example, example, res)
+            new_example_hash = res.key
+            outputs.append((res, new_example_hash))
+            if new_example_hash != orig_example_hash:
+                self._track_change_example(orig_example_hash, res)
+                state.hunks.append(
+                    DataHunk(at=i, delete=[orig_example_hash], insert=[new_example_hash])
+                )
+            else:
+                cacheable = cacheable and res == orig_example
+
+        if cacheable:
+            cast(OperationCache, self.cache).put(
+                self.operation.name,
+                cast(str, self.params),
+                orig_example_hash,
+                CachedResult([h for _, h in outputs], is_list=isinstance(res, list)),
+            )
+        return outputs
+
+    def _track_add_example(self, new_example: Example) -> None:
+        self.state.transformations.append(
+            Transformation(example=new_example.key, type=TransformationType.EXAMPLE_ADDED)
+        )
+        self.store.add(new_example)
+
+    def _track_remove_example(self, orig_example_hash: int) -> None:
+        self.state.transformations.append(
+            Transformation(prev_example=orig_example_hash, type=TransformationType.EXAMPLE_REMOVED)
+        )
+
+    def _track_change_example(self, orig_example_hash: int, new_example: Example) -> None:
+        self.state.transformations.append(
+            Transformation(
+                prev_example=orig_example_hash,
+                example=new_example.key,
+                type=TransformationType.EXAMPLE_CHANGED,
+            )
+        )
+        self.store.add(new_example, base=orig_example_hash)
+
+    def finish(self) -> OperationState:
+        """Complete the OperationState of the run
+
+        Returns:
+            OperationState: Completed OperationState
+        """
+        state = self.state
+        transformation_counts = Counter([t.type for t in state.transformations])
+        state.examples_added = transformation_counts[TransformationType.EXAMPLE_ADDED]
+        state.examples_removed = transformation_counts[TransformationType.EXAMPLE_REMOVED]
+        state.examples_changed = transformation_counts[TransformationType.EXAMPLE_CHANGED]
+        state.status = OperationStatus.COMPLETED
+        return state.copy(deep=True)
+
+
 class Operation:
     """Operation class that takes care of calling and reporting
     the results of an operation on a Dataset"""
@@ -145,18 +764,43 @@ class Operation:
         self.handles_tokens = handles_tokens
         self.augmentation = augmentation
 
+    @property
+    def fingerprint(self) -> str:
+        """Fingerprint of the code of the op and of the preprocessors it's run with.
+        Part of the key of cached results of the operation so changing either
+        doesn't reuse stale results.
+
+        Returns:
+            str: Fingerprint of the operation
+        """
+        code = getattr(self.op, "__code__", None)
+        parts = [_code_fingerprint(code) if code else type(self.op).__qualname__]
+        parts.extend(p.fingerprint for p in self.pre)
+        return xxhash.xxh64_hexdigest("\n".join(parts))
+
     def __call__(
         self,
         dataset: "Dataset",
         *args: Any,
         verbose: bool = False,
         initial_state: Optional[OperationState] = None,
+        n_workers: int = 1,
+        chunk_size: int = 1000,
+        cache: bool = False,
         **kwargs: Any,
     ) -> OperationResult:
         """Runs op on a dataset and records the results
 
         Args:
             dataset (Dataset): Dataset to operate on
+            n_workers (int, optional): Number of worker processes. If more than 1,
+                the data is split into shards of chunk_size examples that are
+                preprocessed and operated on across a process pool. Results are merged
+                in data order and the ExampleStore is only updated by this process
+                so the result is the same as running serially
+            chunk_size (int, optional): Number of examples in a shard sent to a worker
+            cache (bool, optional): Reuse and record results in the operation cache
+                of the Dataset. See `recon.cache`
 
         Raises:
             ValueError: if track_example is called in the op with no data
@@ -164,117 +808,216 @@ class Operation:
         Returns:
             OperationResult: Container holding new data and the state of the Operation
         """
-        if not initial_state:
-            initial_state = OperationState(name=self.name)
-        state = initial_state.copy(deep=True)
-
-        if state.status == OperationStatus.NOT_STARTED:
-            state.status = OperationStatus.IN_PROGRESS
-
-        state.args = args
-        state.kwargs = kwargs
-
-        def track_add_example(new_example: Example) -> None:
-            state.transformations.append(
-                Transformation(example=hash(new_example), type=TransformationType.EXAMPLE_ADDED)
-            )
-            dataset.example_store.add(new_example)
-
-        def track_remove_example(orig_example_hash: int) -> None:
-            state.transformations.append(
-                Transformation(
-                    prev_example=orig_example_hash, type=TransformationType.EXAMPLE_REMOVED
-                )
-            )
+        run = _OperationRun(self, dataset, args, kwargs, initial_state, cache=cache)
+        run.check_tokens(has_tokens(dataset.data))
 
-        def track_change_example(orig_example_hash: int, new_example: Example) -> None:
-            state.transformations.append(
-                Transformation(
-                    prev_example=orig_example_hash,
-                    example=hash(new_example),
-                    type=TransformationType.EXAMPLE_CHANGED,
-                )
+        if n_workers > 1:
+            results = self._iter_results_parallel(
+                dataset.data, run.values, run.skip, n_workers, chunk_size
             )
-            dataset.example_store.add(new_example)
+        else:
+            results = self._iter_results(dataset.data, run.values, run.skip, verbose)
 
-        has_tokens = False
-        for e in dataset.data:
-            if e.tokens or any([(s.token_start or s.token_end) for s in e.spans]):
-                has_tokens = True
-                break
-
-        if has_tokens and not self.handles_tokens:
-            warnings.warn(
-                # fmt: off
-                "This dataset seems to have preset tokens. "
-                f"Operation: {self.name} is not currently capable of handling tokens and you will "
-                "need to reset tokenization after this operation. "
-                "Applying the `recon.add_tokens.v1` operation after this "
-                "operation is complete will get you back to a clean state."
-                # fmt: on
-            )
-            state.status = OperationStatus.NEEDS_TOKENIZATION
+        new_data = new_data_like(dataset.data)
+        new_hashes = []
+        with tqdm(total=len(dataset), disable=(not verbose)) as pbar:
+            for orig_example, orig_example_hash, example, res in results:
+                for new_example, new_example_hash in run.record(
+                    orig_example, orig_example_hash, example, res
+                ):
+                    new_data.append(new_example)
+                    new_hashes.append(new_example_hash)
+                pbar.update(1)
 
-        required_params = get_required_operation_params(self.op)
-        received_data = get_received_operation_data(required_params, state)
+        return OperationResult(
+            data=finish_data(new_data), state=run.finish(), example_hashes=new_hashes
+        )
 
-        values: Dict[str, Any] = {}
-        errors: List[ErrorWrapper] = []
+    def _call_op(
+        self, example: Example, preprocessed_outputs: Dict[str, Any], values: Dict[str, Any]
+    ) -> Union[Example, List[Example], None]:
+        if preprocessed_outputs:
+            return self.op(example, preprocessed_outputs=preprocessed_outputs, **values)
+        return self.op(example, **values)
 
-        if received_data:
-            values, errors = request_body_to_args(list(required_params.values()), received_data)
+    def _iter_results(
+        self,
+        data: List[Example],
+        values: Dict[str, Any],
+        skip: Optional[Callable[[int], bool]],
+        verbose: bool,
+    ) -> Iterator[Tuple[Example, int, Optional[Example], Any]]:
+        """Run the op on each example of data in this process
+
+        Yields:
+            Iterator[Tuple[Example, int, Optional[Example], Any]]: Tuples of (original example,
+                example hash, copy the op was called with, op result) in data order.
+                The result is _CACHED for examples skipped by skip
+        """
+        it = op_iter(data, self.pre, verbose=verbose, skip=skip)
+        for orig_example, (orig_example_hash, example, preprocessed_outputs) in zip(data, it):
+            if example is None:
+                yield orig_example, orig_example_hash, None, _CACHED
+            else:
+                res = self._call_op(example, preprocessed_outputs, values)
+                yield orig_example, orig_example_hash, example, res
+
+    def _iter_results_parallel(
+        self,
+        data: List[Example],
+        values: Dict[str, Any],
+        skip: Optional[Callable[[int], bool]],
+        n_workers: int,
+        chunk_size: int,
+    ) -> Iterator[Tuple[Example, int, Optional[Example], Any]]:
+        """Parallel version of `Operation._iter_results`. Shards of data are sent to a
+        pool of worker processes, at most 2 per worker at a time so the data is never
+        copied all at once. Results are resolved against the copy-on-write copy in the
+        worker, so the yielded copy is always None.
+        """
+        it = iter(data)
+        shards = iter(lambda: list(islice(it, chunk_size)), [])
+        with ProcessPoolExecutor(
+            max_workers=n_workers, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            pending: Deque[Tuple[List[Example], List[int], List[bool], Future]] = deque()
+            for shard in shards:
+                example_hashes = [hash_key(cast(int, h)) for h in hash_many(shard)]
+                skipped = [skip(h) for h in example_hashes] if skip else [False] * len(shard)
+                to_process = [e for e, s in zip(shard, skipped) if not s]
+                future = executor.submit(_run_shard, to_process, values)
+                pending.append((shard, example_hashes, skipped, future))
+                if len(pending) >= 2 * n_workers:
+                    yield from _merge_shard(*pending.popleft())
+            while pending:
+                yield from _merge_shard(*pending.popleft())
+
+    def _cached_result(
+        self,
+        result: CachedResult,
+        orig_example: Example,
+        orig_example_hash: int,
+        store: "ExampleStore",
+    ) -> Union[Example, List[Example], None]:
+        """Result of the operation for an example rebuilt from its cached result"""
+        examples = [orig_example if h == orig_example_hash else store[h] for h in result.outputs]
+        if result.is_list:
+            return examples
+        return examples[0] if examples else None
 
-        if errors:
-            error_msg = (
-                f"Validation error while trying to call operation: {self.name} "
-                + "with provided args and kwargs values. "
-            )
-            for err in errors:
-                error_msg += str(err.exc)
-                print(values)
-            raise ValueError(error_msg)
+    def register(self) -> None:
+        op_registry.operations.register(self.name)(self)
 
-        state.args = ()
-        state.kwargs = values
 
-        new_data = []
-        with tqdm(total=len(dataset), disable=(not verbose)) as pbar:
-            it = op_iter(dataset.data, self.pre, verbose=verbose)
-            for orig_example_hash, example, preprocessed_outputs in it:
-                if preprocessed_outputs:
-                    res = self.op(example, preprocessed_outputs=preprocessed_outputs, **values)
-                else:
-                    res = self.op(example, **values)
-
-                if res is None:
-                    track_remove_example(orig_example_hash)
-                elif isinstance(res, list):
-                    old_example_present = False
-                    for new_example in res:
-                        new_data.append(new_example)
-                        if hash(new_example) == orig_example_hash:
-                            old_example_present = True
-                        else:
-                            track_add_example(new_example)
-                    if not old_example_present:
-                        track_remove_example(orig_example_hash)
-                else:
-                    assert isinstance(res, Example)
-                    new_data.append(res)
-                    if hash(res) != orig_example_hash:
-                        track_change_example(orig_example_hash, res)
+class PipelineStep(NamedTuple):
+    """Operation of a fused pipeline with the args it's called with"""
 
-                pbar.update(1)
+    operation: Operation
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = {}
+    initial_state: Optional[OperationState] = None
 
-        transformation_counts = Counter([t.type for t in state.transformations])
-        state.examples_added = transformation_counts[TransformationType.EXAMPLE_ADDED]
-        state.examples_removed = transformation_counts[TransformationType.EXAMPLE_REMOVED]
-        state.examples_changed = transformation_counts[TransformationType.EXAMPLE_CHANGED]
-        state.status = OperationStatus.COMPLETED
 
-        state_copy = state.copy(deep=True)
-        state = OperationState(name=self.name)
-        return OperationResult(data=new_data, state=state_copy)
+def run_fused(
+    dataset: "Dataset",
+    steps: List[PipelineStep],
+    verbose: bool = False,
+    chunk_size: int = 1000,
+    cache: bool = False,
+) -> Tuple[Sequence[Example], List[int], List[OperationState]]:
+    """Run a sequence of operations on the data of a dataset in a single pass.
+    The data is processed a chunk at a time and each chunk goes through every
+    operation before the next one is read, so the output of intermediate operations
+    is never materialized. Preprocessors are run once per chunk for every example
+    key, so operations sharing a preprocessor reuse its outputs for examples an
+    earlier operation didn't change. Each operation still records its own
+    OperationState, the same as running the operations one after another with
+    `Operation.__call__`.
 
-    def register(self) -> None:
-        op_registry.operations.register(self.name)(self)
+    Args:
+        dataset (Dataset): Dataset to operate on
+        steps (List[PipelineStep]): Operations to run in order
+        verbose (bool, optional): Show a progress bar
+        chunk_size (int, optional): Number of examples processed at a time
+        cache (bool, optional): Reuse and record results in the operation cache
+            of the Dataset for every operation
+
+    Raises:
+        ValueError: If the args and kwargs of a step don't match its operation
+
+    Returns:
+        Tuple[Sequence[Example], List[int], List[OperationState]]: New data,
+            example.key for each example in it and the state of each operation
+    """
+    runs = [
+        _OperationRun(
+            step.operation, dataset, step.args, step.kwargs, step.initial_state, cache=cache
+        )
+        for step in steps
+    ]
+    saw_tokens = [False] * len(runs)
+    data = dataset.data
+    new_data = new_data_like(data)
+    new_hashes: List[int] = []
+
+    with tqdm(total=len(data), disable=(not verbose)) as pbar:
+        for chunk in _iter_fused_chunks(data, chunk_size):
+            example_hashes = [hash_key(cast(int, h)) for h in hash_many(chunk)]
+            inputs = list(zip(chunk, example_hashes))
+            # Preprocessor outputs for this chunk by (preprocessor name, example key)
+            preprocessed: Dict[Tuple[str, int], Any] = {}
+            for k, run in enumerate(runs):
+                if not saw_tokens[k]:
+                    saw_tokens[k] = has_tokens(e for e, _ in inputs)
+                inputs = _run_fused_step(run, inputs, preprocessed)
+            for new_example, new_example_hash in inputs:
+                new_data.append(new_example)
+                new_hashes.append(new_example_hash)
+            pbar.update(len(chunk))
+
+    states = []
+    for run, run_saw_tokens in zip(runs, saw_tokens):
+        run.check_tokens(run_saw_tokens)
+        states.append(run.finish())
+    return finish_data(new_data), new_hashes, states
+
+
+def _iter_fused_chunks(data: Sequence[Example], chunk_size: int) -> Iterator[Sequence[Example]]:
+    for chunk in iter_chunks(data):
+        for start in range(0, len(chunk), chunk_size):
+            yield chunk[start : start + chunk_size]
+
+
+def _run_fused_step(
+    run: _OperationRun,
+    inputs: List[Tuple[Example, int]],
+    preprocessed: Dict[Tuple[str, int], Any],
+) -> List[Tuple[Example, int]]:
+    """Run the operation of run on a chunk of examples and their keys"""
+    operation = run.operation
+    skipped = [run.skip(h) for _, h in inputs] if run.skip else [False] * len(inputs)
+    to_process = [(e, h) for (e, h), s in zip(inputs, skipped) if not s]
+
+    for processor in operation.pre:
+        missing: Dict[int, Example] = {}
+        for e, h in to_process:
+            if (processor.name, h) not in preprocessed:
+                missing.setdefault(h, e)
+        if missing:
+            for h, output in zip(missing, processor(list(missing.values()))):
+                preprocessed[(processor.name, h)] = output
+        for e, h in to_process:
+            e.__setattr__(processor.field, preprocessed[(processor.name, h)])
+
+    outputs: List[Tuple[Example, int]] = []
+    for (orig_example, orig_example_hash), s in zip(inputs, skipped):
+        if s:
+            example, res = None, _CACHED
+        else:
+            preprocessed_outputs = {
+                p.name: preprocessed[(p.name, orig_example_hash)] for p in operation.pre
+            }
+            example = cow_copy(orig_example)
+            res = operation._call_op(example, preprocessed_outputs, run.values)
+        outputs.extend(run.record(orig_example, orig_example_hash, example, res))
+    return outputs
@@ -6,7 +6,7 @@ from spacy.tokens import Span as SpacySpan
 from wasabi import msg
 
 from recon.operations.core import operation
-from recon.types import Correction, Example, Span, Token
+from recon.types import Correction, Example, Span, Tokens
 
 
 @operation("recon.rename_labels.v1")
@@ -219,10 +219,7 @@ def split_sentences(example: Example, preprocessed_outputs: Dict[str, Any] = {})
                 )
                 for e in sent_doc.ents
             ],
-            tokens=[
-                Token(text=t.text, start=t.idx, end=t.idx + len(t.text), id=i)
-                for i, t in enumerate(sent_doc)
-            ],
+            tokens=Tokens.from_doc(sent_doc),
         )
         new_examples.append(new_example)
     return new_examples
@@ -1,8 +1,10 @@
 from collections import defaultdict
 from typing import Any, Dict, Optional
 
+import numpy as np
+
 from recon.operations.core import operation
-from recon.types import Example, Token
+from recon.types import Example, Tokens
 
 
 @operation("recon.fix_tokenization_and_spacing.v1", pre=["recon.spacy.v1"])
@@ -23,36 +25,34 @@ def fix_tokenization_and_spacing(
     """
 
     doc = preprocessed_outputs["recon.spacy.v1"]
+    tokens = Tokens.from_doc(doc)
 
-    tokens = []
-    token_starts = {}
-    token_ends = {}
-
-    for t in doc:
-        start = t.idx
-        end = t.idx + len(t)
-        tokens.append(Token(text=t.text, start=start, end=end, id=t.i))
-        token_starts[start] = t
-        token_ends[end] = t
+    # Check token boundaries for all spans at once
+    span_starts = np.array([span.start for span in example.spans], dtype=np.int64)
+    span_ends = np.array([span.end for span in example.spans], dtype=np.int64)
+    starts_aligned = (tokens.find_starts(span_starts) >= 0).tolist()
+    ends_aligned = (tokens.find_ends(span_ends) >= 0).tolist()
+    next_ends_aligned = (tokens.find_ends(span_ends + 1) >= 0).tolist()
+    prev_ends_aligned = (tokens.find_ends(span_ends - 1) >= 0).tolist()
 
     spans_to_increment: Dict[int, int] = defaultdict(int)
     for span_i, span in enumerate(example.spans):
-        if span.start in token_starts and span.end in token_ends:
+        if starts_aligned[span_i] and ends_aligned[span_i]:
             # Aligns to token boundaries, nothing to change here
             continue
 
-        if span.start in token_starts and span.end not in token_ends:
+        if starts_aligned[span_i] and not ends_aligned[span_i]:
             # Span start aligns to token_start but end doesn't
             # e.g. [customer][PERSONTYPE]s but should be annotated as [customers][PERSONTYPE]
             # tokenization_errors.append((example, span))
             # print("BAD END")
-            if span.end + 1 in token_ends:
+            if next_ends_aligned[span_i]:
                 # Likely off by 1 annotation
                 # e.g. [customer][PERSONTYPE]s but should be annotated as [customers][PERSONTYPE]
                 span.end += 1
                 span.text = example.text[span.start : span.end]
                 # print("SPAN CORRECTED OFF BY 1", example.text, span)
-            elif span.end - 1 in token_ends:
+            elif prev_ends_aligned[span_i]:
                 span.end -= 1
                 span.text = example.text[span.start : span.end]
             else:
@@ -72,7 +72,7 @@ def fix_tokenization_and_spacing(
 
                 example.text = new_text
 
-        elif span.start not in token_starts and span.end in token_ends:
+        elif not starts_aligned[span_i] and ends_aligned[span_i]:
             # Bad tokenization
             # e.g. with[Raymond][PERSON] but text should be split to with [Raymond][PERSON]
             # print("BAD START", span.text)
@@ -131,27 +131,19 @@ def add_tokens(
         Example: Example with tokens
     """
     doc = preprocessed_outputs["recon.spacy.v1"]
-
-    tokens = []
-    token_starts = {}
-    token_ends = {}
-
-    for t in doc:
-        start = t.idx
-        end = t.idx + len(t)
-        tokens.append(Token(text=t.text, start=start, end=end, id=t.i))
-        token_starts[start] = t
-        token_ends[end] = t
-
+    tokens = Tokens.from_doc(doc)
     example.tokens = tokens
 
-    for span in example.spans:
-        if span.start in token_starts and span.end in token_ends:
-            span.token_start = token_starts[span.start].i
+    token_starts = tokens.find_starts([span.start for span in example.spans]).tolist()
+    token_ends = tokens.find_ends([span.end for span in example.spans]).tolist()
+
+    for span, token_start, token_end in zip(example.spans, token_starts, token_ends):
+        if token_start >= 0 and token_end >= 0:
+            span.token_start = token_start
             if use_spacy_token_ends:
-                span.token_end = token_ends[span.end].i + 1
+                span.token_end = token_end + 1
             else:
-                span.token_end = token_ends[span.end].i
+                span.token_end = token_end
 
         if span.token_start is None or span.token_end is None:
             return None
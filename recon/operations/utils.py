@@ -180,20 +180,10 @@ def request_body_to_args(
     values = {}
     errors = []
     if required_params:
-        field = required_params[0]
-        field_info = field.field_info
-        embed = getattr(field_info, "embed", None)
-        field_alias_omitted = len(required_params) == 1 and not embed
-        if field_alias_omitted:
-            received_body = {field.alias: received_body}
-
+        # Received data is always keyed by parameter name (see get_received_operation_data)
+        # so unlike a request body a single parameter isn't embedded
         for field in required_params:
-
-            loc: Tuple[str, ...]
-            if field_alias_omitted:
-                loc = ("body",)
-            else:
-                loc = ("body", field.alias)
+            loc: Tuple[str, ...] = ("body", field.alias)
 
             value = None
             if received_body is not None:
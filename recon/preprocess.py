@@ -3,6 +3,8 @@ from typing import Any, Callable, Dict, Iterable, List, Optional
 
 import catalogue
 import spacy
+import srsly
+import xxhash
 from spacy.language import Language
 
 from recon.linker import BaseEntityLinker, EntityLinker
@@ -58,6 +60,12 @@ class PreProcessor:
     def field(self) -> str:
         return self._field
 
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the outputs of the preprocessor in the keys of cached operation
+        results. Preprocessors with state that changes their outputs include it."""
+        return f"{type(self).__qualname__}:{self.name}:{self.field}"
+
     def __call__(self, data: Iterable[Example]) -> Iterable[Any]:
         raise NotImplementedError
 
@@ -79,6 +87,12 @@ class SpacyPreProcessor(PreProcessor):
             self._nlp.add_pipe("sentencizer")
         return self._nlp
 
+    @property
+    def fingerprint(self) -> str:
+        meta = self.nlp.meta
+        model = f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+        return f"{super().fingerprint}:{model}:{','.join(self.nlp.pipe_names)}"
+
     def __call__(self, data: Iterable[Example]) -> Iterable[Any]:
         unseen_texts = (e.text for i, e in enumerate(data) if hash(e) not in self._cache)
         seen_texts = ((i, e.text) for i, e in enumerate(data) if hash(e) in self._cache)
@@ -111,6 +125,12 @@ class SpanAliasesPreProcessor(PreProcessor):
 
         self.linker = linker
 
+    @property
+    def fingerprint(self) -> str:
+        entities = srsly.json_dumps([e.dict() for e in self.entities], sort_keys=True)
+        linker = type(self.linker).__qualname__
+        return f"{super().fingerprint}:{linker}:{xxhash.xxh64_hexdigest(entities)}"
+
     def __call__(self, data: Iterable[Example]) -> Iterable[Any]:
         outputs = []
 
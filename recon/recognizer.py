@@ -1,13 +1,11 @@
-import tempfile
-from pathlib import Path
 from typing import Iterable, Iterator, List, Set
 
 from spacy.language import Language
-from spacy.training.corpus import Corpus as SpacyCorpus
+from spacy.training import Example as SpacyExample
 from wasabi import Printer
 
-from recon.loaders import to_spacy
-from recon.types import Example, Scores, Span, Token
+from recon.loaders import examples_to_docs
+from recon.types import Example, Scores, Span, Tokens
 
 
 class EntityRecognizer:
@@ -126,7 +124,7 @@ class SpacyEntityRecognizer(EntityRecognizer):
                     )
                     for e in doc.ents
                 ],
-                tokens=[Token(text=t.text, start=t.idx, end=t.idx + len(t), id=t.i) for t in doc],
+                tokens=Tokens.from_doc(doc),
             )
 
     def _evaluate(self, data: List[Example]) -> Scores:
@@ -140,11 +138,12 @@ class SpacyEntityRecognizer(EntityRecognizer):
             Scorer: spaCy scorer object
         """
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            data_path = Path(tmp_dir) / "data.spacy"
-            to_spacy(data_path, data)
-            corpus = SpacyCorpus(data_path, gold_preproc=False)
-            dev_dataset = list(corpus(self.nlp))
-            sc = self.nlp.evaluate(dev_dataset)
-            scores = Scores(**sc)
+        references = examples_to_docs((e for e in data if e.tokens), vocab=self.nlp.vocab)
+        dev_dataset = [
+            SpacyExample(self.nlp.make_doc(reference.text), reference)
+            for reference in references
+            if len(reference) > 0
+        ]
+        sc = self.nlp.evaluate(dev_dataset)
+        scores = Scores(**sc)
         return scores
@@ -0,0 +1,228 @@
+"""Inverted index over the examples of a Dataset used by `Dataset.search`."""
+
+import re
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+from recon.types import Example
+
+SEARCH_MODES = ("substring", "phrase", "prefix", "regex")
+"""Supported query modes of `SearchIndex.search`"""
+
+_TOKEN_RE = re.compile(r"\w+")
+_POSITION_BITS = 24
+_POSITION_MASK = (1 << _POSITION_BITS) - 1
+_EMPTY = array("L")
+
+
+def _terms(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _add_doc(index: Dict[str, array], key: str, doc: int) -> None:
+    postings = index.get(key)
+    if postings is None:
+        postings = index[key] = array("L")
+    if not postings or postings[-1] != doc:
+        postings.append(doc)
+
+
+def _intersect(postings: List[Iterable[int]]) -> Set[int]:
+    postings = sorted(postings, key=len)  # type: ignore
+    docs = set(postings[0])
+    for p in postings[1:]:
+        if not docs:
+            break
+        docs.intersection_update(p)
+    return docs
+
+
+class SearchIndex:
+    """Token level inverted index with positional postings over a list of examples.
+    Text is split into lowercased `\\w+` tokens. Each token has postings of the
+    examples it occurs in and of its positions in them. Span labels and span texts
+    are indexed as well. Queries use the index to find candidate examples and
+    check the candidates against the query, so results match a scan of the data.
+    """
+
+    def __init__(self, data: List[Example]):
+        """Build a SearchIndex
+
+        Args:
+            data (List[Example]): Examples to index
+        """
+        self.data = data
+        self._docs: Dict[str, array] = {}
+        self._positions: Dict[str, array] = {}
+        self._labels: Dict[str, array] = {}
+        self._span_texts: Dict[str, array] = {}
+        self._vocab: Optional[List[str]] = None
+        for doc, example in enumerate(data):
+            for pos, term in enumerate(_terms(example.text)):
+                _add_doc(self._docs, term, doc)
+                if pos <= _POSITION_MASK:
+                    positions = self._positions.get(term)
+                    if positions is None:
+                        positions = self._positions[term] = array("Q")
+                    positions.append((doc << _POSITION_BITS) | pos)
+            for span in example.spans:
+                _add_doc(self._labels, span.label, doc)
+                _add_doc(self._span_texts, span.text.lower(), doc)
+
+    def search(
+        self,
+        query: str = "",
+        case_sensitive: bool = True,
+        mode: str = "substring",
+        label: Optional[str] = None,
+        span_text: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Example]:
+        """Search the indexed examples
+
+        Args:
+            query (str, optional): Query text. Matches every example if empty
+            case_sensitive (bool, optional): Consider case of query, span_text and example text
+            mode (str, optional): How query is matched, one of SEARCH_MODES:
+                "substring": query is a substring of the example text.
+                "phrase": the tokens of query occur in sequence as whole tokens.
+                "prefix": like "phrase" but the last token of query only has to
+                    be the start of a token, e.g. for search as you type.
+                "regex": query is a regular expression searched for in the example text.
+            label (Optional[str], optional): Only match examples with a span with this label
+            span_text (Optional[str], optional): Only match examples with a span with this text.
+                If label is set as well, both have to match the same span
+            meta (Optional[Dict[str, Any]], optional): Only match examples with these meta values
+
+        Raises:
+            ValueError: If mode is not one of SEARCH_MODES
+
+        Returns:
+            Iterator[Example]: Lazy iterator of matched examples in data order
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}. Use one of: {', '.join(SEARCH_MODES)}")
+
+        postings: List[Iterable[int]] = []
+        checks: List[Callable[[Example], bool]] = []
+        if query and mode != "regex":
+            docs = self._query_docs(query, mode)
+            if docs is not None:
+                postings.append(docs)
+        if query:
+            checks.append(self._query_check(query, case_sensitive, mode))
+        if label is not None:
+            postings.append(self._labels.get(label, _EMPTY))
+        if span_text is not None:
+            postings.append(self._span_texts.get(span_text.lower(), _EMPTY))
+        if label is not None or span_text is not None:
+            checks.append(self._span_check(label, span_text, case_sensitive))
+        if meta:
+            checks.append(lambda e: all(e.meta.get(k) == v for k, v in meta.items()))
+
+        candidates: Iterable[int] = range(len(self.data))
+        if postings:
+            candidates = sorted(_intersect(postings))
+        return self._iter_matches(candidates, checks)
+
+    def _iter_matches(
+        self, candidates: Iterable[int], checks: List[Callable[[Example], bool]]
+    ) -> Iterator[Example]:
+        for doc in candidates:
+            example = self.data[doc]
+            if all(check(example) for check in checks):
+                yield example
+
+    def _query_docs(self, query: str, mode: str) -> Optional[Set[int]]:
+        """Examples that can match query, a superset of the matches.
+        None if the query has no tokens so the index can't narrow it down.
+        """
+        terms = _terms(query)
+        if not terms:
+            return None
+        if mode == "substring":
+            if len(terms) == 1:
+                return self._union_docs(t for t in self._docs if terms[0] in t)
+            # Query can start and end in the middle of a token
+            postings: List[Iterable[int]] = [
+                self._union_docs(t for t in self._docs if t.endswith(terms[0])),
+                self._union_docs(self._prefix_terms(terms[-1])),
+            ]
+            postings.extend(self._docs.get(t, _EMPTY) for t in terms[1:-1])
+            return _intersect(postings)
+        return self._phrase_docs(terms, prefix=mode == "prefix")
+
+    def _phrase_docs(self, terms: List[str], prefix: bool) -> Set[int]:
+        term_positions: List[Union[array, Set[int]]] = []
+        for i, term in enumerate(terms):
+            if prefix and i == len(terms) - 1:
+                positions: Set[int] = set()
+                for t in self._prefix_terms(term):
+                    positions.update(self._positions[t])
+                term_positions.append(positions)
+            else:
+                term_positions.append(self._positions.get(term, _EMPTY))
+
+        # Align the positions of each term to the start of the phrase, rarest term first
+        order = sorted(range(len(terms)), key=lambda i: len(term_positions[i]))
+        first = order[0]
+        starts = {p - first for p in term_positions[first] if p & _POSITION_MASK >= first}
+        for i in order[1:]:
+            if not starts:
+                break
+            other = term_positions[i]
+            other_set = other if isinstance(other, set) else set(other)
+            starts = {s for s in starts if s + i in other_set}
+        return {s >> _POSITION_BITS for s in starts}
+
+    def _union_docs(self, terms: Iterable[str]) -> Set[int]:
+        docs: Set[int] = set()
+        for term in terms:
+            docs.update(self._docs[term])
+        return docs
+
+    def _prefix_terms(self, prefix: str) -> Iterator[str]:
+        if self._vocab is None:
+            self._vocab = sorted(self._docs)
+        vocab = self._vocab
+        i = bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            yield vocab[i]
+            i += 1
+
+    @staticmethod
+    def _query_check(query: str, case_sensitive: bool, mode: str) -> Callable[[Example], bool]:
+        flags = 0 if case_sensitive else re.IGNORECASE
+        if mode == "substring":
+            if case_sensitive:
+                return lambda e: query in e.text
+            query_lower = query.lower()
+            return lambda e: query_lower in e.text.lower()
+        if mode == "regex":
+            pattern = re.compile(query, flags)
+        else:
+            words = _TOKEN_RE.findall(query)
+            end = "" if mode == "prefix" else r"(?!\w)"
+            pattern = re.compile(r"(?<!\w)" + r"\W+".join(map(re.escape, words)) + end, flags)
+        return lambda e: pattern.search(e.text) is not None
+
+    @staticmethod
+    def _span_check(
+        label: Optional[str], span_text: Optional[str], case_sensitive: bool
+    ) -> Callable[[Example], bool]:
+        if span_text is not None and not case_sensitive:
+            span_text = span_text.lower()
+
+        def check(example: Example) -> bool:
+            for span in example.spans:
+                if label is not None and span.label != label:
+                    continue
+                if span_text is not None:
+                    text = span.text if case_sensitive else span.text.lower()
+                    if text != span_text:
+                        continue
+                return True
+            return False
+
+        return check
@@ -1,6 +1,16 @@
 import math
 from collections import defaultdict
-from typing import Any, DefaultDict, Dict, List, Optional, Sequence, Union, cast
+from typing import (
+    Any,
+    DefaultDict,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+    cast,
+)
 
 import numpy as np
 from scipy.spatial.distance import jensenshannon
@@ -11,7 +21,9 @@ from recon.types import EntityCoverage, EntityCoverageStats, Example, Outliers,
 
 
 def get_ner_stats(data: List[Example], return_examples: bool = False) -> Stats:
-    """Compute statistics for NER data
+    """Compute statistics for NER data. Stats are aggregated in a single pass
+    over data and examples are only kept if return_examples is set, so data
+    can be streamed, e.g. the ExampleSegment of a streaming Dataset.
 
     Args:
         data (Iterator[Example]): Data as a List of examples
@@ -22,23 +34,27 @@ def get_ner_stats(data: List[Example], return_examples: bool = False) -> Stats:
     """
     annotations_per_type: DefaultDict[str, Any] = defaultdict(int)
     examples: DefaultDict[str, Any] = defaultdict(list)
+    n_examples = 0
     n_examples_no_entities = 0
 
     for e in data:
+        n_examples += 1
         if not e.spans:
             n_examples_no_entities += 1
-            examples[NOT_LABELED].append(e)
+            if return_examples:
+                examples[NOT_LABELED].append(e)
         else:
             for s in e.spans:
                 annotations_per_type[s.label] += 1
-                examples[s.label].append(e)
+                if return_examples:
+                    examples[s.label].append(e)
 
     sorted_anns_by_count = {
         a[0]: a[1] for a in sorted(annotations_per_type.items(), key=lambda x: x[1], reverse=True)
     }
 
     stats = Stats(
-        n_examples=len(data),
+        n_examples=n_examples,
         n_examples_no_entities=n_examples_no_entities,
         n_annotations=sum(annotations_per_type.values()),
         n_annotations_per_type=sorted_anns_by_count,
@@ -49,6 +65,47 @@ def get_ner_stats(data: List[Example], return_examples: bool = False) -> Stats:
     return stats
 
 
+def update_ner_stats(
+    stats: Stats, added: Iterable[Example] = (), removed: Iterable[Example] = ()
+) -> Stats:
+    """Update stats from `get_ner_stats` for examples added to and removed from
+    the data without scanning the rest of the data. A changed example is
+    removed in its old version and added in its new version.
+
+    Args:
+        stats (Stats): Stats of the data before the change
+        added (Iterable[Example], optional): Examples added to the data
+        removed (Iterable[Example], optional): Examples removed from the data
+
+    Returns:
+        Stats: Stats of the data after the change
+    """
+    annotations_per_type: DefaultDict[str, int] = defaultdict(int, stats.n_annotations_per_type)
+    n_examples = stats.n_examples
+    n_examples_no_entities = stats.n_examples_no_entities
+
+    for examples, sign in ((added, 1), (removed, -1)):
+        for e in examples:
+            n_examples += sign
+            if not e.spans:
+                n_examples_no_entities += sign
+            for s in e.spans:
+                annotations_per_type[s.label] += sign
+
+    sorted_anns_by_count = {
+        a[0]: a[1]
+        for a in sorted(annotations_per_type.items(), key=lambda x: x[1], reverse=True)
+        if a[1] > 0
+    }
+
+    return Stats(
+        n_examples=n_examples,
+        n_examples_no_entities=n_examples_no_entities,
+        n_annotations=sum(sorted_anns_by_count.values()),
+        n_annotations_per_type=sorted_anns_by_count,
+    )
+
+
 def get_sorted_type_counts(ner_stats: Stats) -> List[int]:
     """Get list of counts for each type in n_annotations_per_type property
     of an Stats object sorted by type name
@@ -125,7 +182,8 @@ def get_entity_coverage(
             text = span.text if case_sensitive else span.text.lower()
             key = f"{text}{sep}{span.label}"
             coverage_map[key] += 1
-            examples_map[key].append(example)
+            if return_examples:
+                examples_map[key].append(example)
 
     coverage = []
     for key, count in coverage_map.items():
@@ -1,15 +1,361 @@
+import mmap
+import os
+import random
+import struct
+import tempfile
+import weakref
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict, List, Union, cast
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
+import numpy as np
 import srsly
 
+from recon.formats import RECORD_FORMATS, read_records, write_records
+from recon.hashing import (
+    dump_key,
+    example_fingerprint,
+    get_hash_version,
+    hash_key,
+    hash_many,
+)
+from recon.journal import (
+    SavedStoreState,
+    append_journal,
+    can_journal,
+    clear_journal,
+    read_journal,
+)
 from recon.types import Example
 from recon.utils import ensure_path
 
+if TYPE_CHECKING:
+    from recon.dataset import Dataset
+
+
+class HashCollisionError(ValueError):
+    """Raised when 2 different examples have the same key in an ExampleStore"""
+
+    def __init__(self, example_hash: int, example: Example, other: Example):
+        self.example_hash = example_hash
+        self.example = example
+        self.other = other
+        super().__init__(
+            f"Hash collision in ExampleStore for key: {example_hash}. "
+            f"Example with text: {other.text!r} has the same key as stored example "
+            f"with text: {example.text!r}. Use hash version 3 for 128 bit example keys."
+        )
+
+
+def example_delta(base: Example, example: Example) -> Optional[Dict[str, Any]]:
+    """Encode an Example as a delta against a base Example with the same text.
+    The text and unchanged tokens are omitted and spans equal to a span of the
+    base are replaced by the index of that span in the base spans.
+
+    Args:
+        base (Example): Base Example, usually the previous revision of example
+        example (Example): Example to encode
+
+    Returns:
+        Optional[Dict[str, Any]]: Delta or None if the examples have different text
+    """
+    if example.text != base.text:
+        return None
+    delta = example.serialize()
+    del delta["text"]
+    if example.tokens is base.tokens or example.tokens == base.tokens:
+        del delta["tokens"]
+    base_spans = {span: i for i, span in enumerate(base.spans)}
+    delta["spans"] = [
+        base_spans.get(span, span_data) for span, span_data in zip(example.spans, delta["spans"])
+    ]
+    return delta
+
+
+def apply_delta(base: Example, delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstruct the data of an Example from a delta created by `example_delta`
+
+    Args:
+        base (Example): Base Example the delta was created against
+        delta (Dict[str, Any]): Delta
+
+    Returns:
+        Dict[str, Any]: Example data
+    """
+    data = dict(delta)
+    data["text"] = base.text
+    data["spans"] = [base.spans[s].dict() if isinstance(s, int) else s for s in delta["spans"]]
+    if "tokens" not in delta:
+        data["tokens"] = base.tokens
+    return data
+
+
+def examples_from_records(
+    records: List[Dict[str, Any]], make: Callable[[Dict[str, Any]], Example]
+) -> List[Example]:
+    """Create the Examples of records saved by `ExampleStore.to_disk`,
+    resolving delta encoded records against their base record.
+
+    Args:
+        records (List[Dict[str, Any]]): Saved records
+        make (Callable[[Dict[str, Any]], Example]): Create an Example from its data,
+            e.g. `Example.construct_trusted` or `lambda data: Example(**data)`
+
+    Raises:
+        ValueError: If the bases of delta encoded records form a cycle
+
+    Returns:
+        List[Example]: Example of each record
+    """
+    by_key = {int(r["example_hash"]): r for r in records}
+    examples: Dict[int, Example] = {}
+    loading: Set[int] = set()
+
+    def load(example_hash: int) -> Example:
+        example = examples.get(example_hash)
+        if example is None:
+            record = by_key[example_hash]
+            if "delta" in record:
+                if example_hash in loading:
+                    raise ValueError(
+                        f"Saved example {example_hash} is a delta against itself through "
+                        "the bases of other saved examples."
+                    )
+                loading.add(example_hash)
+                data = apply_delta(load(int(record["base"])), record["delta"])
+            else:
+                data = record["example"]
+            example = make(data)
+            examples[example_hash] = example
+        return example
+
+    return [load(int(r["example_hash"])) for r in records]
+
+
+BINARY_STORE_FORMAT = ".bin"
+"""Extension of binary store files. See `write_binary_records`"""
+
+STORE_FORMATS = RECORD_FORMATS + (BINARY_STORE_FORMAT,)
+"""Supported extensions of files saved by `ExampleStore.to_disk`"""
+
+_BINARY_MAGIC = b"RECONST1"
+_BINARY_HEADER = struct.Struct("<8sQQ")
+_INDEX_COLUMNS = (
+    ("lo", "<u8"),
+    ("hi", "<u8"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("fingerprint", "<u4"),
+)
+_KEY_MASK = 2**64 - 1
+
+
+def write_binary_records(path: Union[str, Path], records: Iterable[Dict[str, Any]]) -> None:
+    """Write the records of an ExampleStore to a binary store file.
+    The file has a header, the msgpack encoded records and an index of the
+    records sorted by key. The index is stored as contiguous columns of the
+    low and high 64 bits of each key and the offset, length and fingerprint
+    of its record so it can be memory mapped and binary searched without
+    being read. See `MmapExampleStore`
+
+    Args:
+        path (Union[str, Path]): Path of the binary store file
+        records (Iterable[Dict[str, Any]]): Records as created by `ExampleStore.to_disk`
+    """
+    path = ensure_path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    columns: Dict[str, List[int]] = {name: [] for name, _ in _INDEX_COLUMNS}
+    with tmp_path.open("wb") as f:
+        f.write(_BINARY_HEADER.pack(_BINARY_MAGIC, 0, 0))
+        for record in records:
+            data = srsly.msgpack_dumps(record)
+            example_hash = int(record["example_hash"])
+            fingerprint = record.get("fingerprint")
+            if fingerprint is None:
+                # Records without a fingerprint are never delta encoded
+                fingerprint = example_fingerprint(Example(**record["example"]))
+            columns["lo"].append(example_hash & _KEY_MASK)
+            columns["hi"].append(example_hash >> 64)
+            columns["offset"].append(f.tell())
+            columns["length"].append(len(data))
+            columns["fingerprint"].append(fingerprint)
+            f.write(data)
+        # Align the index so the columns can be mapped without copies
+        f.write(b"\0" * (-f.tell() % 8))
+        index_offset = f.tell()
+        arrays = [np.array(columns[name], dtype=dtype) for name, dtype in _INDEX_COLUMNS]
+        order = np.lexsort((arrays[1], arrays[0]))
+        for array in arrays:
+            f.write(array[order].tobytes())
+        f.seek(0)
+        f.write(_BINARY_HEADER.pack(_BINARY_MAGIC, len(order), index_offset))
+    os.replace(tmp_path, path)
+
+
+class _BinaryStoreFile:
+    """Read only memory mapping of a binary store file"""
+
+    def __init__(self, path: Path):
+        with path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, offset = _BINARY_HEADER.unpack_from(self._mmap)
+        if magic != _BINARY_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Not a binary ExampleStore file: {path}")
+        self._columns: Dict[str, np.ndarray] = {}
+        for name, dtype in _INDEX_COLUMNS:
+            self._columns[name] = np.frombuffer(self._mmap, dtype=dtype, count=n, offset=offset)
+            offset += n * np.dtype(dtype).itemsize
+
+    def __len__(self) -> int:
+        return len(self._columns["lo"])
+
+    def find(self, example_hash: int) -> int:
+        """Row of example_hash in the index, -1 if it isn't stored"""
+        lo = self._columns["lo"]
+        key_lo = np.uint64(example_hash & _KEY_MASK)
+        key_hi = example_hash >> 64
+        i = int(np.searchsorted(lo, key_lo))
+        while i < len(lo) and lo[i] == key_lo:
+            if int(self._columns["hi"][i]) == key_hi:
+                return i
+            i += 1
+        return -1
+
+    def key(self, i: int) -> int:
+        return (int(self._columns["hi"][i]) << 64) | int(self._columns["lo"][i])
+
+    def keys(self) -> Iterator[int]:
+        hi = self._columns["hi"]
+        if not hi.any():
+            yield from self._columns["lo"].tolist()
+        else:
+            for h, lo in zip(hi.tolist(), self._columns["lo"].tolist()):
+                yield (h << 64) | lo
+
+    def fingerprint(self, i: int) -> int:
+        return int(self._columns["fingerprint"][i])
+
+    def record(self, i: int) -> Dict[str, Any]:
+        offset = int(self._columns["offset"][i])
+        length = int(self._columns["length"][i])
+        return cast(Dict[str, Any], srsly.msgpack_loads(self._mmap[offset : offset + length]))
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Records in the order they were written"""
+        for i in np.argsort(self._columns["offset"]).tolist():
+            yield self.record(i)
+
+    def close(self) -> None:
+        # The mapping can't be closed while the index columns reference it
+        self._columns = {}
+        self._mmap.close()
+
+
+def read_binary_records(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Stream the records of a binary store file written by `write_binary_records`
+
+    Args:
+        path (Union[str, Path]): Path of the binary store file
+
+    Yields:
+        Iterator[Dict[str, Any]]: Records in the order they were written
+    """
+    store_file = _BinaryStoreFile(ensure_path(path))
+    try:
+        yield from store_file.records()
+    finally:
+        store_file.close()
+
+
+def read_store_file(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """Stream the records of a file saved by `ExampleStore.to_disk` in any of STORE_FORMATS
+
+    Args:
+        path (Union[str, Path]): Path of the store file
+
+    Yields:
+        Iterator[Dict[str, Any]]: Records
+    """
+    if str(path).endswith(BINARY_STORE_FORMAT):
+        return read_binary_records(path)
+    return read_records(path)
+
+
+def write_store_file(path: Union[str, Path], records: Iterable[Dict[str, Any]]) -> None:
+    """Write the records of an ExampleStore in the format of the path extension,
+    one of STORE_FORMATS
+
+    Args:
+        path (Union[str, Path]): Path of the store file
+        records (Iterable[Dict[str, Any]]): Records
+    """
+    if str(path).endswith(BINARY_STORE_FORMAT):
+        write_binary_records(path, records)
+    else:
+        write_records(path, records)
+
+
+def read_store_records(path: Path) -> Tuple[List[Dict[str, Any]], Set[int], int]:
+    """Read the records saved by `ExampleStore.to_disk` including the records
+    appended to its journal by journaled saves.
+
+    Args:
+        path (Path): Path the store was saved to
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Set[int], int]: The latest record saved for each key,
+            including removed keys since delta records can still reference them,
+            the keys of the stored examples and the number of journal entries
+    """
+    by_key: Dict[int, Dict[str, Any]] = {}
+    keys: Set[int] = set()
+    for record in read_store_file(path):
+        example_hash = int(record["example_hash"])
+        by_key[example_hash] = record
+        keys.add(example_hash)
+    entries = read_journal(path)
+    for entry in entries:
+        for record in entry["records"]:
+            example_hash = int(record["example_hash"])
+            by_key[example_hash] = record
+            keys.add(example_hash)
+        for example_hash in entry["removed"]:
+            keys.discard(int(example_hash))
+    return list(by_key.values()), keys, len(entries)
+
 
 class ExampleStore:
-    def __init__(self, examples: List[Example] = []):
+    def __init__(self, examples: List[Example] = [], max_delta_chain: int = 8):
+        """Initialize an ExampleStore
+
+        Args:
+            examples (List[Example], optional): Examples to add
+            max_delta_chain (int, optional): Max number of revisions saved as a delta
+                against the previous revision before a revision is saved in full
+        """
         self._map: Dict[int, Example] = {}
+        self._fingerprints: Dict[int, int] = {}
+        self._bases: Dict[int, int] = {}
+        self._derived: Dict[int, Set[int]] = {}
+        self.max_delta_chain = max_delta_chain
+        self._owners: List["weakref.ReferenceType[Dataset]"] = []
+        self._saved: Optional[SavedStoreState] = None
+        hash_many(examples)
         for e in examples:
             self.add(e)
 
@@ -22,7 +368,7 @@ class ExampleStore:
         Returns:
             Number of examples in store
         """
-        return len(self._map)
+        return len(self._fingerprints)
 
     def __contains__(self, example: Union[int, Example]) -> bool:
         """Check whether a string is in the store.
@@ -33,48 +379,771 @@ class ExampleStore:
         Returns:
             Whether the store contains the example.
         """
-        example_hash = hash(example) if isinstance(example, Example) else example
-        return example_hash in self._map
+        example_hash = example.key if isinstance(example, Example) else example
+        return example_hash in self._fingerprints
+
+    def __delitem__(self, example_hash: int) -> None:
+        del self._map[example_hash]
+        self._fingerprints.pop(example_hash, None)
+        self._rebase_derived(example_hash)
+
+    def _rebase_derived(self, example_hash: int) -> None:
+        """Rebase the revisions with a removed example as their base onto the
+        base of the removed example, or save them in full if it has none
+
+        Args:
+            example_hash (int): Key of the removed example
+        """
+        base = self._get_base(example_hash)
+        self._unlink_base(example_hash)
+        for derived_hash in self._derived.pop(example_hash, set()):
+            self._bases.pop(derived_hash, None)
+            self._set_base(derived_hash, base)
 
-    def add(self, example: Example) -> None:
-        """Add an Example to the store
+    def add(self, example: Example, base: Optional[int] = None) -> None:
+        """Add an Example to the store. Each example is stored with a secondary
+        fingerprint so adding a different example with the same key
+        raises an error instead of silently replacing the stored example.
 
         Args:
             example (Example): example to add
+            base (Optional[int], optional): Key of the previous revision of example.
+                The example is saved as a delta against it where possible
+
+        Raises:
+            HashCollisionError: If a different example with the same key is already stored
+        """
+        example_hash = example.key
+        fingerprint = example_fingerprint(example)
+        stored_fingerprint = self._get_fingerprint(example_hash)
+        if stored_fingerprint is not None and stored_fingerprint != fingerprint:
+            raise HashCollisionError(example_hash, self[example_hash], example)
+        if stored_fingerprint is not None or base == example_hash:
+            base = None
+        self._put(example_hash, example, fingerprint, base)
+
+    def _get_fingerprint(self, example_hash: int) -> Optional[int]:
+        return self._fingerprints.get(example_hash)
+
+    def _get_base(self, example_hash: int) -> Optional[int]:
+        return self._bases.get(example_hash)
+
+    def _set_base(self, example_hash: int, base: Optional[int]) -> None:
+        """Record base as the previous revision of a stored example unless it
+        isn't stored or its chain of bases leads back to the example
+
+        Args:
+            example_hash (int): Key of stored example
+            base (Optional[int]): Key of the previous revision
         """
-        example_hash = hash(example)
+        if base is None or base not in self or self._reaches(base, example_hash):
+            return
+        self._bases[example_hash] = base
+        self._derived.setdefault(base, set()).add(example_hash)
+
+    def _unlink_base(self, example_hash: int) -> None:
+        base = self._bases.pop(example_hash, None)
+        derived = self._derived.get(base) if base is not None else None
+        if derived is not None:
+            derived.discard(example_hash)
+            if not derived:
+                del self._derived[cast(int, base)]
+
+    def _reaches(self, example_hash: int, target: int) -> bool:
+        """Check if the chain of bases from example_hash leads to target"""
+        seen = set()
+        key: Optional[int] = example_hash
+        while key is not None and key not in seen:
+            if key == target:
+                return True
+            seen.add(key)
+            key = self._get_base(key)
+        return False
+
+    def _put(
+        self, example_hash: int, example: Example, fingerprint: int, base: Optional[int] = None
+    ) -> None:
         self._map[example_hash] = example
+        self._fingerprints[example_hash] = fingerprint
+        self._set_base(example_hash, base)
+
+    def _delta_base(self, example_hash: int, depths: Dict[int, int]) -> Optional[int]:
+        """Get the base to save a stored example as a delta against, None if it
+        should be saved in full. Revisions are saved in full when the base isn't stored
+        or the chain of deltas would be longer than max_delta_chain.
+
+        Args:
+            example_hash (int): Key of stored example
+            depths (Dict[int, int]): Delta chain length of keys already resolved
+
+        Returns:
+            Optional[int]: Key of the base
+        """
+        chain = []
+        seen = set()
+        key: Optional[int] = example_hash
+        while key is not None and key not in depths:
+            if key in seen:
+                # Save the revision closing a cycle of bases in full
+                key = None
+                break
+            chain.append(key)
+            seen.add(key)
+            base = self._get_base(key)
+            key = base if base is not None and base in self else None
+        depth = -1 if key is None else depths[key]
+        for key in reversed(chain):
+            depth += 1
+            base = self._get_base(key)
+            if depth > self.max_delta_chain or base is None or base not in self:
+                depth = 0
+            depths[key] = depth
+        if depths[example_hash] == 0:
+            return None
+        return self._get_base(example_hash)
+
+    def keys(self) -> Iterator[int]:
+        """Iterate over the keys of the stored examples
+
+        Yields:
+            Iterator[int]: Example keys
+        """
+        yield from self._fingerprints
+
+    def items(self) -> Iterator[Tuple[int, Example]]:
+        """Iterate over the stored examples
+
+        Yields:
+            Iterator[Tuple[int, Example]]: Tuples of (example key, example)
+        """
+        yield from self._map.items()
+
+    def register(self, dataset: "Dataset") -> None:
+        """Register a Dataset that references examples in this store.
+        Only examples referenced by a registered Dataset are kept by `compact`
+        and `release`. Datasets register themselves with their store.
+
+        Args:
+            dataset (Dataset): Dataset using this store
+        """
+        if dataset not in self.owners:
+            self._owners.append(weakref.ref(dataset))
+
+    @property
+    def owners(self) -> List["Dataset"]:
+        """Live Datasets registered with this store
+
+        Returns:
+            List[Dataset]: Registered Datasets
+        """
+        owners = []
+        for ref in self._owners:
+            dataset = ref()
+            if dataset is not None and dataset.example_store is self:
+                owners.append(dataset)
+        return owners
+
+    def reachable_keys(self, history: Optional[int] = None) -> Set[int]:
+        """Keys of the examples referenced by the data of registered Datasets
+        or by the transformations of their last `history` operations
+
+        Args:
+            history (Optional[int], optional): Number of most recent operations
+                of each Dataset to keep examples for. Defaults to all operations
+
+        Raises:
+            ValueError: If no Dataset is registered with the store
+
+        Returns:
+            Set[int]: Reachable example keys
+        """
+        owners = self.owners
+        if not owners:
+            raise ValueError("No Dataset is registered with this ExampleStore.")
+        keys: Set[int] = set()
+        for dataset in owners:
+            keys.update(dataset.example_keys(history=history))
+        return keys
+
+    def release(self, example_hashes: Iterable[int]) -> None:
+        """Remove examples no longer needed by a Dataset from the store
+        unless they're still reachable from a registered Dataset.
+        Only the given keys are checked against each Dataset, so releasing
+        costs time in the number of keys instead of the size of the Datasets.
+
+        Args:
+            example_hashes (Iterable[int]): Keys of examples to remove
+
+        Raises:
+            ValueError: If no Dataset is registered with the store
+        """
+        owners = self.owners
+        if not owners:
+            raise ValueError("No Dataset is registered with this ExampleStore.")
+        for example_hash in example_hashes:
+            if example_hash in self and not any(ds._references(example_hash) for ds in owners):
+                del self[example_hash]
+
+    def compact(self, history: Optional[int] = None) -> int:
+        """Remove all examples that aren't reachable from the data of registered Datasets
+        or from the transformations of their last `history` operations and compact
+        the storage of the remaining examples. Rolling back more than `history`
+        operations of a Dataset isn't possible after compacting.
+
+        Args:
+            history (Optional[int], optional): Number of most recent operations
+                of each Dataset to keep examples for. Defaults to all operations
+
+        Returns:
+            int: Number of examples removed
+        """
+        reachable = self.reachable_keys(history=history)
+        unreachable = [h for h in self.keys() if h not in reachable]
+        for example_hash in unreachable:
+            del self[example_hash]
+        self._compact_storage()
+        return len(unreachable)
+
+    def _compact_storage(self) -> None:
+        pass
 
-    def from_disk(self, path: Union[str, Path]) -> "ExampleStore":
+    def audit(self) -> List[int]:
+        """Find stored examples that no longer match their key.
+        Examples are expected to be immutable once stored, an example changed
+        in place breaks `Dataset.rollback` the same way a hash collision does.
+        The memoized hash of unchanged examples is reused so only changed
+        examples are hashed again.
+
+        Returns:
+            List[int]: Keys of the stored examples that changed
+        """
+        changed = []
+        for example_hash, example in self.items():
+            if example.key != example_hash:
+                changed.append(example_hash)
+        return changed
+
+    def from_disk(
+        self, path: Union[str, Path], trusted: bool = False, n_verify: int = 100
+    ) -> "ExampleStore":
         """Load store from disk
 
         Args:
             path (Path): Path to file to load from
+            trusted (bool, optional): The store was saved by recon, construct examples
+                without validation and only verify the stored hashes of a random sample
+            n_verify (int, optional): Number of stored hashes to verify if trusted
+
+        Raises:
+            ValueError: If a verified stored hash doesn't match the example hash
 
         Returns:
             ExampleStore: Initialized ExampleStore
         """
         path = ensure_path(path)
-        examples = srsly.read_jsonl(path)
-        for e in examples:
-            e = cast(Dict[str, Any], e)
-            example_hash = e["example_hash"]
-            raw_example = e["example"]
-            example = Example(**raw_example)
-            assert hash(example) == example_hash
-            self.add(example)
+        records, keys, n_entries = read_store_records(path)
+        if not trusted:
+            examples = examples_from_records(records, lambda data: Example(**data))
+            example_hashes = hash_many(examples)
+            for e, example, h in zip(records, examples, example_hashes):
+                self._verify_hash(e, h)
+                if int(e["example_hash"]) in keys:
+                    self.add(example, base=self._record_base(e))
+        else:
+            examples = examples_from_records(records, Example.construct_trusted)
+            sample = random.sample(range(len(records)), min(n_verify, len(records)))
+            sample_hashes = hash_many([examples[i] for i in sample])
+            for i, h in zip(sample, sample_hashes):
+                self._verify_hash(records[i], h)
 
+            for e, example in zip(records, examples):
+                example_hash = int(e["example_hash"])
+                if example_hash not in keys:
+                    continue
+                fingerprint = e.get("fingerprint")
+                if fingerprint is None:
+                    fingerprint = example_fingerprint(example)
+                self._put(example_hash, example, fingerprint, self._record_base(e))
+
+        self._saved = SavedStoreState(path.resolve(), get_hash_version(), n_entries, keys)
         return self
 
-    def to_disk(self, path: Union[str, Path]) -> None:
+    @staticmethod
+    def _record_base(record: Dict[str, Any]) -> Optional[int]:
+        return int(record["base"]) if "base" in record else None
+
+    @staticmethod
+    def _verify_hash(record: Dict[str, Any], example_hash: Union[int, str]) -> None:
+        if hash_key(cast(int, example_hash)) != int(record["example_hash"]):
+            raise ValueError(
+                f"Stored hash for example does not match its hash with the active hash version: {get_hash_version()}. "
+                "If the store was saved with a different hash version, use recon.migrate.migrate_hashes to rewrite it."
+            )
+
+    def to_disk(self, path: Union[str, Path], journal: bool = False) -> None:
         """Save store to disk
 
         Args:
-            path (Path): Path to save store to
+            path (Path): Path to save store to. The file format is set by its
+                extension, one of STORE_FORMATS
+            journal (bool, optional): If the store was last saved to or loaded from path,
+                only append the examples added and removed since then to the journal of
+                path. A full checkpoint is written instead once the journal has
+                JOURNAL_MAX_ENTRIES entries. See `recon.journal`
         """
         path = ensure_path(path)
-        examples = []
-        for example_hash, example in self._map.items():
-            examples.append({"example_hash": example_hash, "example": example.dict()})
+        depths: Dict[int, int] = {}
+        saved = self._saved
+        if journal and saved is not None and self.can_journal(path):
+            records = [
+                self._record(h, self[h], self._delta_base(h, depths))
+                for h in self.keys()
+                if h not in saved.example_hashes
+            ]
+            removed = [dump_key(h) for h in saved.example_hashes if h not in self]
+            if records or removed:
+                append_journal(path, {"records": records, "removed": removed})
+                saved.n_entries += 1
+            saved.example_hashes = set(self.keys())
+            return
+
+        write_store_file(
+            path,
+            (
+                self._record(example_hash, example, self._delta_base(example_hash, depths))
+                for example_hash, example in self.items()
+            ),
+        )
+        clear_journal(path)
+        self._saved = SavedStoreState(path.resolve(), get_hash_version(), 0, set(self.keys()))
+
+    def can_journal(self, path: Union[str, Path]) -> bool:
+        """Check if a journaled save to path can append to the journal of the
+        last saved checkpoint instead of writing a new checkpoint
+
+        Args:
+            path (Union[str, Path]): Path to save store to
+
+        Returns:
+            bool: Whether the save can be journaled
+        """
+        return can_journal(self._saved, ensure_path(path), get_hash_version())
+
+    def _record(
+        self, example_hash: int, example: Example, base: Optional[int] = None
+    ) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "example_hash": dump_key(example_hash),
+            "fingerprint": self._get_fingerprint(example_hash),
+        }
+        delta = None if base is None else example_delta(self[base], example)
+        if delta is None:
+            record["example"] = example.serialize()
+        else:
+            record["base"] = dump_key(base)
+            record["delta"] = delta
+        return record
+
+
+class DiskExampleStore(ExampleStore):
+    """ExampleStore that keeps examples in an append-only segment file on disk
+    and only holds a bounded LRU cache of recently used examples in memory.
+    Keys, fingerprints and the offset of each example in the segment file
+    are kept in memory. Lines in the segment file have the same format as
+    the records of `ExampleStore.to_disk`, revisions are delta encoded
+    when they're added. Lines of removed examples are kept until the
+    store is compacted since other lines may be deltas against them.
+    """
+
+    def __init__(
+        self,
+        examples: List[Example] = [],
+        path: Optional[Union[str, Path]] = None,
+        cache_size: int = 10000,
+        max_delta_chain: int = 8,
+    ):
+        """Initialize a DiskExampleStore
+
+        Args:
+            examples (List[Example], optional): Examples to add
+            path (Optional[Union[str, Path]], optional): Path of the segment file.
+                Existing contents are overwritten. Defaults to an anonymous temporary file
+            cache_size (int, optional): Max number of examples cached in memory
+            max_delta_chain (int, optional): Max number of revisions saved as a delta
+                against the previous revision before a revision is saved in full
+        """
+        self._file: IO[bytes]
+        self._path = None if path is None else ensure_path(path)
+        if self._path is None:
+            self._file = tempfile.TemporaryFile(prefix="recon_store_")
+        else:
+            self._file = self._path.open("w+b")
+        self.cache_size = cache_size
+        self._offsets: Dict[int, Tuple[int, int]] = {}
+        self._removed_offsets: Dict[int, Tuple[int, int]] = {}
+        self._depths: Dict[int, int] = {}
+        self._cache: "OrderedDict[int, Example]" = OrderedDict()
+        super().__init__(examples, max_delta_chain=max_delta_chain)
+
+    def __getitem__(self, example_hash: int) -> Example:
+        example = self._cache.get(example_hash)
+        if example is not None:
+            self._cache.move_to_end(example_hash)
+            return example
+        example = self._read(example_hash)
+        self._cache_example(example_hash, example)
+        return example
+
+    def __delitem__(self, example_hash: int) -> None:
+        # The line and base of a removed example are kept until the store is compacted
+        # since lines of other revisions may be deltas against it
+        self._removed_offsets[example_hash] = self._offsets.pop(example_hash)
+        self._cache.pop(example_hash, None)
+        self._fingerprints.pop(example_hash, None)
+
+    def _put(
+        self, example_hash: int, example: Example, fingerprint: int, base: Optional[int] = None
+    ) -> None:
+        self._fingerprints[example_hash] = fingerprint
+        if example_hash in self._removed_offsets:
+            # Restore the line of a removed example instead of writing a delta
+            # against a revision that may be saved as a delta against it
+            self._offsets[example_hash] = self._removed_offsets.pop(example_hash)
+        elif example_hash not in self._offsets:
+            self._set_base(example_hash, base)
+            base = self._delta_base(example_hash, self._depths)
+            self._write(example_hash, self._record(example_hash, example, base), self._file)
+        self._cache_example(example_hash, example)
+
+    def _write(self, example_hash: int, record: Dict[str, Any], file: IO[bytes]) -> None:
+        line = srsly.json_dumps(record).encode("utf8") + b"\n"
+        file.seek(0, 2)
+        self._offsets[example_hash] = (file.tell(), len(line))
+        file.write(line)
+
+    def _compact_storage(self) -> None:
+        """Rewrite the segment file with only the lines of stored examples"""
+        if self._path is None:
+            new_file = tempfile.TemporaryFile(prefix="recon_store_")
+        else:
+            new_path = self._path.with_name(self._path.name + ".compact")
+            new_file = new_path.open("w+b")
+        offsets = {}
+        rebased = {}
+        for example_hash, (offset, length) in sorted(self._offsets.items(), key=lambda x: x[1]):
+            base = self._bases.get(example_hash)
+            if base is not None and base not in self:
+                # Save revisions of removed examples in full
+                rebased[example_hash] = self._read(example_hash)
+                continue
+            self._file.seek(offset)
+            offsets[example_hash] = (new_file.tell(), length)
+            new_file.write(self._file.read(length))
+        self._offsets = offsets
+        for example_hash in self._removed_offsets:
+            self._unlink_base(example_hash)
+        for example_hash, example in rebased.items():
+            self._unlink_base(example_hash)
+            self._depths[example_hash] = 0
+            self._write(example_hash, self._record(example_hash, example), new_file)
+        new_file.flush()
+        self._file.close()
+        if self._path is not None:
+            os.replace(new_path, self._path)
+        self._file = new_file
+        self._removed_offsets = {}
+        self._depths = {h: d for h, d in self._depths.items() if h in self._offsets}
+
+    def _cache_example(self, example_hash: int, example: Example) -> None:
+        self._cache[example_hash] = example
+        self._cache.move_to_end(example_hash)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _read(self, example_hash: int) -> Example:
+        offset, length = self._offsets.get(example_hash) or self._removed_offsets[example_hash]
+        self._file.seek(offset)
+        record = srsly.json_loads(self._file.read(length).decode("utf8"))
+        if "delta" in record:
+            base_hash = int(record["base"])
+            base = self._cache.get(base_hash) or self._read(base_hash)
+            return Example.construct_trusted(apply_delta(base, record["delta"]))
+        return Example.construct_trusted(record["example"])
+
+    def items(self) -> Iterator[Tuple[int, Example]]:
+        """Iterate over the stored examples. Examples that aren't cached
+        are read from disk without being added to the cache.
+
+        Yields:
+            Iterator[Tuple[int, Example]]: Tuples of (example key, example)
+        """
+        for example_hash in list(self._offsets):
+            example = self._cache.get(example_hash)
+            yield example_hash, example if example is not None else self._read(example_hash)
+
+    def close(self) -> None:
+        """Close the segment file"""
+        self._file.close()
+
+
+class MmapExampleStore(ExampleStore):
+    """ExampleStore backed by a memory mapped binary store file, saved by
+    `ExampleStore.to_disk` to a path with the `.bin` extension. Loading only maps
+    the file, examples are decoded when they're looked up by a binary search of
+    the sorted key index. The mapping is read only so processes that load the
+    same file share its pages. Examples added after loading are kept in memory
+    and examples removed from the file are masked until the store is saved.
+    """
+
+    def __init__(
+        self, examples: List[Example] = [], cache_size: int = 10000, max_delta_chain: int = 8
+    ):
+        """Initialize a MmapExampleStore
+
+        Args:
+            examples (List[Example], optional): Examples to add
+            cache_size (int, optional): Max number of examples read from the file
+                cached in memory
+            max_delta_chain (int, optional): Max number of revisions saved as a delta
+                against the previous revision before a revision is saved in full
+        """
+        self._file: Optional[_BinaryStoreFile] = None
+        self._removed: Set[int] = set()
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, Example]" = OrderedDict()
+        super().__init__(examples, max_delta_chain=max_delta_chain)
+
+    def __getitem__(self, example_hash: int) -> Example:
+        example = self._map.get(example_hash)
+        if example is not None:
+            return example
+        example = self._cache.get(example_hash)
+        if example is not None:
+            self._cache.move_to_end(example_hash)
+            return example
+        i = self._find(example_hash)
+        if i < 0:
+            raise KeyError(example_hash)
+        example = self._read(i)
+        self._cache_example(example_hash, example)
+        return example
+
+    def __len__(self) -> int:
+        n_mapped = 0 if self._file is None else len(self._file) - len(self._removed)
+        return len(self._fingerprints) + n_mapped
+
+    def __contains__(self, example: Union[int, Example]) -> bool:
+        if example is None:
+            return False
+        example_hash = example.key if isinstance(example, Example) else example
+        return example_hash in self._fingerprints or self._find(example_hash) >= 0
+
+    def __delitem__(self, example_hash: int) -> None:
+        if example_hash in self._fingerprints:
+            super().__delitem__(example_hash)
+        elif self._find(example_hash) >= 0:
+            self._rebase_derived(example_hash)
+            self._removed.add(example_hash)
+            self._cache.pop(example_hash, None)
+        else:
+            raise KeyError(example_hash)
+
+    def _find(self, example_hash: int) -> int:
+        if self._file is None or example_hash in self._removed:
+            return -1
+        return self._file.find(example_hash)
+
+    def _get_fingerprint(self, example_hash: int) -> Optional[int]:
+        fingerprint = self._fingerprints.get(example_hash)
+        if fingerprint is None:
+            i = self._find(example_hash)
+            if i >= 0:
+                return cast(_BinaryStoreFile, self._file).fingerprint(i)
+        return fingerprint
+
+    def _get_base(self, example_hash: int) -> Optional[int]:
+        base = self._bases.get(example_hash)
+        if base is None:
+            i = self._find(example_hash)
+            if i >= 0:
+                record = cast(_BinaryStoreFile, self._file).record(i)
+                return self._record_base(record)
+        return base
+
+    def _put(
+        self, example_hash: int, example: Example, fingerprint: int, base: Optional[int] = None
+    ) -> None:
+        if self._file is not None and example_hash in self._removed:
+            # Restore a removed example from the file
+            self._removed.discard(example_hash)
+        if self._find(example_hash) < 0:
+            super()._put(example_hash, example, fingerprint, base)
+
+    def _read(self, i: int) -> Example:
+        record = cast(_BinaryStoreFile, self._file).record(i)
+        if "delta" in record:
+            base_hash = int(record["base"])
+            # Bases of records in the file are always in the file, even if removed
+            base = self._cache.get(base_hash) or self._read(
+                cast(_BinaryStoreFile, self._file).find(base_hash)
+            )
+            return Example.construct_trusted(apply_delta(base, record["delta"]))
+        return Example.construct_trusted(record["example"])
+
+    def _cache_example(self, example_hash: int, example: Example) -> None:
+        self._cache[example_hash] = example
+        self._cache.move_to_end(example_hash)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def keys(self) -> Iterator[int]:
+        """Iterate over the keys of the stored examples
+
+        Yields:
+            Iterator[int]: Example keys
+        """
+        if self._file is not None:
+            for example_hash in self._file.keys():
+                if example_hash not in self._removed:
+                    yield example_hash
+        yield from self._fingerprints
+
+    def items(self) -> Iterator[Tuple[int, Example]]:
+        """Iterate over the stored examples. Examples that aren't cached
+        are read from the file without being added to the cache.
+
+        Yields:
+            Iterator[Tuple[int, Example]]: Tuples of (example key, example)
+        """
+        for example_hash in list(self.keys()):
+            example = self._map.get(example_hash) or self._cache.get(example_hash)
+            if example is None:
+                example = self._read(self._find(example_hash))
+            yield example_hash, example
+
+    def from_disk(
+        self, path: Union[str, Path], trusted: bool = False, n_verify: int = 100
+    ) -> "ExampleStore":
+        """Load store from disk. A binary store file is memory mapped, other
+        files are loaded into memory like `ExampleStore.from_disk`.
+        Examples in a binary store file are never validated since only recon
+        writes them, the stored hashes of a random sample are verified.
+
+        Args:
+            path (Path): Path to file to load from
+            trusted (bool, optional): The store was saved by recon, construct examples
+                without validation. See `ExampleStore.from_disk`
+            n_verify (int, optional): Number of stored hashes to verify
+
+        Raises:
+            ValueError: If a verified stored hash doesn't match the example hash
+
+        Returns:
+            ExampleStore: Initialized ExampleStore
+        """
+        path = ensure_path(path)
+        if not path.name.endswith(BINARY_STORE_FORMAT):
+            return super().from_disk(path, trusted=trusted, n_verify=n_verify)
+
+        self.close()
+        self._file = store_file = _BinaryStoreFile(path)
+        self._removed = set()
+        self._cache.clear()
+        sample = random.sample(range(len(store_file)), min(n_verify, len(store_file)))
+        sample_hashes = hash_many([self._read(i) for i in sample])
+        for i, h in zip(sample, sample_hashes):
+            self._verify_hash(store_file.record(i), h)
+
+        # Examples saved by journaled saves since the file was written
+        entries = read_journal(path)
+        records: Dict[int, Dict[str, Any]] = {}
+        removed: Set[int] = set()
+        for entry in entries:
+            for record in entry["records"]:
+                records[int(record["example_hash"])] = record
+                removed.discard(int(record["example_hash"]))
+            removed.update(int(h) for h in entry["removed"])
+
+        def load(example_hash: int) -> Example:
+            record = records.get(example_hash)
+            if record is None:
+                return self._cache.get(example_hash) or self._read(store_file.find(example_hash))
+            if "delta" in record:
+                return Example.construct_trusted(
+                    apply_delta(load(int(record["base"])), record["delta"])
+                )
+            return Example.construct_trusted(record["example"])
+
+        for example_hash in removed:
+            if store_file.find(example_hash) >= 0:
+                self._removed.add(example_hash)
+        for example_hash, record in records.items():
+            if example_hash not in removed:
+                example = load(example_hash)
+                self._put(example_hash, example, record["fingerprint"], self._record_base(record))
+
+        self._saved = SavedStoreState(
+            path.resolve(), get_hash_version(), len(entries), set(self.keys())
+        )
+        return self
+
+    def close(self) -> None:
+        """Unmap the binary store file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def audit_stores(paths: Iterable[Union[str, Path]]) -> Dict[int, List[Example]]:
+    """Audit example stores saved by `ExampleStore.to_disk` for hash collisions across
+    all of them. Records are compared by the fingerprint saved with them so unchanged
+    entries are never hashed again. Only records saved without a fingerprint are fingerprinted.
+
+    Args:
+        paths (Iterable[Union[str, Path]]): Paths of saved example stores
+
+    Returns:
+        Dict[int, List[Example]]: Mapping of each colliding key to
+            the distinct examples stored under it
+    """
+    store_paths = [ensure_path(path) for path in paths]
+
+    def read_records() -> Iterable[Tuple[int, int]]:
+        for path in store_paths:
+            records, keys, _ = read_store_records(path)
+            for record in records:
+                if int(record["example_hash"]) not in keys:
+                    continue
+                fingerprint = record.get("fingerprint")
+                if fingerprint is None:
+                    # Records without a fingerprint are never delta encoded
+                    fingerprint = example_fingerprint(Example(**record["example"]))
+                yield int(record["example_hash"]), fingerprint
+
+    fingerprints: Dict[int, int] = {}
+    colliding: Set[int] = set()
+    for example_hash, fingerprint in read_records():
+        stored_fingerprint = fingerprints.setdefault(example_hash, fingerprint)
+        if stored_fingerprint != fingerprint:
+            colliding.add(example_hash)
+
+    # Only load the examples for colliding keys
+    collisions: Dict[int, Dict[int, Example]] = {}
+    for path in store_paths:
+        records, keys, _ = read_store_records(path)
+        if not any(int(r["example_hash"]) in colliding for r in records):
+            continue
+        examples = examples_from_records(records, lambda data: Example(**data))
+        for record, example in zip(records, examples):
+            example_hash = int(record["example_hash"])
+            if example_hash in colliding and example_hash in keys:
+                record_fingerprint = record.get("fingerprint")
+                if record_fingerprint is None:
+                    fingerprint = example_fingerprint(example)
+                else:
+                    fingerprint = int(record_fingerprint)
+                by_fingerprint = collisions.setdefault(example_hash, {})
+                if fingerprint not in by_fingerprint:
+                    by_fingerprint[fingerprint] = example
 
-        srsly.write_jsonl(path, examples)
+    return {example_hash: list(examples.values()) for example_hash, examples in collisions.items()}
@@ -0,0 +1,245 @@
+"""Out of core data for Datasets too large to keep in memory.
+`Dataset.from_disk(path, streaming=True)` copies the saved data to an ExampleSegment,
+a temporary JSONL file of serialized examples that's read and decoded a chunk at a time.
+Operations on a streaming Dataset write their output to a new segment with a
+SegmentWriter instead of building a list, so only the example keys and a few
+decoded chunks are held in memory.
+"""
+
+import tempfile
+from array import array
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, List, Sequence, Union, cast
+
+import srsly
+
+from recon.formats import read_records
+from recon.loaders import json_to_examples
+from recon.types import Example
+from recon.utils import ensure_path
+
+DEFAULT_CHUNK_SIZE = 1000
+"""Default number of examples read and decoded at a time"""
+
+
+class ExampleSegment(Sequence):
+    """Read only sequence of examples in a segment file. The offset of each
+    example in the file is kept in memory for random access. Examples are decoded
+    a chunk at a time and the most recently used chunks are cached, so iterating
+    the segment in step with an operation decodes each example once.
+    """
+
+    def __init__(
+        self,
+        file: IO[bytes],
+        offsets: array,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cache_chunks: int = 2,
+    ):
+        """Initialize an ExampleSegment. Use `read_segment` or `SegmentWriter` to create one.
+
+        Args:
+            file (IO[bytes]): Segment file with one serialized example per line
+            offsets (array): Offset of each line in file followed by the end of the last line
+            chunk_size (int, optional): Number of examples decoded at a time
+            cache_chunks (int, optional): Max number of decoded chunks cached in memory
+        """
+        self._file = file
+        self._offsets = offsets
+        self.chunk_size = chunk_size
+        self.cache_chunks = cache_chunks
+        self._cache: "OrderedDict[int, List[Example]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("ExampleSegment index out of range")
+        return self._chunk(i // self.chunk_size)[i % self.chunk_size]
+
+    def __iter__(self) -> Iterator[Example]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self) -> Iterator[List[Example]]:
+        """Iterate over the decoded examples a chunk at a time
+
+        Yields:
+            Iterator[List[Example]]: Chunks of at most chunk_size examples
+        """
+        for c in range(-(-len(self) // self.chunk_size)):
+            yield self._chunk(c)
+
+    def _chunk(self, c: int) -> List[Example]:
+        chunk = self._cache.get(c)
+        if chunk is not None:
+            self._cache.move_to_end(c)
+            return chunk
+        start = c * self.chunk_size
+        stop = min(start + self.chunk_size, len(self))
+        lines = self._read(start, stop).splitlines()
+        chunk = json_to_examples((srsly.json_loads(line) for line in lines), trusted=True)
+        self._cache[c] = chunk
+        while len(self._cache) > self.cache_chunks:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def _read(self, start: int, stop: int) -> bytes:
+        self._file.seek(self._offsets[start])
+        return self._file.read(self._offsets[stop] - self._offsets[start])
+
+    def close(self) -> None:
+        """Close and remove the segment file"""
+        self._cache.clear()
+        self._file.close()
+
+
+class SegmentWriter:
+    """Append only writer for a new ExampleSegment. Has the `append` and `extend`
+    methods of a list so operations can build new data the same way for
+    in memory and streaming Datasets.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Initialize a SegmentWriter writing to an anonymous temporary file
+
+        Args:
+            chunk_size (int, optional): chunk_size of the finished ExampleSegment
+        """
+        self._file = tempfile.TemporaryFile(prefix="recon_segment_")
+        self._offsets = array("Q", [0])
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def append(self, example: Example) -> None:
+        line = srsly.json_dumps(example.serialize(exclude_unset=True)).encode("utf8") + b"\n"
+        self._file.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+
+    def extend(self, examples: Iterable[Example]) -> None:
+        for example in examples:
+            self.append(example)
+
+    def copy(self, segment: ExampleSegment, start: int, stop: int) -> None:
+        """Copy examples start to stop of segment without decoding them
+
+        Args:
+            segment (ExampleSegment): Segment to copy from
+            start (int): Index of the first example to copy
+            stop (int): Index after the last example to copy
+        """
+        for i in range(start, stop, self.chunk_size):
+            j = min(i + self.chunk_size, stop)
+            shift = self._offsets[-1] - segment._offsets[i]
+            self._file.write(segment._read(i, j))
+            self._offsets.extend(o + shift for o in segment._offsets[i + 1 : j + 1])
+
+    def finish(self) -> ExampleSegment:
+        """Finish writing and open the written segment. The writer can't be used afterwards.
+
+        Returns:
+            ExampleSegment: Segment of the written examples
+        """
+        self._file.flush()
+        return ExampleSegment(self._file, self._offsets, chunk_size=self.chunk_size)
+
+
+def read_segment(
+    path: Union[str, Path], trusted: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> ExampleSegment:
+    """Copy a data file in any record format (see `recon.formats`) to an ExampleSegment.
+    Records are validated a chunk at a time as they're copied so examples
+    decoded from the segment later don't have to be validated again.
+
+    Args:
+        path (Union[str, Path]): Path to data
+        trusted (bool, optional): Skip validation for records written by recon.
+            See `recon.loaders.json_to_examples`
+        chunk_size (int, optional): Number of examples read and decoded at a time
+
+    Returns:
+        ExampleSegment: Segment of the examples in path
+    """
+    records = read_records(ensure_path(path))
+    writer = SegmentWriter(chunk_size=chunk_size)
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            break
+        writer.extend(json_to_examples(batch, trusted=trusted))
+    return writer.finish()
+
+
+def iter_chunks(data: Sequence[Example]) -> Iterator[Sequence[Example]]:
+    """Iterate over data in chunks that fit in memory. An ExampleSegment
+    is read a chunk at a time, any other data is a single chunk.
+
+    Args:
+        data (Sequence[Example]): Data of a Dataset
+
+    Yields:
+        Iterator[Sequence[Example]]: Chunks of data
+    """
+    if isinstance(data, ExampleSegment):
+        yield from data.chunks()
+    else:
+        yield data
+
+
+def new_data_like(data: Sequence[Example]) -> Union[List[Example], SegmentWriter]:
+    """Empty container for data derived from data, e.g. the output of an operation.
+    A SegmentWriter for an ExampleSegment, a list otherwise.
+    Use `finish_data` to get the new data once it's complete.
+
+    Args:
+        data (Sequence[Example]): Data of a Dataset
+
+    Returns:
+        Union[List[Example], SegmentWriter]: Container to append examples to
+    """
+    if isinstance(data, ExampleSegment):
+        return SegmentWriter(chunk_size=data.chunk_size)
+    return []
+
+
+def copy_data(
+    new_data: Union[List[Example], SegmentWriter],
+    data: Sequence[Example],
+    start: int,
+    stop: int,
+) -> None:
+    """Append examples start to stop of data to new_data created by `new_data_like`
+
+    Args:
+        new_data (Union[List[Example], SegmentWriter]): Container to append to
+        data (Sequence[Example]): Data to copy from
+        start (int): Index of the first example to copy
+        stop (int): Index after the last example to copy
+    """
+    if isinstance(new_data, SegmentWriter) and isinstance(data, ExampleSegment):
+        new_data.copy(data, start, stop)
+    else:
+        new_data.extend(data[start:stop])
+
+
+def finish_data(new_data: Union[List[Example], SegmentWriter]) -> Sequence[Example]:
+    """Get the data built in a container created by `new_data_like`
+
+    Args:
+        new_data (Union[List[Example], SegmentWriter]): Container
+
+    Returns:
+        Sequence[Example]: New data
+    """
+    if isinstance(new_data, SegmentWriter):
+        return new_data.finish()
+    return cast(List[Example], new_data)
@@ -1,25 +1,208 @@
+from collections.abc import Sequence as SequenceABC
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union, cast
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+    overload,
+)
 
-from pydantic import BaseModel, Extra, root_validator
+import numpy as np
+from pydantic import BaseModel, Extra, PrivateAttr, root_validator, validate_model
+from pydantic.fields import ModelField
 from spacy import displacy
+from spacy.attrs import IDX, LENGTH
 from spacy.tokens import Doc
-from spacy.util import get_words_and_spaces
-from spacy.vocab import Vocab
 
 from recon.hashing import (
+    _hash,
+    dump_key,
+    get_hash_version,
+    hash_key,
     prediction_error_hash,
     span_hash,
     token_hash,
-    tokenized_example_hash,
 )
 
 
-class Span(BaseModel):
-    """Entity Span in Example"""
+class _SlottedModel:
+    """Base for the high volume models in an Example (Span and Token).
+    These are plain classes with `__slots__` instead of pydantic models which keeps
+    their memory footprint small for token heavy corpora. Each class declares a
+    pydantic schema model and is only validated against it when parsed from raw data
+    (e.g. by `Example(**data)`), constructing one directly is not validated.
+    They otherwise mirror the pydantic model API recon uses (`dict`, `copy`,
+    `__fields__` and `__fields_set__`). The hash is memoized, tagged with the hash
+    version it was computed with and cleared whenever a field is assigned to.
+    """
+
+    __slots__ = ("_hash_cache", "_fields_set")
+
+    _hash_cache: Optional[Tuple[int, str]]
+    _fields_set: FrozenSet[str]
+
+    __pydantic_model__: ClassVar[Type[BaseModel]]
+    __fields__: ClassVar[Dict[str, ModelField]]
+    _required: ClassVar[Tuple[str, ...]]
+    _defaults: ClassVar[Dict[str, Any]]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.__fields__ = cls.__pydantic_model__.__fields__
+        cls._required = tuple(n for n, f in cls.__fields__.items() if f.required)
+        cls._defaults = {n: f.default for n, f in cls.__fields__.items() if not f.required}
+
+    def __init__(self, **data: Any):
+        setattr_ = object.__setattr__
+        for name in self._required:
+            if name not in data:
+                raise TypeError(f"{type(self).__name__} missing required field: {name}")
+            setattr_(self, name, data[name])
+        for name, default in self._defaults.items():
+            setattr_(self, name, data.get(name, default))
+        setattr_(self, "_fields_set", frozenset(n for n in data if n in self.__fields__))
+        setattr_(self, "_hash_cache", None)
+
+    @classmethod
+    def _from_validated(cls, values: Dict[str, Any], fields_set: Set[str]) -> Any:
+        obj = cls.__new__(cls)
+        for name, value in values.items():
+            object.__setattr__(obj, name, value)
+        object.__setattr__(obj, "_fields_set", frozenset(fields_set))
+        object.__setattr__(obj, "_hash_cache", None)
+        return obj
+
+    @classmethod
+    def __get_validators__(cls) -> Iterator[Callable[..., Any]]:
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value: Any) -> Any:
+        if isinstance(value, cls):
+            # Same as the default copy_on_model_validation of pydantic models
+            return value.copy()
+        if isinstance(value, BaseModel):
+            value = value.dict(exclude_unset=True)
+        if not isinstance(value, dict):
+            raise TypeError(f"{cls.__name__} expected dict not {type(value).__name__}")
+        values, fields_set, errors = validate_model(cls.__pydantic_model__, value)
+        if errors:
+            raise errors
+        return cls._from_validated(values, fields_set)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name not in self.__fields__:
+            raise ValueError(f'"{type(self).__name__}" object has no field "{name}"')
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_fields_set", self._fields_set | {name})
+        object.__setattr__(self, "_hash_cache", None)
+
+    @property
+    def __fields_set__(self) -> Set[str]:
+        return set(self._fields_set)
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        for name in self.__fields__:
+            yield name, getattr(self, name)
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is type(self):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__fields__)
+        if isinstance(other, (_SlottedModel, BaseModel)):
+            return self.dict() == other.dict()
+        return self.dict() == other
+
+    def __hash__(self) -> int:
+        return int(self.hash, 16)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in self)
+        return f"{type(self).__name__}({fields})"
+
+    def __str__(self) -> str:
+        return " ".join(f"{name}={value!r}" for name, value in self)
+
+    def __copy__(self) -> Any:
+        obj = type(self).__new__(type(self))
+        for name in self.__slots__ + _SlottedModel.__slots__:
+            object.__setattr__(obj, name, getattr(self, name))
+        return obj
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Any:
+        # All field values are immutable so a deep copy is a shallow copy
+        return self.__copy__()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__ + _SlottedModel.__slots__}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def dict(
+        self,
+        *,
+        include: Optional[Union[AbstractSet[str], Mapping[str, Any]]] = None,
+        exclude: Optional[Union[AbstractSet[str], Mapping[str, Any]]] = None,
+        by_alias: bool = False,
+        exclude_unset: bool = False,
+        exclude_defaults: bool = False,
+        exclude_none: bool = False,
+    ) -> Dict[str, Any]:
+        if not (include or exclude or exclude_unset or exclude_defaults or exclude_none):
+            return {name: getattr(self, name) for name in self.__fields__}
+        res = {}
+        for name, value in self:
+            if include is not None and name not in include:
+                continue
+            if exclude is not None and name in exclude:
+                continue
+            if exclude_unset and name not in self._fields_set:
+                continue
+            if exclude_defaults and name in self._defaults and value == self._defaults[name]:
+                continue
+            if exclude_none and value is None:
+                continue
+            res[name] = value
+        return res
+
+    def copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False) -> Any:
+        obj = self.__copy__()
+        if update:
+            for name, value in update.items():
+                setattr(obj, name, value)
+        return obj
+
+    def _compute_hash(self, version: int) -> str:
+        raise NotImplementedError
+
+    @property
+    def hash(self) -> str:
+        version = get_hash_version()
+        cache = self._hash_cache
+        if cache is None or cache[0] != version:
+            cache = (version, self._compute_hash(version))
+            object.__setattr__(self, "_hash_cache", cache)
+        return cast(str, cache[1])
+
 
+class _SpanModel(BaseModel):
     text: str
     start: int
     end: int
@@ -29,28 +212,293 @@ class Span(BaseModel):
     kb_id: Optional[str] = None
     source: Optional[str] = None
 
-    def __hash__(self) -> int:
-        return cast(int, span_hash(self))
+    class Config:
+        title = "Span"
 
-    @property
-    def hash(self) -> str:
-        return cast(str, span_hash(self, as_int=False))
 
+class Span(_SlottedModel):
+    """Entity Span in Example"""
+
+    __slots__ = tuple(_SpanModel.__fields__)
+    __pydantic_model__ = _SpanModel
+
+    text: str
+    start: int
+    end: int
+    label: str
+    token_start: Optional[int]
+    token_end: Optional[int]
+    kb_id: Optional[str]
+    source: Optional[str]
+
+    def _compute_hash(self, version: int) -> str:
+        return cast(str, span_hash(self, as_int=False, version=version))
 
-class Token(BaseModel):
+
+class _TokenModel(BaseModel):
+    text: str
+    start: int
+    end: int
+    id: int
+
+    class Config:
+        title = "Token"
+
+
+class Token(_SlottedModel):
     """Token with offsets into Example Text"""
 
+    __slots__ = tuple(_TokenModel.__fields__)
+    __pydantic_model__ = _TokenModel
+
     text: str
     start: int
     end: int
     id: int
 
-    def __hash__(self) -> int:
-        return cast(int, token_hash(self))
+    def _compute_hash(self, version: int) -> str:
+        return cast(str, token_hash(self, as_int=False, version=version))
+
+
+class Tokens(SequenceABC):
+    """Columnar storage for the Tokens of an Example. Token offsets and ids are stored
+    in contiguous int32 arrays and token text is derived from the text of the Example
+    the tokens were created for. Token objects are only created when accessed,
+    e.g. `example.tokens[0]` or iterating over `example.tokens`.
+
+    Tokens are immutable, assign a new list of Tokens to `example.tokens` to change them.
+    """
+
+    __slots__ = ("text", "starts", "ends", "ids", "_texts", "_hash_cache")
+
+    def __init__(
+        self,
+        text: str,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        ids: np.ndarray,
+        texts: Optional[Dict[int, str]] = None,
+    ):
+        """Initialize Tokens
+
+        Args:
+            text (str): Text the token offsets refer to
+            starts (np.ndarray): Start offset of each token
+            ends (np.ndarray): End offset of each token
+            ids (np.ndarray): Id of each token
+            texts (Optional[Dict[int, str]], optional): Text of tokens
+                where it isn't the same as text[start:end], by index
+        """
+        self.text = text
+        self.starts = np.asarray(starts, dtype=np.int32)
+        self.ends = np.asarray(ends, dtype=np.int32)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self._texts = texts or {}
+        self._hash_cache: Optional[Tuple[int, Tuple[str, ...]]] = None
+
+    @classmethod
+    def from_doc(cls, doc: Doc) -> "Tokens":
+        """Create Tokens from a spaCy Doc
+
+        Args:
+            doc (Doc): spaCy Doc
+
+        Returns:
+            Tokens: Tokens of doc with ids set to the token index
+        """
+        offsets = doc.to_array([IDX, LENGTH]).astype(np.int32)
+        starts = offsets[:, 0] if len(offsets) else np.empty(0, dtype=np.int32)
+        lengths = offsets[:, 1] if len(offsets) else np.empty(0, dtype=np.int32)
+        return cls(doc.text, starts, starts + lengths, np.arange(len(doc), dtype=np.int32))
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Union[Token, Dict[str, Any]]], text: str) -> "Tokens":
+        """Create Tokens from Token objects or token dicts
+
+        Args:
+            tokens (Iterable[Union[Token, Dict[str, Any]]]): Tokens to store
+            text (str): Text of the Example the tokens belong to
+
+        Raises:
+            TypeError: If a token is missing a field or a field has the wrong type
+            ValueError: If a token field can't be converted to the right type
+
+        Returns:
+            Tokens: Columnar Tokens
+        """
+        data = [t.dict() if isinstance(t, Token) else t for t in tokens]
+        try:
+            starts = np.array([t["start"] for t in data], dtype=np.int32)
+            ends = np.array([t["end"] for t in data], dtype=np.int32)
+            ids = np.array([t["id"] for t in data], dtype=np.int32)
+        except KeyError as e:
+            raise TypeError(f"Token missing required field: {e}")
+
+        texts = {}
+        for i, (t, start, end) in enumerate(zip(data, starts.tolist(), ends.tolist())):
+            token_text = t["text"]
+            if token_text != text[start:end]:
+                if not isinstance(token_text, str):
+                    raise TypeError(f"Token text must be str not {type(token_text).__name__}")
+                texts[i] = token_text
+        return cls(text, starts, ends, ids, texts)
+
+    @classmethod
+    def __get_validators__(cls) -> Iterator[Callable[..., Any]]:
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value: Any, values: Dict[str, Any]) -> "Tokens":
+        if isinstance(value, Tokens):
+            return value
+        if not isinstance(value, (list, tuple)):
+            raise TypeError(f"Tokens expected list not {type(value).__name__}")
+        return cls.from_tokens(value, values.get("text", ""))
+
+    @classmethod
+    def __modify_schema__(cls, field_schema: Dict[str, Any]) -> None:
+        field_schema.update(type="array", items=_TokenModel.schema())
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @overload
+    def __getitem__(self, index: int) -> Token:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "Tokens":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Token, "Tokens"]:
+        if isinstance(index, slice):
+            indices = range(len(self))[index]
+            texts = {i: self._texts[j] for i, j in enumerate(indices) if j in self._texts}
+            return Tokens(self.text, self.starts[index], self.ends[index], self.ids[index], texts)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Tokens index out of range")
+        start = int(self.starts[index])
+        end = int(self.ends[index])
+        return Token(
+            text=self._texts.get(index, self.text[start:end]),
+            start=start,
+            end=end,
+            id=int(self.ids[index]),
+        )
+
+    def __iter__(self) -> Iterator[Token]:
+        for text, start, end, id in self.hash_data():
+            yield Token(text=text, start=start, end=end, id=id)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Tokens):
+            if self is other:
+                return True
+            if len(self) != len(other):
+                return False
+            if self.text == other.text and self._texts == other._texts:
+                return (
+                    np.array_equal(self.starts, other.starts)
+                    and np.array_equal(self.ends, other.ends)
+                    and np.array_equal(self.ids, other.ids)
+                )
+            return self.hash_data() == other.hash_data()
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return False
+
+    def __repr__(self) -> str:
+        return f"Tokens({list(self)!r})"
+
+    def __copy__(self) -> "Tokens":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Tokens":
+        # Tokens are immutable
+        return self
 
     @property
-    def hash(self) -> str:
-        return cast(str, token_hash(self, as_int=False))
+    def texts(self) -> List[str]:
+        """Text of each token
+
+        Returns:
+            List[str]: Token texts
+        """
+        text = self.text
+        texts = [text[s:e] for s, e in zip(self.starts.tolist(), self.ends.tolist())]
+        for i, token_text in self._texts.items():
+            texts[i] = token_text
+        return texts
+
+    def hash_data(self) -> Tuple[Tuple[str, int, int, int], ...]:
+        """Hash data of each token, same as `recon.hashing.token_hash` uses
+
+        Returns:
+            Tuple[Tuple[str, int, int, int], ...]: (text, start, end, id) of each token
+        """
+        return tuple(zip(self.texts, self.starts.tolist(), self.ends.tolist(), self.ids.tolist()))
+
+    def hashes(self, version: Optional[int] = None) -> Tuple[str, ...]:
+        """Memoized hash of each token
+
+        Args:
+            version (Optional[int], optional): Hash version. Defaults to the active version
+
+        Returns:
+            Tuple[str, ...]: Hex hash of each token
+        """
+        version = version or get_hash_version()
+        cache = self._hash_cache
+        if cache is None or cache[0] != version:
+            hashes = tuple(
+                cast(str, _hash(d, as_int=False, version=version)) for d in self.hash_data()
+            )
+            cache = (version, hashes)
+            self._hash_cache = cache
+        return cache[1]
+
+    def dicts(self) -> List[Dict[str, Any]]:
+        """Dict of each token, same as `[token.dict() for token in tokens]`
+
+        Returns:
+            List[Dict[str, Any]]: Token dicts
+        """
+        return [
+            {"text": text, "start": start, "end": end, "id": id}
+            for text, start, end, id in self.hash_data()
+        ]
+
+    def find_starts(self, offsets: Union[Sequence[int], np.ndarray]) -> np.ndarray:
+        """Find the tokens starting at each of a batch of character offsets.
+
+        Args:
+            offsets (Union[Sequence[int], np.ndarray]): Character offsets
+
+        Returns:
+            np.ndarray: Index of the token starting at each offset, -1 if no token starts there
+        """
+        return _find_sorted(self.starts, offsets)
+
+    def find_ends(self, offsets: Union[Sequence[int], np.ndarray]) -> np.ndarray:
+        """Find the tokens ending at each of a batch of character offsets.
+
+        Args:
+            offsets (Union[Sequence[int], np.ndarray]): Character offsets
+
+        Returns:
+            np.ndarray: Index of the token ending at each offset, -1 if no token ends there
+        """
+        return _find_sorted(self.ends, offsets)
+
+
+def _find_sorted(values: np.ndarray, offsets: Union[Sequence[int], np.ndarray]) -> np.ndarray:
+    offsets = np.asarray(offsets, dtype=np.int64)
+    idx = np.searchsorted(values, offsets)
+    found = idx < len(values)
+    found[found] = values[idx[found]] == offsets[found]
+    return np.where(found, idx, -1)
 
 
 class Example(BaseModel):
@@ -58,12 +506,15 @@ class Example(BaseModel):
 
     text: str
     spans: List[Span]
-    tokens: Optional[List[Token]] = None
+    tokens: Optional[Tokens] = None
     meta: Dict[str, Any] = {}
     formatted: bool = False
 
+    _hash_cache: Optional[Tuple[int, Tuple[str, ...], str]] = PrivateAttr(default=None)
+
     class Config:
         extra = Extra.allow
+        json_encoders = {_SlottedModel: lambda m: m.dict(), Tokens: lambda t: t.dicts()}
 
     @root_validator(pre=True)
     def span_text_must_exist(cls, values: Dict[str, Any]) -> Dict[str, Any]:
@@ -88,40 +539,134 @@ class Example(BaseModel):
 
         return values
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "tokens" and value is not None and not isinstance(value, Tokens):
+            value = Tokens.from_tokens(value, self.text)
+        super().__setattr__(name, value)
+
     def __hash__(self) -> int:
-        return cast(int, tokenized_example_hash(self))
+        return int(self.hash, 16)
 
     def __eq__(self, other: object) -> bool:
-        if isinstance(other, Example):
-            return self.dict() == other.dict()
-        return False
+        if not isinstance(other, Example):
+            return False
+        if self is other:
+            return True
+        # Examples with different hashes can't be equal, otherwise compare all fields
+        if self.hash != other.hash:
+            return False
+        return all(getattr(self, name) == getattr(other, name) for name in self.__fields__)
 
     def dict(self, **kwargs: Any) -> Dict:
         res = super().dict(**kwargs)
-        keys = list(res.keys())
-        for k in keys:
-            if k not in self.schema()["properties"].keys():
+        # Remove extra fields
+        for k in list(res.keys()):
+            if k not in self.__fields__:
                 del res[k]
+
+        # pydantic only converts nested pydantic models to dicts
+        nested_kwargs = {
+            k: v
+            for k, v in kwargs.items()
+            if k in ("by_alias", "exclude_unset", "exclude_defaults", "exclude_none")
+        }
+        if res.get("spans"):
+            res["spans"] = [
+                m.dict(**nested_kwargs) if isinstance(m, _SlottedModel) else m for m in res["spans"]
+            ]
+        if isinstance(res.get("tokens"), Tokens):
+            res["tokens"] = res["tokens"].dicts()
+        return res
+
+    @classmethod
+    def construct_trusted(cls, data: Dict[str, Any]) -> "Example":
+        """Create an Example from data written by recon (e.g. `Example.serialize`)
+        without running any validation. The data must already be formatted,
+        use `Example(**data)` for any data that didn't come from recon.
+
+        Args:
+            data (Dict[str, Any]): Example data
+
+        Returns:
+            Example: Example constructed without validation
+        """
+        values = dict(data)
+        values["spans"] = [Span(**span) for span in values["spans"]]
+        tokens = values.get("tokens")
+        if tokens is not None and not isinstance(tokens, Tokens):
+            values["tokens"] = Tokens.from_tokens(tokens, values["text"])
+        return cls.construct(_fields_set=set(data), **values)
+
+    def serialize(self, exclude_unset: bool = False) -> Dict[str, Any]:
+        """Fast equivalent of `self.dict(exclude_unset=exclude_unset)` used to save
+        Examples. Field values are read directly instead of going through pydantic's
+        generic dict conversion so values like `meta` are not copied.
+
+        Args:
+            exclude_unset (bool, optional): Exclude fields that weren't explicitly set
+
+        Returns:
+            Dict[str, Any]: Example data
+        """
+        fields_set = self.__fields_set__ if exclude_unset else self.__fields__
+        values = self.__dict__
+        res: Dict[str, Any] = {}
+        for name in self.__fields__:
+            if name not in fields_set:
+                continue
+            value = values[name]
+            if name == "spans":
+                value = [span.dict(exclude_unset=exclude_unset) for span in value]
+            elif name == "tokens" and value is not None:
+                value = value.dicts()
+            res[name] = value
         return res
 
     @property
     def hash(self) -> str:
-        return cast(str, tokenized_example_hash(self, as_int=False))
+        """Memoized equivalent of `tokenized_example_hash(self, as_int=False)`.
+        The hash data of an Example is its text and the hashes of its spans and tokens,
+        which are memoized themselves. The memoized hash is reused as long as that
+        data is unchanged so assigning to any field or mutating the spans and tokens
+        lists in place is detected without rehashing.
+
+        Returns:
+            str: Example hash
+        """
+        version = get_hash_version()
+        hash_data = (
+            (self.text,)
+            + tuple(span.hash for span in self.spans)
+            + (self.tokens.hashes() if self.tokens else ())
+        )
+        cache = self._hash_cache
+        if cache is None or cache[0] != version or cache[1] != hash_data:
+            cache = (version, hash_data, cast(str, _hash(hash_data, as_int=False)))
+            object.__setattr__(self, "_hash_cache", cache)
+        return cache[2]
+
+    @property
+    def key(self) -> int:
+        """Key of the Example in an ExampleStore and in Transformation records.
+        Same as `hash(self)` for 64 bit hash versions and the full hash for 128 bit versions.
+
+        Returns:
+            int: Example key
+        """
+        return hash_key(int(self.hash, 16))
 
     @property
     def doc(self) -> Doc:
-        """Return spaCy Doc representation of Example
+        """Return spaCy Doc representation of Example. Docs are created with the
+        Vocab of `recon.loaders.example_doc_cache` and cached by example key, the
+        returned Doc is shared so copy it before modifying it.
 
         Returns:
-            Doc: Output spaCy Doc with ents set from example spans
+            Doc: Output spaCy Doc with ents set from example spans.
         """
-        if not self.tokens:
-            raise ValueError("Tokens are not set. Try running the recon.add_tokens.v1 operation.")
-        tokens = [token.text for token in self.tokens]
-        words, spaces = get_words_and_spaces(tokens, self.text)
-        doc = Doc(Vocab(), words=words, spaces=spaces)
-        doc.ents = tuple(doc.char_span(s.start, s.end, label=s.label) for s in self.spans)
-        return doc
+        from recon.loaders import example_doc_cache, examples_to_docs
+
+        return next(examples_to_docs([self], cache=example_doc_cache()))
 
     def show(self, jupyter: Optional[bool] = None, options: Dict[str, Any] = {}) -> None:
         """Visualize example using spaCy displacy entity renderer
@@ -191,6 +736,18 @@ class OperationStatus(str, Enum):
     NEEDS_TOKENIZATION = "NEEDS_TOKENIZATION"
 
 
+class DataHunk(BaseModel):
+    """Change an operation made to the data of a Dataset. The examples with keys
+    `delete` at index `at` of the data before the operation were replaced by the
+    examples with keys `insert`. Used by `Dataset.checkout` to undo and redo
+    operations without running them again.
+    """
+
+    at: int
+    delete: List[int] = []
+    insert: List[int] = []
+
+
 class OperationState(BaseModel):
     name: str
     batch: bool = False
@@ -202,6 +759,23 @@ class OperationState(BaseModel):
     examples_removed: int = 0
     examples_changed: int = 0
     transformations: List[Transformation] = []
+    hunks: List[DataHunk] = []
+
+    def to_json(self) -> Dict[str, Any]:
+        """JSON serializable dict of the operation state with example keys
+        in Transformation records converted by `dump_key`.
+
+        Returns:
+            Dict[str, Any]: Operation state data
+        """
+        data = self.dict()
+        for t in data["transformations"]:
+            t["prev_example"] = dump_key(t["prev_example"])
+            t["example"] = dump_key(t["example"])
+        for hunk in data["hunks"]:
+            hunk["delete"] = [dump_key(k) for k in hunk["delete"]]
+            hunk["insert"] = [dump_key(k) for k in hunk["insert"]]
+        return data
 
 
 class DatasetOperationsState(BaseModel):
@@ -209,6 +783,19 @@ class DatasetOperationsState(BaseModel):
     commit: str
     size: int
     operations: List[OperationState]
+    hash_version: int = 1
+    format: Optional[str] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        """JSON serializable dict of the state with example keys
+        in Transformation records converted by `dump_key`.
+
+        Returns:
+            Dict[str, Any]: State data
+        """
+        data = self.dict(exclude={"operations"})
+        data["operations"] = [op.to_json() for op in self.operations]
+        return data
 
 
 # class DatasetMeta(BaseModel):
@@ -218,12 +805,15 @@ class DatasetOperationsState(BaseModel):
 
 class CorpusMeta(BaseModel):
     name: str
+    format: Optional[str] = None
     # versions: List[DatasetMeta]
 
 
 class OperationResult(BaseModel):
     data: Any
     state: OperationState
+    # example.key for each example in data, in the same order
+    example_hashes: Optional[Any] = None
 
 
 class CorpusApplyResult(BaseModel):
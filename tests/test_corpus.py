@@ -1,9 +1,13 @@
 import shutil
 from pathlib import Path
 
+import pytest
+import srsly
+
 from recon.corpus import Corpus
 from recon.dataset import Dataset
 from recon.stats import get_ner_stats
+from recon.store import ExampleStore
 
 
 def test_corpus_initialize(example_data):
@@ -68,3 +72,31 @@ def test_corpus_apply_inplace(example_corpus_processed):
     assert len(example_corpus_processed.train_ds.operations) == 4
     assert len(example_corpus_processed.dev_ds.operations) == 4
     assert len(example_corpus_processed.test_ds.operations) == 4
+
+
+def test_corpus_from_disk_streaming(example_corpus, tmp_path):
+    example_corpus.to_disk(tmp_path, overwrite=True)
+
+    corpus = Corpus.from_disk(tmp_path, streaming=True)
+    assert corpus.train_ds.streaming
+    assert corpus.all == example_corpus.all
+    stats = corpus.apply(get_ner_stats)
+    assert stats.all.n_examples == len(example_corpus.all)
+
+
+def test_corpus_from_disk_trusted(example_corpus, tmp_path):
+    example_corpus.to_disk(tmp_path, overwrite=True)
+
+    corpus = Corpus.from_disk(tmp_path)
+    trusted_corpus = Corpus.from_disk(tmp_path, trusted=True)
+    assert trusted_corpus.train == corpus.train
+    assert trusted_corpus.train_ds.commit_hash == corpus.train_ds.commit_hash
+    assert len(trusted_corpus.example_store) == len(corpus.example_store)
+    assert len(trusted_corpus.train_ds.operations) == len(corpus.train_ds.operations)
+
+    store_path = tmp_path / ".recon" / "example_store.jsonl"
+    records = list(srsly.read_jsonl(store_path))
+    records[0]["example"]["text"] += " changed"
+    srsly.write_jsonl(store_path, records)
+    with pytest.raises(ValueError):
+        ExampleStore().from_disk(store_path, trusted=True, n_verify=len(records))
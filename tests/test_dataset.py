@@ -2,12 +2,24 @@ from pathlib import Path
 from typing import cast
 
 import pytest
+import srsly
 
+from recon.cache import CachedResult, OperationCache
 from recon.dataset import Dataset
+from recon.operations.core import Operation, operation
 from recon.operations.corrections import corrections_from_dict
+from recon.preprocess import SpacyPreProcessor
 from recon.stats import get_ner_stats
-from recon.store import ExampleStore
-from recon.types import Correction, OperationStatus, Stats, TransformationType
+from recon.store import DiskExampleStore, ExampleStore
+from recon.stream import ExampleSegment
+from recon.types import (
+    Correction,
+    Example,
+    OperationStatus,
+    Span,
+    Stats,
+    TransformationType,
+)
 
 
 def test_dataset_initialize(example_data):
@@ -41,6 +53,38 @@ def test_dataset_commit_hash(example_data):
     assert hash(train_dataset) == 2389582605943205983
 
 
+def test_dataset_commit_hash_in_place_edits(example_data):
+    dataset = Dataset("train", [e.copy(deep=True) for e in example_data["train"]])
+    commit = dataset.commit_hash
+    n_annotations = dataset.stats.n_annotations
+
+    # Edits to examples in place are picked up by Dataset.refresh
+    example = dataset.data[0]
+    text = example.text
+    example.text = text + " "
+    assert dataset.commit_hash == commit
+    dataset.refresh([0])
+    assert dataset.commit_hash != commit
+    assert dataset[example.key] is example
+    example.text = text
+    dataset.refresh()
+    assert dataset.commit_hash == commit
+
+    span = example.spans.pop()
+    dataset.refresh([0])
+    assert dataset.commit_hash != commit
+    assert dataset.stats.n_annotations == n_annotations - 1
+    example.spans.append(span)
+    dataset.refresh([0])
+    assert dataset.commit_hash == commit
+
+    # Examples added to or removed from the data list are picked up on access
+    dataset.data.append(dataset.data[1])
+    assert dataset.commit_hash != commit
+    dataset.data.pop()
+    assert dataset.commit_hash == commit
+
+
 def test_len(example_data):
     train_dataset = Dataset("train", example_data["train"])
     assert len(train_dataset) == len(example_data["train"])
@@ -118,6 +162,86 @@ def test_rollback(example_data):
     assert pre_keys == rolled_back_keys
 
 
+def test_rollback_multiple_without_hunks():
+    @operation("test_label_x")
+    def label_x(example):
+        for span in example.spans:
+            span.label = "X"
+        return example
+
+    @operation("test_label_y")
+    def label_y(example):
+        for span in example.spans:
+            span.label = "Y"
+        return example
+
+    data = [
+        Example(text="First example", spans=[Span(text="First", start=0, end=5, label="A")]),
+        Example(text="Second example", spans=[Span(text="Second", start=0, end=6, label="B")]),
+    ]
+    train_dataset = Dataset("train", data, verbose=False)
+    commit = train_dataset.commit_hash
+    train_dataset.apply_("test_label_x")
+    train_dataset.apply_("test_label_y")
+    # Operations saved before DataHunks were recorded are rolled back from transformations
+    for op in train_dataset.operations:
+        op.hunks = []
+
+    train_dataset.rollback(2)
+    assert [[s.label for s in e.spans] for e in train_dataset.data] == [["A"], ["B"]]
+    assert train_dataset.commit_hash == commit
+
+
+def test_example_store_compact(example_data):
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    n_stored = len(train_dataset.example_store)
+    train_dataset.apply_("recon.upcase_labels.v1")
+    assert len(train_dataset.example_store) > n_stored
+
+    assert train_dataset.example_store.compact() == 0
+    assert train_dataset.example_store.compact(history=0) > 0
+    assert len(train_dataset.example_store) == len({e.key for e in train_dataset.data})
+    assert all(e in train_dataset.example_store for e in train_dataset.data)
+
+
+def test_rollback_keeps_shared_examples(example_data):
+    store = ExampleStore()
+    train_dataset = Dataset("train", example_data["train"], example_store=store, verbose=False)
+    other_dataset = Dataset("other", list(example_data["train"]), example_store=store)
+    for e in example_data["train"]:
+        store.add(e)
+    other_dataset.apply_("recon.upcase_labels.v1")
+    train_dataset.apply_("recon.upcase_labels.v1")
+
+    train_dataset.rollback()
+    assert all(e in store for e in other_dataset.data)
+
+
+def test_rollback_releases_without_walking_datasets(example_data, monkeypatch):
+    store = ExampleStore()
+    train_dataset = Dataset("train", example_data["train"], example_store=store, verbose=False)
+    other_dataset = Dataset("other", list(example_data["train"]), example_store=store)
+    train_dataset.apply_("recon.upcase_labels.v1")
+    other_dataset.apply_("recon.upcase_labels.v1")
+    train_dataset.apply_("recon.strip_annotations.v1")
+    added = {
+        t.example for t in train_dataset.operations[-1].transformations if t.example is not None
+    }
+    assert added
+
+    def walk(*args, **kwargs):
+        raise AssertionError("release walked the data and history of a Dataset")
+
+    monkeypatch.setattr(Dataset, "example_keys", walk)
+    train_dataset.rollback()
+    assert not any(h in store for h in added)
+    assert all(e in store for e in train_dataset.data)
+
+    # Examples of the rolled back operation are still referenced by the other Dataset
+    train_dataset.rollback()
+    assert all(e in store for e in other_dataset.data)
+
+
 def test_dataset_search(example_data):
     train_dataset = Dataset("train", example_data["train"])
 
@@ -128,6 +252,25 @@ def test_dataset_search(example_data):
     assert len(train_dataset.search("Software", case_sensitive=False)) == 4
 
 
+def test_dataset_search_modes(example_data):
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+
+    assert len(train_dataset.search("oftware eng", case_sensitive=False)) == 2
+    assert len(train_dataset.search("machine learning", mode="phrase")) == 2
+    assert len(train_dataset.search("machine learn", mode="phrase")) == 0
+    assert len(train_dataset.search("machine learn", mode="prefix")) == 2
+    assert len(train_dataset.search(r"\bJava\b", mode="regex")) == 4
+    assert len(train_dataset.search("", label="JOB_ROLE")) == 5
+    assert len(train_dataset.search("", label="SKILL", span_text="machine learning")) == 2
+    assert len(train_dataset.search("", meta={"category": "Engineering"})) == 9
+    assert next(train_dataset.iter_search("Kotlin")).text.startswith("Kotlin")
+    with pytest.raises(ValueError):
+        train_dataset.search("Kotlin", mode="fuzzy")
+
+    train_dataset.apply_("recon.upcase_labels.v1")
+    assert len(train_dataset.search("", label="SKILL", span_text="production")) == 1
+
+
 def test_dataset_to_from_disk(example_data, tmp_path):
 
     train_dataset = Dataset("train", example_data["train"])
@@ -184,3 +327,313 @@ def test_dataset_to_from_spacy(example_data, tmp_path):
 
     ner_stats_post: Stats = cast(Stats, train_dataset_loaded.apply(get_ner_stats))
     assert ner_stats_pre == ner_stats_post
+
+
+def test_dataset_to_disk_journal(example_data, tmp_path):
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    train_dataset.to_disk(tmp_path, overwrite=True, journal=True)
+    state_dir = tmp_path / ".recon" / "train"
+    assert not (state_dir / "state.journal.jsonl").exists()
+
+    data_mtime = (tmp_path / "train.jsonl").stat().st_mtime_ns
+    train_dataset.apply_("recon.upcase_labels.v1")
+    train_dataset.to_disk(tmp_path, journal=True)
+    assert (tmp_path / "train.jsonl").stat().st_mtime_ns == data_mtime
+    assert len(list(srsly.read_jsonl(state_dir / "state.journal.jsonl"))) == 1
+    assert len(list(srsly.read_jsonl(state_dir / "example_store.journal.jsonl"))) == 1
+
+    loaded = Dataset("train", verbose=False).from_disk(tmp_path)
+    assert loaded.commit_hash == train_dataset.commit_hash
+    assert [e.key for e in loaded.data] == [e.key for e in train_dataset.data]
+    assert len(loaded.operations) == 1
+    assert len(loaded.example_store) == len(train_dataset.example_store)
+
+    loaded.rollback()
+    loaded.to_disk(tmp_path, journal=True)
+    loaded_2 = Dataset("train", verbose=False).from_disk(tmp_path)
+    assert loaded_2.commit_hash == loaded.commit_hash
+    assert sorted(e.key for e in loaded_2.data) == sorted(e.key for e in example_data["train"])
+    assert len(loaded_2.operations) == 0
+
+    loaded_2.to_disk(tmp_path, overwrite=True)
+    assert not (state_dir / "state.journal.jsonl").exists()
+    assert not (state_dir / "example_store.journal.jsonl").exists()
+
+
+@pytest.mark.parametrize("file_format", [".jsonl.gz", ".msgpack"])
+def test_dataset_to_from_disk_file_format(example_data, tmp_path, file_format):
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    train_dataset.to_disk(tmp_path, overwrite=True)
+    train_dataset.apply_("recon.upcase_labels.v1")
+    train_dataset.to_disk(tmp_path, overwrite=True, file_format=file_format)
+
+    state_dir = tmp_path / ".recon" / "train"
+    assert (tmp_path / f"train{file_format}").exists()
+    assert (state_dir / f"example_store{file_format}").exists()
+    assert not (tmp_path / "train.jsonl").exists()
+    assert not (state_dir / "example_store.jsonl").exists()
+
+    loaded = Dataset("train", verbose=False).from_disk(tmp_path, trusted=True)
+    assert loaded.commit_hash == train_dataset.commit_hash
+    assert [e.key for e in loaded.data] == [e.key for e in train_dataset.data]
+    assert len(loaded.example_store) == len(train_dataset.example_store)
+
+    loaded.rollback()
+    assert loaded.commit_hash == Dataset("train", example_data["train"]).commit_hash
+
+    with pytest.raises(ValueError):
+        train_dataset.to_disk(tmp_path, overwrite=True, file_format=".csv")
+
+
+def test_dataset_getitem_hash_index(example_data, monkeypatch):
+    data = example_data["train"] + [example_data["train"][0].copy(deep=True)]
+    train_dataset = Dataset("train", data, verbose=False)
+    keys = [e.key for e in train_dataset.data]
+    assert train_dataset[keys[0]] is train_dataset.data[0]
+    assert train_dataset.get_many(keys) == train_dataset.data
+
+    # Lookups use the index without hashing the data again
+    def hash_data(data):
+        raise AssertionError("Data hashed on lookup")
+
+    with monkeypatch.context() as m:
+        m.setattr(Dataset, "_hash_data", staticmethod(hash_data))
+        for key in keys:
+            assert train_dataset[key].key == key
+        assert train_dataset.get_many(keys) == train_dataset.data
+
+    train_dataset.apply_("recon.upcase_labels.v1")
+    new_keys = [e.key for e in train_dataset.data]
+    assert train_dataset.get_many(new_keys) == train_dataset.data
+    for old_key in set(keys) - set(new_keys):
+        with pytest.raises(KeyError):
+            train_dataset[old_key]
+
+    train_dataset.rollback()
+    assert train_dataset.get_many(keys) == train_dataset.data
+    with pytest.raises(KeyError):
+        train_dataset.get_many([keys[0], 0])
+
+
+def test_dataset_checkout(example_data):
+    @operation("test_split_short_examples")
+    def split_short_examples(example):
+        if len(example.text) < 100:
+            return None
+        if "Software" in example.text:
+            return [Example(text="added example", spans=[]), example]
+        return example
+
+    @operation("test_lowercase_labels")
+    def lowercase_labels(example):
+        for span in example.spans:
+            span.label = span.label.lower()
+        return example
+
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    commits = [train_dataset.commit_hash]
+    for op in ["recon.upcase_labels.v1", "test_split_short_examples", "test_lowercase_labels"]:
+        train_dataset.apply_(op)
+        commits.append(train_dataset.commit_hash)
+    assert all(op.hunks for op in train_dataset.operations)
+
+    for index in [0, 2, 1, 3, 0]:
+        train_dataset.checkout(index)
+        assert train_dataset.commit_hash == commits[index]
+        assert len(train_dataset.operations) == index
+        assert len(train_dataset.history) == 3
+        assert [e.key for e in train_dataset.data] == train_dataset._get_commit_tree().leaves
+
+    train_dataset.checkout(commits[2])
+    assert len(train_dataset.operations) == 2
+    with pytest.raises(ValueError):
+        train_dataset.checkout("not a commit")
+    assert train_dataset.commit_hash == commits[2]
+    with pytest.raises(ValueError):
+        train_dataset.checkout(4)
+
+    train_dataset.checkout(3)
+    train_dataset.rollback(2)
+    assert train_dataset.commit_hash == commits[1]
+    assert len(train_dataset.history) == 1
+
+    # Examples added by undone operations are released when rollback discards them
+    train_dataset.apply_("test_split_short_examples")
+    train_dataset.checkout(1)
+    train_dataset.rollback()
+    assert set(train_dataset.example_store.keys()) == {e.key for e in train_dataset.data}
+
+
+def test_dataset_from_disk_streaming(example_data, tmp_path):
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    train_dataset.to_disk(tmp_path, overwrite=True)
+
+    streamed = Dataset("train", verbose=False).from_disk(tmp_path, streaming=True, chunk_size=2)
+    assert streamed.streaming
+    assert isinstance(streamed.example_store, DiskExampleStore)
+    assert len(streamed) == len(train_dataset)
+    assert streamed.commit_hash == train_dataset.commit_hash
+    assert streamed.stats == train_dataset.stats
+
+    train_dataset.apply_("recon.upcase_labels.v1")
+    streamed.apply_("recon.upcase_labels.v1")
+    assert isinstance(streamed.data, ExampleSegment)
+    assert streamed.commit_hash == train_dataset.commit_hash
+    assert [e.key for e in streamed.data] == streamed._get_commit_tree().leaves
+
+    streamed.to_disk(tmp_path / "streamed")
+    loaded = Dataset("train").from_disk(tmp_path / "streamed")
+    assert loaded.commit_hash == train_dataset.commit_hash
+
+    streamed.rollback()
+    train_dataset.rollback()
+    assert streamed.streaming
+    assert streamed.commit_hash == train_dataset.commit_hash
+
+
+def test_dataset_stats_incremental(example_data):
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    stats = train_dataset.stats
+    assert stats == get_ner_stats(train_dataset.data)
+    leaves = train_dataset._stats_leaves
+
+    corrections = corrections_from_dict(
+        {"software development engineer": "JOB_ROLE", "model": None}
+    )
+    train_dataset.pipe_(["recon.upcase_labels.v1", "recon.strip_annotations.v1"])
+    train_dataset.apply_("recon.fix_annotations.v1", corrections)
+    assert train_dataset.stats == get_ner_stats(train_dataset.data)
+    assert train_dataset._stats_leaves is not leaves
+
+    train_dataset.checkout(1)
+    assert train_dataset.stats == get_ner_stats(train_dataset.data)
+    train_dataset.checkout(3)
+    assert train_dataset.stats == get_ner_stats(train_dataset.data)
+
+    train_dataset.rollback(3)
+    assert train_dataset.stats == stats
+
+    # Stats returned are copies of the cache
+    train_dataset.stats.n_annotations_per_type["NEW"] = 1
+    assert "NEW" not in train_dataset.stats.n_annotations_per_type
+
+
+def test_dataset_operation_cache(example_data, tmp_path):
+    calls = []
+
+    @operation("test_lowercase_labels_counted")
+    def lowercase_labels(example):
+        calls.append(example.text)
+        for span in example.spans:
+            span.label = span.label.lower()
+        return example
+
+    train_dataset = Dataset("train", example_data["train"], verbose=False)
+    # The cache is opt-in
+    train_dataset.apply_("test_lowercase_labels_counted")
+    assert len(train_dataset.operation_cache) == 0
+    train_dataset.rollback()
+    calls.clear()
+
+    train_dataset.apply_("test_lowercase_labels_counted", cache=True)
+    assert len(calls) == len(train_dataset)
+    n_changed = train_dataset.operations[0].examples_changed
+    assert 0 < n_changed < len(train_dataset)
+    assert len(train_dataset.operation_cache) == len({e.key for e in example_data["train"]})
+    commit = train_dataset.commit_hash
+
+    # Rollback releases the changed examples so only those are processed again
+    train_dataset.rollback()
+    calls.clear()
+    train_dataset.apply_("test_lowercase_labels_counted", cache=True)
+    assert len(calls) == n_changed
+    assert train_dataset.commit_hash == commit
+
+    train_dataset.to_disk(tmp_path, overwrite=True)
+    srsly.write_jsonl(
+        tmp_path / "train.jsonl", [{"text": "An example added later", "spans": []}], append=True
+    )
+    calls.clear()
+    loaded = Dataset("train", verbose=False).from_disk(tmp_path)
+    # Only the added example and the saved outputs of the operation are new inputs
+    assert len(calls) == n_changed + 1
+    assert len(loaded) == len(train_dataset) + 1
+
+
+def test_operation_cache_key():
+    def lowercase(example):
+        return example
+
+    def uppercase(example):
+        example.text = example.text.upper()
+        return example
+
+    def make(op):
+        return Operation("test_cache_key", [], op, handles_tokens=True, augmentation=False)
+
+    assert make(lowercase).fingerprint == make(lowercase).fingerprint
+    assert make(lowercase).fingerprint != make(uppercase).fingerprint
+    with_pre = Operation("test_cache_key", [SpacyPreProcessor()], lowercase, True, False)
+    assert with_pre.fingerprint != make(lowercase).fingerprint
+
+
+def test_operation_cache_lru(tmp_path):
+    cache = OperationCache(max_size=2)
+    for example_hash in (1, 2):
+        cache.put("op", "params", example_hash, CachedResult([example_hash]))
+    cache.to_disk(tmp_path / "cache.jsonl")
+    assert cache.get("op", "params", 1) == CachedResult([1])
+    cache.put("op", "params", 3, CachedResult([4]))
+    assert len(cache) == 2
+    assert cache.get("op", "params", 2) is None
+    assert cache.get("op", "params", 3) == CachedResult([4])
+
+    # Evicted results aren't kept in the saved file
+    cache.to_disk(tmp_path / "cache.jsonl")
+    loaded = OperationCache().from_disk(tmp_path / "cache.jsonl")
+    assert len(loaded) == 2
+    assert loaded.get("op", "params", 2) is None
+
+
+def test_dataset_apply_parallel(example_data):
+    serial = Dataset("train", example_data["train"], verbose=False)
+    parallel = Dataset("train", example_data["train"], verbose=False)
+    for op in [
+        "recon.upcase_labels.v1",
+        "recon.fix_tokenization_and_spacing.v1",
+        "recon.split_sentences.v1",
+    ]:
+        serial.apply_(op)
+        parallel.apply_(op, n_workers=2, chunk_size=2)
+        assert parallel.commit_hash == serial.commit_hash
+        assert parallel.operations[-1].transformations == serial.operations[-1].transformations
+        assert parallel.operations[-1].hunks == serial.operations[-1].hunks
+    assert [e.key for e in parallel.data] == [e.key for e in serial.data]
+    assert set(parallel.example_store.keys()) == set(serial.example_store.keys())
+
+
+def test_dataset_pipe_fused(example_data):
+    operations = [
+        "recon.upcase_labels.v1",
+        "recon.fix_tokenization_and_spacing.v1",
+        "recon.split_sentences.v1",
+        "recon.add_tokens.v1",
+    ]
+    sequential = Dataset("train", example_data["train"], verbose=False)
+    fused = Dataset("train", example_data["train"], verbose=False)
+    stats = fused.stats
+    sequential.pipe_(operations, fuse=False)
+    fused.pipe_(operations, chunk_size=3)
+
+    assert fused.commit_hash == sequential.commit_hash
+    assert [e.key for e in fused.data] == [e.key for e in sequential.data]
+    assert len(fused.operations) == len(operations)
+    for op, expected in zip(fused.operations, sequential.operations):
+        assert op.name == expected.name
+        assert op.status == expected.status
+        assert op.transformations == expected.transformations
+        assert op.hunks == expected.hunks
+    assert fused.stats == sequential.stats
+
+    fused.rollback(len(operations))
+    assert fused.stats == stats
@@ -0,0 +1,346 @@
+import pytest
+import srsly
+
+import recon.operations.validation  # noqa: F401
+from recon.corpus import Corpus
+from recon.dataset import Dataset
+from recon.hashing import (
+    _hash,
+    dataset_hash,
+    get_hash_version,
+    hash_many,
+    set_hash_version,
+    span_hash,
+    tokenized_example_hash,
+)
+from recon.migrate import migrate_hashes
+from recon.store import (
+    DiskExampleStore,
+    ExampleStore,
+    HashCollisionError,
+    MmapExampleStore,
+    audit_stores,
+    examples_from_records,
+)
+from recon.types import Example, Span
+
+
+@pytest.fixture()
+def hash_version_2():
+    set_hash_version(2)
+    yield 2
+    set_hash_version(1)
+
+
+def test_hash_versions():
+    assert get_hash_version() == 1
+    data = ("text", 40_000, 0)
+    assert _hash(data, version=1) != _hash(data, version=2)
+    assert _hash(data, version=2) == _hash(data, version=2)
+
+    with pytest.raises(ValueError):
+        set_hash_version(0)
+
+
+def test_hash_v2_is_unambiguous():
+    assert _hash(("ab", "c"), version=2) != _hash(("a", "bc"), version=2)
+    assert _hash((None,), version=2) != _hash((0,), version=2)
+    assert _hash((1,), version=2) != _hash(("1",), version=2)
+    assert _hash((2**70,), version=2) != _hash((2**71,), version=2)
+
+
+def test_span_hash_version(hash_version_2):
+    span = Span(text="London", start=40_000, end=40_006, label="GPE")
+    assert span_hash(span) == span_hash(span, version=2)
+    assert span_hash(span) != span_hash(span, version=1)
+
+
+def test_migrate_hashes(example_data, tmp_path):
+    train_ds = Dataset("train", example_data["train"])
+    dev_ds = Dataset("dev", example_data["dev"])
+    corpus = Corpus("test_corpus", train_ds, dev_ds)
+    corpus.apply_("recon.upcase_labels.v1")
+    corpus.to_disk(tmp_path, overwrite=True)
+
+    hash_map = migrate_hashes(tmp_path, 2, verbose=False)
+    for example in corpus.train:
+        old_hash = hash(example)
+        set_hash_version(2)
+        assert hash_map[old_hash] == hash(example)
+        set_hash_version(1)
+
+    set_hash_version(2)
+    try:
+        corpus_loaded = Corpus.from_disk(tmp_path)
+        assert corpus_loaded.train == corpus.train
+        assert len(corpus_loaded.train_ds.operations) == 1
+
+        op = corpus_loaded.train_ds.operations[0]
+        for t in op.transformations:
+            assert t.prev_example in corpus_loaded.example_store
+            assert t.example in corpus_loaded.example_store
+
+        corpus_loaded.train_ds.rollback()
+        rolled_back = sorted(hash(e) for e in corpus_loaded.train)
+        assert rolled_back == sorted(hash(e) for e in example_data["train"])
+    finally:
+        set_hash_version(1)
+
+    with pytest.raises(ValueError):
+        Corpus.from_disk(tmp_path)
+
+
+def test_example_hash_memoized():
+    example = Example(
+        text="this is a test example with something else",
+        spans=[Span(text="something", start=28, end=37, label="TEST_ENTITY")],
+    )
+    initial_hash = hash(example)
+    assert initial_hash == hash(tokenized_example_hash(example))
+
+    example.spans[0].label = "OTHER_ENTITY"
+    assert hash(example) != initial_hash
+    assert hash(example) == hash(tokenized_example_hash(example))
+
+    example.spans.append(Span(text="else", start=38, end=42, label="TEST_ENTITY"))
+    assert hash(example) == hash(tokenized_example_hash(example))
+
+    del example.spans[0]
+    example.text = example.text.upper()
+    assert hash(example) == hash(tokenized_example_hash(example))
+
+    example_copy = example.copy(deep=True)
+    assert hash(example_copy) == hash(example)
+    example_copy.spans[0].start = 37
+    assert hash(example_copy) != hash(example)
+
+
+def test_example_hash_memoized_version(hash_version_2):
+    example = Example(text="text", spans=[])
+    assert example.hash == tokenized_example_hash(example, as_int=False, version=2)
+    set_hash_version(1)
+    assert example.hash == tokenized_example_hash(example, as_int=False, version=1)
+
+
+def test_commit_tree_incremental(example_data, hash_version_2):
+    train_ds = Dataset("train", example_data["train"] * 20, verbose=False)
+    initial_commit = train_ds.commit_hash
+    assert initial_commit == dataset_hash(train_ds, as_int=False)
+
+    train_ds.apply_("recon.upcase_labels.v1")
+    assert train_ds.commit_hash != initial_commit
+    assert train_ds.commit_hash == dataset_hash(train_ds, as_int=False)
+    assert hash(train_ds) == hash(dataset_hash(train_ds))
+
+    train_ds.rollback()
+    assert train_ds.commit_hash == dataset_hash(train_ds, as_int=False)
+
+
+def test_hash_many(example_data):
+    examples = [e.copy(deep=True) for e in example_data["train"]]
+    expected = [tokenized_example_hash(e) for e in examples]
+
+    fresh = [e.copy(deep=True) for e in example_data["train"]]
+    assert hash_many(fresh, workers=2, chunk_size=10) == expected
+    assert hash_many(examples, workers=1) == expected
+    assert hash_many(examples, as_int=False, workers=1) == [e.hash for e in examples]
+    assert hash_many(examples, version=2) == [
+        tokenized_example_hash(e, version=2) for e in examples
+    ]
+
+    for example in examples:
+        assert example._hash_cache is not None
+        for span in example.spans:
+            assert span._hash_cache is not None
+
+    # Memoized hashes are reused until the example changes
+    example = next(e for e in examples if e.spans)
+    example.spans[0].label = example.spans[0].label + "_CHANGED"
+    assert example.spans[0]._hash_cache is None
+    assert hash_many(examples) == [tokenized_example_hash(e) for e in examples]
+    assert hash_many(examples)[examples.index(example)] != expected[examples.index(example)]
+
+
+def test_hash_version_3(example_data, tmp_path):
+    set_hash_version(3)
+    try:
+        example = example_data["train"][0].copy(deep=True)
+        assert len(example.hash) == 32
+        assert example.key == int(example.hash, 16)
+
+        train_ds = Dataset("train", example_data["train"], verbose=False)
+        train_ds.apply_("recon.upcase_labels.v1")
+        assert any(t.example > 2**64 for t in train_ds.operations[0].transformations)
+        train_ds.to_disk(tmp_path, overwrite=True)
+
+        train_ds_loaded = Dataset("train").from_disk(tmp_path)
+        assert train_ds_loaded.commit_hash == train_ds.commit_hash
+        train_ds_loaded.rollback()
+        assert sorted(e.key for e in train_ds_loaded.data) == sorted(
+            e.key for e in example_data["train"]
+        )
+    finally:
+        set_hash_version(1)
+
+
+def test_example_store_collision(monkeypatch, tmp_path):
+    example = Example(text="some text", spans=[])
+    other = Example(text="other text", spans=[])
+
+    store = ExampleStore([example])
+    store.add(example.copy(deep=True))
+    assert len(store) == 1
+
+    monkeypatch.setattr(Example, "key", property(lambda self: 1))
+    store = ExampleStore([example])
+    with pytest.raises(HashCollisionError):
+        store.add(other)
+    assert store[1] is example
+
+    store.to_disk(tmp_path / "store_a.jsonl")
+    ExampleStore([other]).to_disk(tmp_path / "store_b.jsonl")
+    collisions = audit_stores([tmp_path / "store_a.jsonl", tmp_path / "store_b.jsonl"])
+    assert list(collisions.keys()) == [1]
+    assert collisions[1] == [example, other]
+
+
+def test_example_store_audit():
+    example = Example(text="some text", spans=[Span(text="some", start=0, end=4, label="A")])
+    store = ExampleStore([example])
+    assert store.audit() == []
+    initial_key = example.key
+    example.spans[0].label = "B"
+    assert store.audit() == [initial_key]
+
+
+def test_disk_example_store(example_data, tmp_path):
+    store = DiskExampleStore(path=tmp_path / "segment.jsonl", cache_size=2)
+    examples = example_data["train"][:5]
+    for example in examples:
+        store.add(example)
+    assert len(store) == len(examples)
+    assert len(store._cache) == 2
+    assert all(e in store for e in examples)
+    assert store[examples[0].key] == examples[0]
+    assert sorted(k for k, _ in store.items()) == sorted(e.key for e in examples)
+
+    del store[examples[0].key]
+    assert examples[0] not in store
+    assert len(store) == len(examples) - 1
+
+    store.to_disk(tmp_path / "store.jsonl")
+    loaded = ExampleStore().from_disk(tmp_path / "store.jsonl")
+    assert len(loaded) == len(examples) - 1
+    store.close()
+
+
+def test_disk_example_store_rollback(example_data):
+    for store in (
+        DiskExampleStore(example_data["train"], cache_size=1),
+        DiskExampleStore(cache_size=1),
+    ):
+        train_ds = Dataset("train", example_data["train"], example_store=store, verbose=False)
+        assert all(e.key in store for e in example_data["train"])
+        train_ds.apply_("recon.upcase_labels.v1")
+        train_ds.rollback()
+        assert sorted(e.key for e in train_ds.data) == sorted(e.key for e in example_data["train"])
+
+
+def test_example_store_delta_revisions(example_data, tmp_path):
+    train_ds = Dataset("train", example_data["train"], verbose=False)
+    train_ds.apply_("recon.upcase_labels.v1")
+    store = train_ds.example_store
+    store.to_disk(tmp_path / "store.jsonl")
+
+    records = list(srsly.read_jsonl(tmp_path / "store.jsonl"))
+    deltas = [r for r in records if "delta" in r]
+    assert len(deltas) == train_ds.operations[0].examples_changed
+    assert all("text" not in r["delta"] and "tokens" not in r["delta"] for r in deltas)
+
+    for trusted in (False, True):
+        loaded = ExampleStore().from_disk(tmp_path / "store.jsonl", trusted=trusted)
+        assert len(loaded) == len(store)
+        for example_hash, example in store.items():
+            assert loaded[example_hash] == example
+
+    store.max_delta_chain = 0
+    store.to_disk(tmp_path / "store_full.jsonl")
+    assert all("delta" not in r for r in srsly.read_jsonl(tmp_path / "store_full.jsonl"))
+
+
+def test_disk_example_store_delta_revisions(example_data):
+    store = DiskExampleStore(example_data["train"], cache_size=1)
+    train_ds = Dataset("train", example_data["train"], example_store=store, verbose=False)
+    train_ds.apply_("recon.upcase_labels.v1")
+    changed = [e for e in train_ds.data if e not in example_data["train"]]
+    assert changed
+
+    store._cache.clear()
+    assert all(store[e.key] == e for e in changed)
+    store.compact(history=0)
+    store._cache.clear()
+    assert all(store[e.key] == e for e in changed)
+
+
+@pytest.mark.parametrize("store_cls", [ExampleStore, DiskExampleStore])
+def test_example_store_revert_removed_base(store_cls, tmp_path):
+    original = Example(text="A short example", spans=[Span(text="A", start=0, end=1, label="X")])
+    changed = original.copy(deep=True)
+    changed.spans[0].label = "Y"
+
+    store = store_cls([original])
+    store.add(changed, base=original.key)
+    # Compacting removes the base of the change, reverting adds it back
+    del store[original.key]
+    store.add(original.copy(deep=True), base=changed.key)
+    assert not (store._get_base(original.key) and store._get_base(changed.key))
+
+    store.to_disk(tmp_path / "store.jsonl")
+    loaded = ExampleStore().from_disk(tmp_path / "store.jsonl")
+    assert loaded[original.key] == original
+    assert loaded[changed.key] == changed
+    if isinstance(store, DiskExampleStore):
+        store._cache.clear()
+        assert store[changed.key] == changed
+
+    records = [
+        {"example_hash": "1", "base": "2", "delta": {"spans": []}},
+        {"example_hash": "2", "base": "1", "delta": {"spans": []}},
+    ]
+    with pytest.raises(ValueError):
+        examples_from_records(records, Example.construct_trusted)
+
+
+def test_mmap_example_store(example_data, tmp_path):
+    train_ds = Dataset("train", example_data["train"], verbose=False)
+    train_ds.apply_("recon.upcase_labels.v1")
+    store_path = tmp_path / "example_store.bin"
+    train_ds.example_store.to_disk(store_path)
+
+    store = MmapExampleStore(cache_size=1).from_disk(store_path)
+    assert isinstance(store, MmapExampleStore)
+    assert len(store) == len(train_ds.example_store)
+    assert set(store.keys()) == set(train_ds.example_store.keys())
+    assert all(store[h] == e for h, e in train_ds.example_store.items())
+    assert len(ExampleStore().from_disk(store_path)) == len(store)
+
+    removed = example_data["train"][0]
+    del store[removed.key]
+    assert removed not in store
+    new_example = Example(text="A new example", spans=[])
+    store.add(new_example)
+    assert new_example in store
+    assert len(store) == len(train_ds.example_store)
+    with pytest.raises(KeyError):
+        store[removed.key]
+
+    store.to_disk(store_path, journal=True)
+    assert (tmp_path / "example_store.journal.jsonl").exists()
+    loaded = MmapExampleStore().from_disk(store_path)
+    assert set(loaded.keys()) == set(store.keys())
+    assert loaded[new_example.key] == new_example
+    loaded.add(removed)
+    assert loaded[removed.key] == removed
+
+    store.close()
+    loaded.close()
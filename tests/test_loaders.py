@@ -0,0 +1,58 @@
+import pytest
+from spacy.vocab import Vocab
+
+import recon.operations.tokenization  # noqa: F401
+import recon.operations.validation  # noqa: F401
+from recon.loaders import (
+    DocCache,
+    example_doc_cache,
+    examples_to_docs,
+    from_spacy,
+    to_spacy,
+)
+from recon.types import Example
+
+
+@pytest.fixture()
+def tokenized_examples(example_corpus_processed):
+    return example_corpus_processed.train[:20]
+
+
+def test_examples_to_docs(tokenized_examples):
+    cache = DocCache()
+    docs = list(examples_to_docs(tokenized_examples, batch_size=8, cache=cache))
+    assert len(docs) == len(tokenized_examples)
+    assert len(cache) == len({e.key for e in tokenized_examples})
+    for example, doc in zip(tokenized_examples, docs):
+        assert doc.vocab is cache.vocab
+        assert doc.text == example.text
+        assert [(e.start_char, e.end_char, e.label_) for e in doc.ents] == [
+            (s.start, s.end, s.label) for s in example.spans
+        ]
+
+    assert next(examples_to_docs(tokenized_examples[:1], cache=cache)) is docs[0]
+    assert tokenized_examples[0].doc is not docs[0]
+    assert tokenized_examples[0].doc.vocab is not cache.vocab
+
+    # Example.doc shares the Vocab and Docs of one DocCache across Examples
+    example_doc = tokenized_examples[0].doc
+    assert tokenized_examples[0].doc is example_doc
+    assert tokenized_examples[1].doc.vocab is example_doc.vocab
+    assert example_doc.vocab is example_doc_cache().vocab
+
+    docs_mp = list(examples_to_docs(tokenized_examples, vocab=Vocab(), n_process=2))
+    assert [d.to_json() for d in docs_mp] == [d.to_json() for d in docs]
+
+    with pytest.raises(ValueError):
+        list(examples_to_docs([Example(text="no tokens", spans=[])]))
+    with pytest.raises(ValueError):
+        list(examples_to_docs(tokenized_examples, vocab=Vocab(), cache=cache))
+
+
+def test_to_spacy_round_trip(tokenized_examples, tmp_path):
+    to_spacy(tmp_path / "train.spacy", tokenized_examples)
+    loaded = list(from_spacy(tmp_path / "train.spacy"))
+    assert [e.text for e in loaded] == [e.text for e in tokenized_examples]
+    assert [[(s.start, s.end, s.label) for s in e.spans] for e in loaded] == [
+        [(s.start, s.end, s.label) for s in e.spans] for e in tokenized_examples
+    ]
@@ -93,3 +93,55 @@ def test_remove_operation(ds):
     assert len(ds) == 0
 
     print(ds.example_store._map)
+
+
+def test_copy_on_write_operation(ds):
+    @operation("noop_example")
+    def noop_test(example):
+        return example
+
+    @operation("change_meta_example")
+    def change_meta_test(example):
+        example.meta["changed"] = True
+        example.spans[0].label = "CHANGED"
+        return example
+
+    orig_example = ds.data[0]
+    orig_span = orig_example.spans[0]
+
+    ds.apply_("noop_example")
+    assert ds.data[0] is orig_example
+    assert ds.operations[-1].examples_changed == 0
+
+    ds.apply_("recon.rename_labels.v1", label_map={"TEST_ENTITY": "RENAMED"})
+    assert ds.data[0] is not orig_example
+    assert ds.data[0].spans[0].label == "RENAMED"
+    assert ds.data[0].meta is orig_example.meta
+    assert ds.data[0].tokens is orig_example.tokens
+    assert type(ds.data[0].spans) is list
+    assert orig_span.label == "TEST_ENTITY"
+
+    ds.apply_("change_meta_example")
+    assert ds.data[0].meta == {"changed": True}
+    assert type(ds.data[0].meta) is dict
+    assert ds.data[0].spans[0].label == "CHANGED"
+    assert orig_example.meta == {}
+    assert orig_span.label == "TEST_ENTITY"
+
+    @operation("change_nested_meta_example")
+    def change_nested_meta_test(example):
+        dict(example.meta)["tags"].append("dict")
+        {**example.meta}["tags"].append("unpacked")
+        for key, value in example.meta.items():
+            if key == "tags":
+                value.append("items")
+        return example
+
+    # Mutable meta values are never shared with the original Example
+    tagged = ds.data[0]
+    tagged.meta["tags"] = ["original"]
+    ds.apply_("change_nested_meta_example")
+    assert tagged.meta["tags"] == ["original"]
+
+    with pytest.raises(ValueError):
+        ds.apply_("recon.rename_labels.v1", label_map="not a mapping")
@@ -1,7 +1,7 @@
 from recon.dataset import Dataset
 from recon.operations.core import op_iter
 from recon.operations.tokenization import add_tokens
-from recon.types import Example, Span
+from recon.types import Example, Span, Tokens
 
 
 def test_fix_tokenization_and_spacing(spacy_preprocessor):
@@ -101,5 +101,5 @@ def test_add_tokens_bad_example(spacy_preprocessor):
     # Since add_tokens cannot resolve token start and ends from the spans above.
     assert isinstance(fixed_example, Example)
 
-    assert isinstance(fixed_example.tokens, list)
+    assert isinstance(fixed_example.tokens, Tokens)
     assert len(fixed_example.tokens) == 56
@@ -0,0 +1,136 @@
+import copy
+import pickle
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from recon.hashing import token_hash, tokenized_example_hash
+from recon.types import Example, Span, Token, Tokens
+
+
+def test_example_dict_round_trip(example_data):
+    for example in example_data["train"]:
+        data = example.dict()
+        assert Example(**data).dict() == data
+
+        data = example.dict(exclude_unset=True)
+        assert Example(**data).dict(exclude_unset=True) == data
+
+
+def test_span_token_fields():
+    span = Span(text="London", start=0, end=6, label="GPE")
+    assert span.dict() == {
+        "text": "London",
+        "start": 0,
+        "end": 6,
+        "label": "GPE",
+        "token_start": None,
+        "token_end": None,
+        "kb_id": None,
+        "source": None,
+    }
+    assert span.dict(exclude_unset=True) == {"text": "London", "start": 0, "end": 6, "label": "GPE"}
+    assert span.dict(exclude={"source"}).keys() == span.dict().keys() - {"source"}
+
+    span.kb_id = "Q84"
+    assert span.dict(exclude_unset=True)["kb_id"] == "Q84"
+    with pytest.raises(ValueError):
+        span.not_a_field = 1  # type: ignore
+
+    with pytest.raises(TypeError):
+        Token(text="London", start=0, end=6)  # type: ignore
+
+    token = Token(text="London", start=0, end=6, id=0)
+    assert not hasattr(token, "__dict__")
+    assert copy.deepcopy(token) == token
+    assert pickle.loads(pickle.dumps(token)) == token
+    assert hash(token.copy(update={"id": 1})) != hash(token)
+
+
+def test_example_validates_spans():
+    example = Example(
+        text="London",
+        spans=[{"start": 0, "end": 6, "label": "GPE"}],
+        tokens=[{"text": "London", "start": "0", "end": 6, "id": 0}],
+    )
+    assert isinstance(example.spans[0], Span)
+    assert example.spans[0].text == "London"
+    assert example.tokens is not None and example.tokens[0].start == 0
+
+    with pytest.raises(ValidationError):
+        Example(text="London", spans=[{"text": "London", "start": "a", "end": 6, "label": "GPE"}])
+
+    span = example.spans[0]
+    example_copy = Example(text=example.text, spans=[span])
+    assert example_copy.spans[0] == span
+    assert example_copy.spans[0] is not span
+    assert '"label": "GPE"' in example.json()
+
+
+def test_tokens_columnar():
+    text = "Have you used it?"
+    tokens = Tokens.from_tokens(
+        [
+            Token(text="Have", start=0, end=4, id=0),
+            {"text": "you", "start": 5, "end": 8, "id": 1},
+            {"text": "used", "start": 9, "end": 13, "id": 2},
+            {"text": "IT", "start": 14, "end": 16, "id": 3},
+            {"text": "?", "start": 16, "end": 17, "id": 4},
+        ],
+        text,
+    )
+    assert len(tokens) == 5
+    assert tokens.starts.dtype == np.int32
+    assert tokens[1] == Token(text="you", start=5, end=8, id=1)
+    assert tokens[-2].text == "IT"
+    assert tokens.texts == ["Have", "you", "used", "IT", "?"]
+    assert tokens[3:] == [tokens[3], tokens[4]]
+    assert tokens.hashes() == tuple(token_hash(t, as_int=False) for t in tokens)
+
+    assert tokens.find_starts([0, 1, 14]).tolist() == [0, -1, 3]
+    assert tokens.find_ends([4, 17, 18]).tolist() == [0, 4, -1]
+
+    example = Example(text=text, spans=[], tokens=tokens.dicts())
+    assert isinstance(example.tokens, Tokens)
+    assert example.tokens == tokens
+    assert Example(**example.dict()) == example
+
+    example.tokens = list(tokens)
+    assert isinstance(example.tokens, Tokens)
+    assert example.hash == tokenized_example_hash(example, as_int=False)
+
+    with pytest.raises(ValidationError):
+        Example(text=text, spans=[], tokens=[{"text": "Have", "start": 0, "end": 4}])
+
+
+def test_example_serialize(example_data):
+    examples = example_data["train"] + [
+        Example(
+            text="Have you used it?",
+            spans=[{"start": 14, "end": 16, "label": "X", "kb_id": "Q1"}],
+            tokens=[{"text": "Have", "start": 0, "end": 4, "id": 0}],
+            meta={"source": "test"},
+            extra_field=1,
+        )
+    ]
+    for example in examples:
+        assert example.serialize() == example.dict()
+        assert example.serialize(exclude_unset=True) == example.dict(exclude_unset=True)
+        assert "extra_field" not in example.serialize()
+
+
+def test_example_eq():
+    example = Example(text="some text", spans=[{"start": 0, "end": 4, "label": "A"}])
+    other = example.copy(deep=True)
+    assert example == other
+    assert example in {other}
+
+    other.meta["source"] = "other"
+    assert hash(example) == hash(other)
+    assert example != other
+
+    other = example.copy(deep=True)
+    other.spans[0].label = "B"
+    assert example != other
+    assert example != example.dict()